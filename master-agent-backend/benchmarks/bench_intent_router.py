@@ -0,0 +1,153 @@
+"""
+Benchmark the intent router against the substring chain it replaced.
+
+    python -m benchmarks.bench_intent_router [database URI | app.db | messages.txt] [--repeat N]
+
+(run from master-agent-backend). The corpus is the recorded chat messages in
+the Conversation table (default: src/database/app.db) or a text file with one
+message per line. A built-in sample is used when the corpus is empty. Prints per-message timings for both
+matchers, the messages on which their answers differ, and the same timings
+with SCALED_INTENTS synthetic intents added to the table.
+"""
+import os
+import sys
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.utils.intent_router import FALLBACK_RESPONSE, INTENTS, IntentRouter, default_router
+
+SAMPLE_MESSAGES = (
+    'hi',
+    'Hello there!',
+    'Can you add a task to call the dentist tomorrow?',
+    'create a new task for the quarterly report',
+    'I want to set a goal to run 5k by June',
+    'Show me my notes from yesterday',
+    'What is this about?',
+    'I think we should ship it',
+    'take a note: buy milk, eggs and bread',
+    'Which tasks are still pending?',
+    'anything on the calendar for this afternoon?',
+    'my goals for this month are a bit ambitious, help me break them down',
+)
+MIN_MESSAGES = 10000
+SCALED_INTENTS = 200
+DEFAULT_DATABASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'database', 'app.db')
+
+
+class CorpusError(ValueError):
+    """The corpus argument is neither a database URI nor a readable file."""
+
+
+def legacy_response(message):
+    """The substring chain generate_response used before the intent router."""
+    message_lower = message.lower()
+    if 'task' in message_lower and ('create' in message_lower or 'add' in message_lower):
+        return default_router.intents[0]['response']
+    elif 'goal' in message_lower:
+        return default_router.intents[1]['response']
+    elif 'note' in message_lower:
+        return default_router.intents[2]['response']
+    elif 'hello' in message_lower or 'hi' in message_lower:
+        return default_router.intents[3]['response']
+    return FALLBACK_RESPONSE.format(message=message)
+
+
+def scaled_matchers(extra):
+    """A router and the equivalent substring chain for INTENTS plus `extra` synthetic intents."""
+    intents = list(INTENTS) + [
+        {'name': f'synthetic_{n}', 'groups': ((f'kw{n}x', f'kw{n}y'),), 'response': f'synthetic {n}'}
+        for n in range(extra)
+    ]
+    router = IntentRouter(intents)
+
+    def chain(message):
+        message_lower = message.lower()
+        for intent in intents:
+            if all(any(word in message_lower for word in group) for group in intent['groups']):
+                return intent['response']
+        return FALLBACK_RESPONSE.format(message=message)
+
+    return router.respond, chain
+
+
+def load_corpus(source=None):
+    """Messages from a database URI, a SQLite .db file or a text file (default: DEFAULT_DATABASE)."""
+    if source and '://' not in source:
+        if not os.path.isfile(source):
+            raise CorpusError(f"{source} is not a regular file or a database URI")
+        if not source.endswith('.db'):
+            with open(source, encoding='utf-8') as f:
+                return [line.rstrip('\n') for line in f if line.strip()]
+        source = f"sqlite:///{os.path.abspath(source)}"
+    elif not source:
+        if not os.path.isfile(DEFAULT_DATABASE):
+            return []
+        source = f"sqlite:///{DEFAULT_DATABASE}"
+
+    from flask import Flask
+    from src.models.master_agent import Conversation, db
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = source
+    db.init_app(app)
+    with app.app_context():
+        return [message for (message,) in db.session.query(Conversation.message)
+                .filter(Conversation.message.isnot(None)).yield_per(1000)]
+
+
+def _time(func, messages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    repeat = 5
+    if '--repeat' in argv:
+        i = argv.index('--repeat')
+        repeat = int(argv[i + 1])
+        argv = argv[:i] + argv[i + 2:]
+
+    try:
+        recorded = load_corpus(argv[0] if argv else None)
+    except (CorpusError, SQLAlchemyError) as e:
+        print(f"error: cannot read corpus: {e}", file=sys.stderr)
+        return 2
+    corpus = recorded or list(SAMPLE_MESSAGES)
+    print(f"corpus: {len(recorded)} recorded messages" + ('' if recorded else ' (using built-in sample)'))
+    # Cycle small corpora so timings are not dominated by loop overhead
+    messages = corpus * max(1, -(-MIN_MESSAGES // len(corpus)))
+
+    legacy = _time(legacy_response, messages, repeat)
+    router = _time(default_router.respond, messages, repeat)
+    print(f"messages timed: {len(messages)}, best of {repeat}")
+    print(f"legacy substring chain: {legacy / len(messages) * 1e6:8.2f} us/message")
+    print(f"intent router:          {router / len(messages) * 1e6:8.2f} us/message")
+
+    router_n, chain_n = scaled_matchers(SCALED_INTENTS)
+    legacy = _time(chain_n, messages, repeat)
+    router = _time(router_n, messages, repeat)
+    print(f"with {SCALED_INTENTS} more intents:")
+    print(f"  substring chain:      {legacy / len(messages) * 1e6:8.2f} us/message")
+    print(f"  intent router:        {router / len(messages) * 1e6:8.2f} us/message")
+
+    differences = [m for m in corpus if legacy_response(m) != default_router.respond(m)]
+    print(f"answers that differ: {len(differences)} of {len(corpus)}")
+    for message in differences[:20]:
+        old = legacy_response(message)
+        new = default_router.match(message)
+        print(f"  {message[:60]!r}: legacy={'fallback' if old.startswith('I understand') else old[:30]!r} "
+              f"router={new['name'] if new else 'fallback'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
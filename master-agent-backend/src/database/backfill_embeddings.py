@@ -0,0 +1,84 @@
+"""
+Embed the notes and research results stored before the semantic index existed
+(or while its backend was switched), so they show up on /related. Items whose
+text is already indexed are skipped, so it is safe to re-run:
+
+    python -m src.database.backfill_embeddings [database-uri]
+
+The store directory and embedding backend come from $EMBEDDING_STORE_DIR and
+$EMBEDDING_BACKEND, as for the running app.
+"""
+import os
+import sys
+
+from src.models.master_agent import Note, db
+from src.utils.embedding_store import get_semantic_index
+
+BATCH_SIZE = 500
+
+
+def _index_batches(index, kind, rows):
+    """Index (id, text) rows in batches; returns (items seen, items embedded)."""
+    seen = embedded = 0
+    batch = []
+    for item_id, text in rows:
+        batch.append((item_id, text))
+        if len(batch) >= BATCH_SIZE:
+            embedded += index.index(kind, batch)
+            seen, batch = seen + len(batch), []
+    if batch:
+        embedded += index.index(kind, batch)
+        seen += len(batch)
+    return seen, embedded
+
+
+def backfill_note_embeddings(index=None):
+    """Embed every note's content not yet in the index; returns (notes seen, notes embedded)."""
+    index = index if index is not None else get_semantic_index()
+    rows = db.session.query(Note.id, Note.content).filter(Note.content.isnot(None), Note.content != '') \
+        .order_by(Note.id).yield_per(BATCH_SIZE)
+    return _index_batches(index, 'notes', rows)
+
+
+def backfill_research_embeddings(index=None):
+    """
+    Same for research result summaries, through the research session. Returns
+    None when the research models (src.database) are not part of this checkout.
+    """
+    try:
+        from src.database.db_session import get_db
+        from src.models.research_result import ResearchResult
+    except ImportError:
+        return None
+
+    index = index if index is not None else get_semantic_index()
+    session = get_db()
+    try:
+        rows = session.query(ResearchResult.id, ResearchResult.content_summary) \
+            .filter(ResearchResult.content_summary.isnot(None)) \
+            .order_by(ResearchResult.id).yield_per(BATCH_SIZE)
+        return _index_batches(index, 'research', rows)
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    from flask import Flask
+
+    argv = sys.argv[1:] if argv is None else argv
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = argv[0] if argv else \
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.db')}"
+    db.init_app(app)
+    with app.app_context():
+        print('notes seen / embedded:', *backfill_note_embeddings())
+    done = backfill_research_embeddings()
+    if done is None:
+        print('research results skipped: research models (src.database) not available')
+    else:
+        print('research results seen / embedded:', *done)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
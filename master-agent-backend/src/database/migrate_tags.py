@@ -0,0 +1,87 @@
+"""
+Backfill the normalized tag index (tag/note_tag, research_tags/research_result_tag)
+from the JSON tags columns. Safe to re-run. On PostgreSQL, migration_phase8.sql
+does the same in SQL; for SQLite databases run:
+
+    python -m src.database.migrate_tags [database-uri]
+"""
+import os
+import sys
+
+from src.models.master_agent import Note, Tag, db
+from src.models.tagging import parse_tag_json
+
+BATCH_SIZE = 500
+
+
+def backfill_note_tags():
+    """Link every note to the tags in its JSON column; returns the number of notes processed."""
+    done, batch = 0, {}
+    rows = db.session.query(Note.id, Note.tags).filter(Note.tags.isnot(None), Note.tags != '') \
+        .order_by(Note.id).all()
+    for note_id, tags in rows:
+        tags = parse_tag_json(tags)
+        if tags is None:  # not a JSON list; migration_phase8.sql skips these rows too
+            continue
+        batch[note_id] = tags
+        if len(batch) >= BATCH_SIZE:
+            Tag.link_notes(batch)
+            db.session.commit()
+            done, batch = done + len(batch), {}
+    if batch:
+        Tag.link_notes(batch)
+        db.session.commit()
+        done += len(batch)
+    return done
+
+
+def backfill_research_tags():
+    """
+    Same for research results, through the research session. Returns None when
+    the research models (src.database) are not part of this checkout.
+    """
+    try:
+        from src.database.db_session import get_db
+        from src.models.research_result import ResearchResult
+    except ImportError:
+        return None
+
+    session = get_db()
+    try:
+        done = 0
+        for result in session.query(ResearchResult).filter(ResearchResult.tags.isnot(None)) \
+                .order_by(ResearchResult.id).yield_per(BATCH_SIZE):
+            if parse_tag_json(result.tags) is None:
+                continue
+            result.sync_tags(session)
+            done += 1
+        session.commit()
+        return done
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def main(argv=None):
+    from flask import Flask
+
+    argv = sys.argv[1:] if argv is None else argv
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = argv[0] if argv else \
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.db')}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        print('notes tagged:', backfill_note_tags())
+    done = backfill_research_tags()
+    if done is None:
+        print('research results skipped: research models (src.database) not available')
+    else:
+        print('research results tagged:', done)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
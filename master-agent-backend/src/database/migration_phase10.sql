@@ -0,0 +1,7 @@
+-- Phase 10: research analyses are only reused within the same analysis mode
+
+ALTER TABLE research_results
+ADD COLUMN IF NOT EXISTS analysis_mode VARCHAR(20);
+
+-- Earlier rows have an unknown mode (and a hash of truncated text), so they are
+-- left NULL and never matched by the freshness lookup; they age out of the window.
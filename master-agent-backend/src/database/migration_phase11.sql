@@ -0,0 +1,7 @@
+-- Phase 11: idempotent research job results
+
+ALTER TABLE research_results
+ADD COLUMN IF NOT EXISTS job_id VARCHAR(32);
+
+-- A reclaimed job re-runs; this lets it find (and never duplicate) the rows it already stored
+CREATE UNIQUE INDEX IF NOT EXISTS ix_research_results_job_url ON research_results (job_id, source_url);
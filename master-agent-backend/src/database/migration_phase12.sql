@@ -0,0 +1,11 @@
+-- Phase 12: the status / note_type filters of the list endpoints are paged newest first,
+-- so their indexes carry the (created_at, id) keyset order after the filter column
+
+DROP INDEX IF EXISTS ix_task_user_status;
+CREATE INDEX ix_task_user_status ON task (user_id, status, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS ix_goal_user_status;
+CREATE INDEX ix_goal_user_status ON goal (user_id, status, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS ix_note_user_type;
+CREATE INDEX ix_note_user_type ON note (user_id, note_type, created_at DESC, id DESC);
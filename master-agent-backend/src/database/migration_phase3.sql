@@ -0,0 +1,4 @@
+-- Phase 3: keep only the analyzed window in raw_text; full text is stored compressed on request
+
+ALTER TABLE research_results
+ADD COLUMN IF NOT EXISTS full_text BYTEA;
@@ -0,0 +1,10 @@
+-- Phase 4: URL canonicalization and content-hash dedup for research results
+
+ALTER TABLE research_results
+ADD COLUMN IF NOT EXISTS canonical_url TEXT;
+
+ALTER TABLE research_results
+ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS ix_research_results_canonical_url ON research_results (canonical_url, created_at);
+CREATE INDEX IF NOT EXISTS ix_research_results_content_hash ON research_results (content_hash, created_at);
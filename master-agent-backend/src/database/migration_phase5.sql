@@ -0,0 +1,9 @@
+-- Phase 5: per-user dashboard counters (maintained when DASHBOARD_COUNTERS=1)
+
+CREATE TABLE IF NOT EXISTS user_counter (
+    user_id INTEGER NOT NULL REFERENCES "user"(id) ON DELETE CASCADE,
+    entity VARCHAR(20) NOT NULL,
+    bucket VARCHAR(20) NOT NULL,
+    value INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, entity, bucket)
+);
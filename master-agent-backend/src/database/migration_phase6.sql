@@ -0,0 +1,14 @@
+-- Phase 6: composite indexes for the per-user list / filter / dashboard queries
+
+CREATE INDEX IF NOT EXISTS ix_task_user_status ON task (user_id, status);
+CREATE INDEX IF NOT EXISTS ix_task_user_created ON task (user_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS ix_goal_user_status ON goal (user_id, status);
+CREATE INDEX IF NOT EXISTS ix_goal_user_created ON goal (user_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS ix_note_user_type ON note (user_id, note_type);
+CREATE INDEX IF NOT EXISTS ix_note_user_created ON note (user_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS ix_conversation_user_created ON conversation (user_id, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS ix_research_results_user_created ON research_results (user_id, created_at);
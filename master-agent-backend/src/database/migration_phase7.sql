@@ -0,0 +1,17 @@
+-- Phase 7: keyset pagination orders list endpoints by (created_at DESC, id DESC);
+-- extend the per-user created_at indexes with id so the tie-break needs no sort
+
+DROP INDEX IF EXISTS ix_task_user_created;
+CREATE INDEX ix_task_user_created ON task (user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS ix_goal_user_created;
+CREATE INDEX ix_goal_user_created ON goal (user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS ix_note_user_created;
+CREATE INDEX ix_note_user_created ON note (user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS ix_conversation_user_created;
+CREATE INDEX ix_conversation_user_created ON conversation (user_id, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS ix_research_results_user_created;
+CREATE INDEX ix_research_results_user_created ON research_results (user_id, created_at, id);
@@ -0,0 +1,78 @@
+-- Phase 8: normalized tags for notes and research results
+-- (the JSON tags columns stay as a denormalized copy, kept in sync by the application)
+
+CREATE TABLE IF NOT EXISTS tag (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS note_tag (
+    note_id INTEGER NOT NULL REFERENCES note(id) ON DELETE CASCADE,
+    tag_id INTEGER NOT NULL REFERENCES tag(id) ON DELETE CASCADE,
+    PRIMARY KEY (note_id, tag_id)
+);
+CREATE INDEX IF NOT EXISTS ix_note_tag_tag ON note_tag (tag_id, note_id);
+
+CREATE TABLE IF NOT EXISTS research_tags (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS research_result_tag (
+    research_result_id INTEGER NOT NULL REFERENCES research_results(id) ON DELETE CASCADE,
+    tag_id INTEGER NOT NULL REFERENCES research_tags(id) ON DELETE CASCADE,
+    PRIMARY KEY (research_result_id, tag_id)
+);
+CREATE INDEX IF NOT EXISTS ix_research_result_tag_tag ON research_result_tag (tag_id, research_result_id);
+
+-- Backfill from the existing JSON tags (SQLite databases: python -m src.database.migrate_tags).
+-- Values that are not valid JSON, or not a JSON array, are skipped like migrate_tags does
+-- (note.tags is TEXT; research_results.tags is JSONB, see migration_phase2.sql).
+CREATE OR REPLACE FUNCTION phase8_tag_array(raw TEXT) RETURNS JSONB AS $$
+DECLARE
+    parsed JSONB;
+BEGIN
+    IF raw IS NULL OR btrim(raw) = '' THEN
+        RETURN '[]'::jsonb;
+    END IF;
+    BEGIN
+        parsed := raw::jsonb;
+    EXCEPTION WHEN others THEN
+        RETURN '[]'::jsonb;
+    END;
+    IF jsonb_typeof(parsed) = 'array' THEN
+        RETURN parsed;
+    END IF;
+    RETURN '[]'::jsonb;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+INSERT INTO tag (name)
+SELECT DISTINCT btrim(t.name)
+FROM note, jsonb_array_elements_text(phase8_tag_array(note.tags)) AS t(name)
+WHERE btrim(t.name) <> ''
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO note_tag (note_id, tag_id)
+SELECT DISTINCT note.id, tag.id
+FROM note, jsonb_array_elements_text(phase8_tag_array(note.tags)) AS t(name)
+JOIN tag ON tag.name = btrim(t.name)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO research_tags (name)
+SELECT DISTINCT btrim(t.name)
+FROM research_results, jsonb_array_elements_text(
+         CASE WHEN jsonb_typeof(research_results.tags) = 'array' THEN research_results.tags ELSE '[]'::jsonb END
+     ) AS t(name)
+WHERE btrim(t.name) <> ''
+ON CONFLICT (name) DO NOTHING;
+
+INSERT INTO research_result_tag (research_result_id, tag_id)
+SELECT DISTINCT research_results.id, research_tags.id
+FROM research_results, jsonb_array_elements_text(
+         CASE WHEN jsonb_typeof(research_results.tags) = 'array' THEN research_results.tags ELSE '[]'::jsonb END
+     ) AS t(name)
+JOIN research_tags ON research_tags.name = btrim(t.name)
+ON CONFLICT DO NOTHING;
+
+DROP FUNCTION phase8_tag_array(TEXT);
@@ -0,0 +1,8 @@
+-- Phase 9: background transcription of voice notes
+
+ALTER TABLE note
+ADD COLUMN IF NOT EXISTS transcription_status VARCHAR(20);
+
+-- Voice notes uploaded before this change were transcribed synchronously
+UPDATE note SET transcription_status = 'done'
+WHERE note_type = 'voice' AND transcription_status IS NULL;
@@ -0,0 +1,110 @@
+"""
+Query-plan regression check for the hot per-user queries.
+
+Runs EXPLAIN QUERY PLAN on every list/filter/dashboard query against a fresh
+SQLite schema and reports any full table scan or temp B-tree sort. The test
+suite asserts the same (tests/test_query_plans.py); to print the plans:
+
+    python -m src.database.query_plans
+
+Exits non-zero when a query regresses.
+"""
+import sys
+from datetime import datetime
+
+from flask import Flask
+from sqlalchemy import text
+
+from src.models.master_agent import Task, Goal, Note, Conversation, db
+from src.utils.dashboard_stats import grouped_counts_query
+from src.utils.pagination import keyset_query, encode_cursor, DEFAULT_PAGE_SIZE
+
+
+class _Cursor:
+    id = 1000
+    created_at = datetime(2024, 1, 1)
+
+
+def _page(query, model, after=False):
+    """A list endpoint page as issued by utils.pagination (first page, or one after a cursor)."""
+    cursor = encode_cursor(_Cursor) if after else None
+    return keyset_query(query, model, cursor).limit(DEFAULT_PAGE_SIZE + 1)
+
+
+def hot_queries(user_id=1):
+    """The queries issued by the list endpoints and the dashboard, keyed by name."""
+    return {
+        'get_tasks': _page(Task.query.filter_by(user_id=user_id), Task),
+        'get_tasks_next_page': _page(Task.query.filter_by(user_id=user_id), Task, after=True),
+        'get_tasks_by_status': _page(Task.query.filter_by(user_id=user_id, status='pending'), Task),
+        'get_goals': _page(Goal.query.filter_by(user_id=user_id), Goal),
+        'get_goals_next_page': _page(Goal.query.filter_by(user_id=user_id), Goal, after=True),
+        'get_goals_by_status': _page(Goal.query.filter_by(user_id=user_id, status='active'), Goal),
+        'get_notes': _page(Note.query.filter_by(user_id=user_id), Note),
+        'get_notes_next_page': _page(Note.query.filter_by(user_id=user_id), Note, after=True),
+        'get_notes_by_type': _page(Note.query.filter_by(user_id=user_id, note_type='voice'), Note),
+        'get_conversations': Conversation.query.filter_by(user_id=user_id)
+                                               .order_by(Conversation.created_at.desc()).limit(50),
+        'dashboard_task_counts': grouped_counts_query(Task, user_id),
+        'dashboard_goal_counts': grouped_counts_query(Goal, user_id),
+        'dashboard_note_counts': grouped_counts_query(Note, user_id),
+        'dashboard_recent_tasks': Task.query.filter_by(user_id=user_id)
+                                            .order_by(Task.created_at.desc()).limit(5),
+        'dashboard_recent_notes': Note.query.filter_by(user_id=user_id)
+                                            .order_by(Note.created_at.desc()).limit(5),
+    }
+
+
+def research_hot_queries(session, user_id=1):
+    """The research list queries (routes.research.list_research), built on a session of the research Base."""
+    from src.models.research_result import ResearchResult
+    query = session.query(ResearchResult).filter_by(user_id=user_id)
+    return {
+        'list_research': _page(query, ResearchResult),
+        'list_research_next_page': _page(query, ResearchResult, after=True),
+    }
+
+
+def explain(query, session=None):
+    """EXPLAIN QUERY PLAN detail lines for a SQLAlchemy query (on db.session unless `session` is given)."""
+    session = session or db.session
+    sql = query.statement.compile(dialect=session.get_bind().dialect, compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def plan_problems(plan):
+    """Plan lines that mean a full table scan or a sort the index should have avoided."""
+    problems = []
+    for detail in plan:
+        if detail.startswith('SCAN ') and 'COVERING INDEX' not in detail:
+            problems.append(detail)
+        elif 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def check_query_plans():
+    """{query name: [offending plan lines]} for every hot query that regressed."""
+    failures = {}
+    for name, query in hot_queries().items():
+        problems = plan_problems(explain(query))
+        if problems:
+            failures[name] = problems
+    return failures
+
+
+def main():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        failures = check_query_plans()
+        for name, query in hot_queries().items():
+            status = 'FAIL' if name in failures else 'ok'
+            print(f'{status:4} {name}: {" | ".join(explain(query))}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+SQLite FTS5 full-text index over notes, conversations and research results.
+
+Each source table gets an external-content FTS5 table (the text is not stored
+twice) kept in sync by AFTER INSERT/UPDATE/DELETE triggers, so plain ORM
+writes, bulk statements and raw SQL all stay indexed. Created on demand by
+ensure_search_index(), or explicitly:
+
+    python -m src.database.search_index [database-uri]
+
+Notes and conversations are indexed in the app database, research results in
+the research Base's database (src.database). A source whose table is missing or
+lacks the indexed columns is skipped and reported, and the others stay
+searchable. On databases other than SQLite nothing is created and search is
+unavailable.
+"""
+import logging
+import os
+import re
+import sys
+import time
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from src.models.master_agent import db
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER = 'porter unicode61 remove_diacritics 2'
+SNIPPET_TOKENS = 12
+
+# search type -> (source table, indexed columns, title column, bm25 column weights)
+SEARCH_SOURCES = {
+    'notes': ('note', ('title', 'content', 'transcription'), 'title', (2.0, 1.0, 1.0)),
+    'conversations': ('conversation', ('message', 'response'), None, (1.0, 1.0)),
+    'research': ('research_results', ('title', 'content_summary', 'raw_text'), 'title', (2.0, 1.5, 1.0)),
+}
+
+# While a source table is missing, the schema is re-checked at most this often
+RECHECK_SECONDS = int(os.getenv('SEARCH_INDEX_RECHECK_SECONDS', '60'))
+
+_installed = {}  # (engine url, search types) -> (types with an FTS table, time.monotonic() of the check)
+
+
+class SearchUnavailable(RuntimeError):
+    """The database has no FTS5 index (not SQLite, or FTS5 not compiled in)."""
+
+
+def _fts_table(table):
+    return f'{table}_fts'
+
+
+def _ddl(table, columns):
+    fts = _fts_table(table)
+    cols = ', '.join(columns)
+    new = ', '.join(f'new.{c}' for c in columns)
+    old = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', content_rowid='id', "
+        f"tokenize='{TOKENIZER}')",
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END",
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+        f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new}); END',
+        # Index rows that existed before the FTS table
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _source_engines():
+    """
+    ({search type: engine holding its source table}, {search type: reason skipped}).
+    Research results live on the research Base's own engine (src.database).
+    """
+    engines = {kind: db.engine for kind in SEARCH_SOURCES if kind != 'research'}
+    try:
+        from src.database.db_session import get_db
+    except ImportError:
+        return engines, {'research': 'research models (src.database) not available'}
+    session = get_db()
+    try:
+        engines['research'] = session.get_bind()
+    finally:
+        session.close()
+    return engines, {}
+
+
+def _by_engine(kinds, engines):
+    """Group search types by the engine their source table lives on, keeping their order."""
+    groups = {}
+    for kind in kinds:
+        groups.setdefault(engines[kind], []).append(kind)
+    return groups
+
+
+def _missing_columns(engine, table, columns, title):
+    present = {column['name'] for column in inspect(engine).get_columns(table)}
+    wanted = dict.fromkeys(['id', 'user_id', 'created_at', *columns] + ([title] if title else []))
+    return [c for c in wanted if c not in present]
+
+
+def install_search_index(engine, kinds=None):
+    """
+    Create the FTS tables and triggers on `engine` for the given search types
+    (all by default) whose source table is present with the expected columns.
+    Idempotent; returns (available search types, {skipped search type: reason}).
+    """
+    kinds = list(kinds or SEARCH_SOURCES)
+    if engine.dialect.name != 'sqlite':
+        return [], {kind: f'{engine.dialect.name} database (FTS5 needs SQLite)' for kind in kinds}
+    tables = set(inspect(engine).get_table_names())
+    available, skipped = [], {}
+    for kind in kinds:
+        table, columns, title, _ = SEARCH_SOURCES[kind]
+        if table not in tables:
+            skipped[kind] = f'no {table} table'
+            continue
+        # e.g. main.py's own research_results (url/content/summary) has none of the indexed columns
+        missing = _missing_columns(engine, table, columns, title)
+        if missing:
+            skipped[kind] = f"{table} has no {', '.join(missing)} column(s)"
+            continue
+        try:
+            with engine.begin() as conn:
+                if _fts_table(table) not in tables:
+                    for statement in _ddl(table, columns):
+                        conn.execute(text(statement))
+        except OperationalError as e:
+            if 'fts5' in str(e):
+                # "no such module: fts5"
+                return [], {kind: 'FTS5 not available' for kind in kinds}
+            skipped[kind] = str(e.orig) if e.orig is not None else str(e)
+            continue
+        available.append(kind)
+    return available, skipped
+
+
+def ensure_search_index():
+    """
+    Install the index on each source's engine and return {search type: engine}
+    for the available types. Cached per engine; while a source is missing (e.g.
+    research_results, created by another service) the cached result expires
+    after RECHECK_SECONDS, so a table created later gets its FTS table and
+    triggers without probing the schema on every search. Skipped sources are
+    logged when checked.
+    """
+    engines, _ = _source_engines()
+    now = time.monotonic()
+    available = {}
+    for engine, kinds in _by_engine(list(engines), engines).items():
+        key = (str(engine.url), tuple(kinds))
+        cached = _installed.get(key)
+        if cached is None or (len(cached[0]) < len(kinds) and now - cached[1] >= RECHECK_SECONDS):
+            installed, skipped = install_search_index(engine, kinds)
+            for kind, reason in skipped.items():
+                logger.warning('Search over %s unavailable: %s', kind, reason)
+            cached = _installed[key] = (installed, now)
+        available.update((kind, engine) for kind in cached[0])
+    return available
+
+
+def match_expression(query):
+    """
+    Turn free user input into a safe FTS5 query: every word must match, the last
+    one as a prefix (search-as-you-type). FTS operators in the input are ignored.
+    """
+    terms = re.findall(r'\w+', query or '')
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _select(kind):
+    table, columns, title, weights = SEARCH_SOURCES[kind]
+    fts = _fts_table(table)
+    title_sql = f'{table}.{title}' if title else 'NULL'
+    return (
+        f"SELECT '{kind}' AS type, {table}.id AS id, {title_sql} AS title, {table}.created_at AS created_at, "
+        f"snippet({fts}, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet, "
+        f"bm25({fts}, {', '.join(str(w) for w in weights)}) AS score "
+        f'FROM {fts} JOIN {table} ON {table}.id = {fts}.rowid '
+        f'WHERE {fts} MATCH :match AND {table}.user_id = :user_id'
+    )
+
+
+def search(user_id, query, kinds=None, limit=20, offset=0):
+    """
+    Ranked matches for `query` across the given search types (all available by
+    default), best first. Returns (rows, has_more); each row is a dict with
+    type, id, title, created_at, snippet and score (bm25, lower is better).
+    """
+    available = ensure_search_index()
+    if not available:
+        raise SearchUnavailable('Full-text search requires SQLite with FTS5')
+    match = match_expression(query)
+    if match is None:
+        return [], False
+
+    kinds = [k for k in (kinds or available) if k in available]
+    if not kinds:
+        return [], False
+    groups = _by_engine(kinds, available)
+    rows = []
+    for engine, group in groups.items():
+        # One engine: page in SQL. Several: take each engine's best offset + limit + 1 and merge
+        sql = ' UNION ALL '.join(_select(k) for k in group) + ' ORDER BY score, id LIMIT :limit OFFSET :offset'
+        params = {'match': match, 'user_id': user_id, 'limit': limit + 1, 'offset': offset} if len(groups) == 1 \
+            else {'match': match, 'user_id': user_id, 'limit': offset + limit + 1, 'offset': 0}
+        with engine.connect() as conn:
+            rows.extend(dict(row) for row in conn.execute(text(sql), params).mappings())
+    if len(groups) > 1:
+        rows.sort(key=lambda row: (row['score'], row['id']))
+        rows = rows[offset:]
+
+    results = []
+    for result in rows[:limit]:
+        if isinstance(result['created_at'], str):
+            # Raw SQLite DATETIME text; match the ISO format to_dict() uses
+            result['created_at'] = result['created_at'].replace(' ', 'T', 1)
+        results.append(result)
+    return results, len(rows) > limit
+
+
+def main(argv=None):
+    from flask import Flask
+
+    argv = sys.argv[1:] if argv is None else argv
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = argv[0] if argv else \
+        f"sqlite:///{os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.db')}"
+    db.init_app(app)
+    with app.app_context():
+        engines, skipped = _source_engines()
+        available = []
+        for engine, kinds in _by_engine(list(engines), engines).items():
+            installed, reasons = install_search_index(engine, kinds)
+            available += installed
+            skipped.update(reasons)
+    print('search index:', ', '.join(available) or 'not available')
+    for kind, reason in skipped.items():
+        print(f'skipped {kind}: {reason}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,22 +1,91 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import os, sqlite3, json, requests, logging
+import os, sqlite3, json, requests, logging, threading
+from contextlib import contextmanager
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app)
+# Let cross-origin clients read the keyset cursor (utils.pagination.NEXT_CURSOR_HEADER)
+CORS(app, expose_headers=["X-Next-Cursor"])
 
 # --- SQLite path (App Engine allows writes only in /tmp) ---
 DB_PATH = "/tmp/master_agent.db"
 
+class SQLitePool:
+    """
+    One long-lived connection per worker thread, in WAL mode so readers don't
+    block the writer. Keeping connections open also keeps sqlite3's per-connection
+    prepared-statement cache warm. Writes go through write(), which takes a
+    process-wide lock (when serialize_writes is on) and BEGIN IMMEDIATE, so
+    concurrent writers queue up instead of failing with "database is locked".
+    """
+
+    def __init__(self, path, serialize_writes=True, busy_timeout_ms=5000,
+                 mmap_size=64 * 1024 * 1024, cache_size_kib=16 * 1024, cached_statements=128):
+        self.path = path
+        self.serialize_writes = serialize_writes
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000,
+                               isolation_level=None, cached_statements=self.cached_statements)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")  # negative = KiB
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @contextmanager
+    def write(self):
+        """Run a write transaction; commits on success, rolls back on error."""
+        # Opened before taking the lock, so a connection that fails to open never leaves it held
+        conn = self.connection()
+        lock = self._write_lock if self.serialize_writes else None
+        if lock:
+            lock.acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            if lock:
+                lock.release()
+
+pool = SQLitePool(
+    DB_PATH,
+    serialize_writes=os.environ.get("SQLITE_SERIALIZE_WRITES", "1") == "1",
+    busy_timeout_ms=int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+)
+
 def get_conn():
-    return sqlite3.connect(DB_PATH)
+    """This thread's pooled connection; do not close it."""
+    return pool.connection()
 
 def init_db():
-    conn = get_conn()
-    c = conn.cursor()
+    with pool.write() as conn:
+        _create_schema(conn.cursor())
+    logger.info("DB initialized at %s", DB_PATH)
+
+def _create_schema(c):
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -46,8 +115,6 @@ def init_db():
     if c.fetchone()[0] == 0:
         c.execute("INSERT INTO users (username, email) VALUES (?, ?)",
                   ("default_user", "user@example.com"))
-    conn.commit(); conn.close()
-    logger.info("DB initialized at %s", DB_PATH)
 
 @app.before_first_request
 def _init():
@@ -60,17 +127,16 @@ def home():
 
 @app.route('/api/settings')
 def get_settings():
-    conn = get_conn(); c = conn.cursor()
+    c = get_conn().cursor()
     c.execute("SELECT gemini_api_key FROM users WHERE username=?", ("default_user",))
-    r = c.fetchone(); conn.close()
+    r = c.fetchone()
     return jsonify({"gemini_api_key": r[0] if r else "", "google_calendar_connected": False})
 
 @app.route('/api/settings/save', methods=["POST"])
 def save_settings():
     d = request.get_json()
-    conn = get_conn(); c = conn.cursor()
-    c.execute("UPDATE users SET gemini_api_key=? WHERE username=?", (d.get("gemini_api_key"), "default_user"))
-    conn.commit(); conn.close()
+    with pool.write() as conn:
+        conn.execute("UPDATE users SET gemini_api_key=? WHERE username=?", (d.get("gemini_api_key"), "default_user"))
     return jsonify({"message": "saved"})
 
 # (keep your other routes if needed… simplified here)
@@ -2,6 +2,8 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import json
 
+from src.models.tagging import normalize_tags, parse_tag_json, resolve_tags
+
 db = SQLAlchemy()
 
 class User(db.Model):
@@ -38,6 +40,14 @@ class Task(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    STATUSES = ('pending', 'in_progress', 'completed')
+    PRIORITIES = ('low', 'medium', 'high')
+
+    __table_args__ = (
+        db.Index('ix_task_user_status', user_id, status, created_at.desc(), id.desc()),
+        db.Index('ix_task_user_created', user_id, created_at.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f'<Task {self.title}>'
 
@@ -65,6 +75,13 @@ class Goal(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    STATUSES = ('active', 'completed', 'paused')
+
+    __table_args__ = (
+        db.Index('ix_goal_user_status', user_id, status, created_at.desc(), id.desc()),
+        db.Index('ix_goal_user_created', user_id, created_at.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f'<Goal {self.title}>'
 
@@ -81,6 +98,45 @@ class Goal(db.Model):
             'user_id': self.user_id
         }
 
+note_tag = db.Table(
+    'note_tag',
+    db.Column('note_id', db.Integer, db.ForeignKey('note.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    # Tag filter / tag counts: tag -> notes
+    db.Index('ix_note_tag_tag', 'tag_id', 'note_id'),
+)
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
+
+    normalize = staticmethod(normalize_tags)
+
+    @classmethod
+    def resolve(cls, names):
+        """
+        {name: Tag} for the given names, inserting the missing ones in the current
+        transaction (a tag created concurrently by another request is reused).
+        """
+        return resolve_tags(db.session, cls, names)
+
+    @classmethod
+    def link_notes(cls, note_tags):
+        """
+        Replace the note_tag rows for {note_id: [names]} without loading the notes
+        (bulk writes and backfills); one DELETE plus one executemany INSERT.
+        """
+        tags = cls.resolve({name for names in note_tags.values() for name in names})
+        db.session.flush()
+        db.session.execute(note_tag.delete().where(note_tag.c.note_id.in_(list(note_tags))))
+        links = [{'note_id': note_id, 'tag_id': tags[name].id}
+                 for note_id, names in note_tags.items() for name in cls.normalize(names)]
+        if links:
+            db.session.execute(note_tag.insert(), links)
+
 class Note(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200))
@@ -88,11 +144,21 @@ class Note(db.Model):
     note_type = db.Column(db.String(20), default='text')  # text, voice
     audio_file_path = db.Column(db.String(500))  # for voice notes
     transcription = db.Column(db.Text)  # transcribed text for voice notes
-    tags = db.Column(db.Text)  # JSON string of tags
+    transcription_status = db.Column(db.String(20))  # voice notes: pending, processing, done, failed
+    tags = db.Column(db.Text)  # JSON copy of the note's tags, kept in sync by set_tags (see note_tag)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    NOTE_TYPES = ('text', 'voice')
+
+    __table_args__ = (
+        db.Index('ix_note_user_type', user_id, note_type, created_at.desc(), id.desc()),
+        db.Index('ix_note_user_created', user_id, created_at.desc(), id.desc()),
+    )
+
+    tag_list = db.relationship('Tag', secondary=note_tag, lazy='selectin', order_by='Tag.name')
+
     def __repr__(self):
         return f'<Note {self.title or "Untitled"}>'
 
@@ -104,17 +170,32 @@ class Note(db.Model):
             'note_type': self.note_type,
             'audio_file_path': self.audio_file_path,
             'transcription': self.transcription,
-            'tags': json.loads(self.tags) if self.tags else [],
+            'transcription_status': self.transcription_status,
+            'tags': self.get_tags(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'user_id': self.user_id
         }
 
     def set_tags(self, tags_list):
-        self.tags = json.dumps(tags_list)
+        tags = Tag.resolve(tags_list)
+        self.tag_list = list(tags.values())
+        self.tags = json.dumps(list(tags))
 
     def get_tags(self):
-        return json.loads(self.tags) if self.tags else []
+        if self.tag_list:
+            return [tag.name for tag in self.tag_list]
+        # Notes not yet linked by the tag backfill (migrate_tags / phase 8) still carry the JSON copy
+        return normalize_tags(parse_tag_json(self.tags))
+
+    @classmethod
+    def unreferenced_audio(cls, paths):
+        """The audio files among `paths` that no note points to any more (stored audio is deduplicated)."""
+        paths = {p for p in paths if p}
+        if not paths:
+            return []
+        in_use = {p for (p,) in db.session.query(cls.audio_file_path).filter(cls.audio_file_path.in_(paths))}
+        return sorted(paths - in_use)
 
 class Conversation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -124,6 +205,10 @@ class Conversation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_conversation_user_created', user_id, created_at.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f'<Conversation {self.id}>'
 
@@ -137,3 +222,12 @@ class Conversation(db.Model):
             'user_id': self.user_id
         }
 
+class UserCounter(db.Model):
+    """Per-user running totals behind the dashboard, kept up to date by src.utils.dashboard_stats."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    entity = db.Column(db.String(20), primary_key=True)  # task, goal, note
+    bucket = db.Column(db.String(20), primary_key=True)  # '_total' or a status / note_type value
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserCounter {self.user_id} {self.entity}.{self.bucket}={self.value}>'
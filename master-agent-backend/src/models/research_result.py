@@ -1,33 +1,76 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, LargeBinary, Index, Table
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import zlib
 
 from ..database.base import Base
+from .tagging import normalize_tags, resolve_tags
+
+
+research_result_tag = Table(
+    "research_result_tag",
+    Base.metadata,
+    Column("research_result_id", Integer, ForeignKey("research_results.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("research_tags.id", ondelete="CASCADE"), primary_key=True),
+    # Tag filter / tag counts: tag -> results
+    Index("ix_research_result_tag_tag", "tag_id", "research_result_id"),
+)
+
+
+class ResearchTag(Base):
+    __tablename__ = "research_tags"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+    normalize = staticmethod(normalize_tags)
+
+    @classmethod
+    def resolve(cls, session, names) -> dict:
+        """
+        {name: ResearchTag} for the given names, inserting the missing ones in
+        `session` (a tag created concurrently by another job is reused).
+        """
+        return resolve_tags(session, cls, names)
 
 
 class ResearchResult(Base):
     __tablename__ = "research_results"
+    __table_args__ = (
+        # Dedup lookups: same canonical URL / content within a freshness window
+        Index("ix_research_results_canonical_url", "canonical_url", "created_at"),
+        Index("ix_research_results_content_hash", "content_hash", "created_at"),
+        # List view: a user's results, newest first
+        Index("ix_research_results_user_created", "user_id", "created_at", "id"),
+        # A re-run of a reclaimed job finds the rows it already stored
+        Index("ix_research_results_job_url", "job_id", "source_url", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
 
     # Original source info
     source_url = Column(String(2048), nullable=False)
+    job_id = Column(String(32), nullable=True)  # queue job that stored the row (utils.job_queue)
+    canonical_url = Column(String(2048), nullable=True)  # see utils.url_utils.canonicalize_url
     source_type = Column(String(100), nullable=False)  # e.g., 'pdf', 'web', 'video'
     title = Column(String(512), nullable=True)
     author = Column(String(256), nullable=True)
     published_at = Column(DateTime, nullable=True)
 
     # Extracted content
-    raw_text = Column(Text, nullable=True)
+    raw_text = Column(Text, nullable=True)  # truncated to the analyzer's input window
+    full_text = Column(LargeBinary, nullable=True)  # zlib-compressed full text, only when requested
+    content_hash = Column(String(64), nullable=True)  # sha256 of the normalized text the analyzer read (see routes.research._extract)
     content_summary = Column(Text, nullable=True)
     key_points = Column(JSON, nullable=True)  # list of strings
-    tags = Column(JSON, nullable=True)        # list of strings
+    tags = Column(JSON, nullable=True)        # list of strings; indexed through research_result_tag
 
     # AI analysis
     sentiment = Column(String(50), nullable=True)  # e.g., 'positive', 'neutral', 'negative'
     importance_score = Column(Integer, nullable=True)  # 1-100
     category = Column(String(100), nullable=True)      # e.g., 'economics', 'healthcare'
+    analysis_mode = Column(String(20), nullable=True)  # 'single', 'chunked' or 'chunked:<token budget>'; analyses are reused per mode
 
     # File storage references (if any)
     storage_key = Column(String(512), nullable=True)  # e.g., GCS object path
@@ -39,17 +82,33 @@ class ResearchResult(Base):
 
     # Relationships
     user = relationship("User", back_populates="research_results")
+    tag_list = relationship("ResearchTag", secondary=research_result_tag, order_by="ResearchTag.name")
+
+    def set_full_text(self, text: str):
+        self.full_text = zlib.compress(text.encode("utf-8")) if text else None
+
+    def sync_tags(self, session):
+        """Mirror the `tags` JSON list into the tag index (call before committing)."""
+        tags = ResearchTag.resolve(session, self.tags)
+        self.tags = list(tags) or None
+        self.tag_list = list(tags.values())
+
+    def get_full_text(self):
+        return zlib.decompress(self.full_text).decode("utf-8") if self.full_text else None
 
     def to_dict(self):
         return {
             "id": self.id,
             "user_id": self.user_id,
             "source_url": self.source_url,
+            "canonical_url": self.canonical_url,
             "source_type": self.source_type,
             "title": self.title,
             "author": self.author,
             "published_at": self.published_at.isoformat() if self.published_at else None,
             "raw_text": self.raw_text,
+            "has_full_text": self.full_text is not None,
+            "content_hash": self.content_hash,
             "content_summary": self.content_summary,
             "key_points": self.key_points,
             "tags": self.tags,
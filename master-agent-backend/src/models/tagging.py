@@ -0,0 +1,69 @@
+"""Tag helpers shared by the note tags (models.master_agent) and research tags (models.research_result)."""
+import json
+
+from sqlalchemy import func
+
+
+def normalize_tags(names):
+    """Strip, collapse whitespace and de-duplicate tag names, keeping their order."""
+    seen = []
+    for name in names or []:
+        name = ' '.join(str(name).split())[:100]
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
+
+def tag_name_matches(column, raw):
+    """
+    Filter condition for a ?tag= query parameter: the value is normalized like
+    stored names and compared case-insensitively. None when the value is blank.
+    """
+    names = normalize_tags([raw])
+    if not names:
+        return None
+    return func.lower(column) == names[0].lower()
+
+
+def parse_tag_json(raw):
+    """The tag list in a JSON tags column value, or None when it is not valid JSON or not a list."""
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw) if raw.strip() else None
+        except ValueError:
+            return None
+    return raw if isinstance(raw, list) else None
+
+
+def insert_missing(session, table, column, values):
+    """
+    INSERT ... ON CONFLICT DO NOTHING of `values` into a unique column, so two
+    requests or jobs creating the same row concurrently do not fail on the constraint.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        session.execute(table.insert(), [{column: value} for value in values])
+        return
+    session.execute(insert(table).on_conflict_do_nothing(index_elements=[column]),
+                    [{column: value} for value in values])
+
+
+def resolve_tags(session, model, names):
+    """
+    {name: tag} for the given names, inserting the missing `model` rows in
+    `session` (a tag created concurrently elsewhere is reused).
+    """
+    names = normalize_tags(names)
+    if not names:
+        return {}
+    with session.no_autoflush:
+        tags = {tag.name: tag for tag in session.query(model).filter(model.name.in_(names))}
+        missing = [name for name in names if name not in tags]
+        if missing:
+            insert_missing(session, model.__table__, 'name', missing)
+            tags.update((tag.name, tag) for tag in session.query(model).filter(model.name.in_(missing)))
+    return tags
@@ -0,0 +1,144 @@
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from src.models.master_agent import Task, Goal, Note, Conversation
+import os
+import json
+import zlib
+
+export_bp = Blueprint('export', __name__)
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '500'))
+# Serialized lines are written out in chunks of roughly this many bytes
+EXPORT_CHUNK_BYTES = 64 * 1024
+GZIP_LEVEL = 6
+
+
+def _model_records(model, user_id):
+    # yield_per streams the result (stream_results) instead of buffering every row
+    query = model.query.filter_by(user_id=user_id).order_by(model.id).yield_per(EXPORT_BATCH_SIZE)
+    for obj in query:
+        yield obj.to_dict()
+
+
+def _research_unavailable():
+    """Why research results cannot be exported in this checkout, or None."""
+    try:
+        from src.database.db_session import get_db  # noqa: F401
+        from src.models.research_result import ResearchResult  # noqa: F401
+    except ImportError as e:
+        return f'research models not available ({e})'
+    return None
+
+
+def _research_records(user_id):
+    # The research models live on a separate Base; imported here so a checkout without
+    # them still exports tasks, goals, notes and conversations
+    from src.database.db_session import get_db
+    from src.models.research_result import ResearchResult
+
+    db = get_db()
+    try:
+        query = (
+            db.query(ResearchResult)
+            .filter_by(user_id=user_id)
+            .order_by(ResearchResult.id)
+            .yield_per(EXPORT_BATCH_SIZE)
+        )
+        for result in query:
+            yield result.to_dict()
+    finally:
+        db.close()
+
+
+EXPORTERS = {
+    'tasks': lambda user_id: _model_records(Task, user_id),
+    'goals': lambda user_id: _model_records(Goal, user_id),
+    'notes': lambda user_id: _model_records(Note, user_id),
+    'conversations': lambda user_id: _model_records(Conversation, user_id),
+    'research': _research_records,
+}
+
+# kind -> check returning why the kind's source is missing (None when it can be exported)
+SOURCE_CHECKS = {
+    'research': _research_unavailable,
+}
+
+
+def _unavailable(kind):
+    check = SOURCE_CHECKS.get(kind)
+    return check() if check else None
+
+
+def _ndjson_lines(user_id, kinds):
+    """One JSON object per line: {"type": <kind>, "data": <to_dict()>}."""
+    try:
+        for kind in kinds:
+            for record in EXPORTERS[kind](user_id):
+                yield json.dumps({'type': kind, 'data': record}, default=str) + '\n'
+    except Exception as e:
+        # Headers are already sent, so the failure is reported in-band as the last line
+        yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+
+def _chunked(lines):
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _gzipped(chunks):
+    # wbits=31: gzip container, compressed incrementally as chunks are produced
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _wants_gzip():
+    flag = request.args.get('gzip')
+    if flag is not None:
+        return flag.lower() in ('1', 'true', 'yes')
+    return request.accept_encodings['gzip'] > 0
+
+
+@export_bp.route('/export', methods=['GET'])
+def export_user_data():
+    """
+    Stream all of a user's data as NDJSON.
+    Query params: user_id, types (comma-separated subset of tasks, goals, notes,
+    conversations, research), gzip (1/0; defaults to the Accept-Encoding header).
+    By default every type whose source is available is exported; explicitly
+    requesting one that is not gives a 501 before anything is streamed.
+    """
+    user_id = request.args.get('user_id', 1, type=int)
+    types = request.args.get('types')
+    if types:
+        kinds = [k.strip() for k in types.split(',') if k.strip()]
+        unknown = [k for k in kinds if k not in EXPORTERS]
+        if unknown:
+            return jsonify({'error': f"Unknown export types: {', '.join(unknown)}"}), 400
+        missing = [f'{k}: {_unavailable(k)}' for k in kinds if _unavailable(k)]
+        if missing:
+            return jsonify({'error': '; '.join(missing)}), 501
+    else:
+        kinds = [k for k in EXPORTERS if not _unavailable(k)]
+
+    body = _chunked(_ndjson_lines(user_id, kinds))
+    headers = {
+        'Content-Disposition': f'attachment; filename=export_user_{user_id}.ndjson',
+        'Vary': 'Accept-Encoding',
+        'X-Accel-Buffering': 'no',
+    }
+    if _wants_gzip():
+        body = _gzipped(body)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(body), mimetype='application/x-ndjson', headers=headers)
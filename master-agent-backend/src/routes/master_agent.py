@@ -1,6 +1,15 @@
-from flask import Blueprint, jsonify, request, current_app
-from src.models.master_agent import User, Task, Goal, Note, Conversation, db
+from flask import Blueprint, jsonify, request, current_app, send_file
+from src.models.master_agent import User, Task, Goal, Note, Conversation, Tag, note_tag, db
+from src.models.tagging import tag_name_matches
+from src.utils.dashboard_stats import get_counts, TOTAL
+from src.utils.pagination import paginated_response, PaginationError
+from src.utils.bulk_ops import apply_bulk, check_choices, BulkError
+from src.utils.embedding_store import index_in_background, remove_from_index
+from src.utils.job_queue import get_job_queue
+from src.utils.audio_store import get_audio_store
+from src.utils.intent_router import default_router as intent_router
 from datetime import datetime
+import io
 import os
 import json
 import uuid
@@ -35,27 +44,21 @@ def chat():
         return jsonify({'error': str(e)}), 500
 
 def generate_response(message):
-    """Simple response generator - can be enhanced with LLM integration"""
-    message_lower = message.lower()
-    
-    if 'task' in message_lower and ('create' in message_lower or 'add' in message_lower):
-        return "I can help you create a task. Please use the task management interface or tell me more details about the task."
-    elif 'goal' in message_lower:
-        return "I can help you with goal tracking. What goal would you like to work on?"
-    elif 'note' in message_lower:
-        return "I can help you take notes. Would you like to create a text note or voice note?"
-    elif 'hello' in message_lower or 'hi' in message_lower:
-        return "Hello! I'm your Master Agent. I can help you manage tasks, track goals, take notes, and organize your life. How can I assist you today?"
-    else:
-        return "I understand you're asking about: " + message + ". How can I help you with this?"
+    """Simple response generator - can be enhanced with LLM integration (intents: utils.intent_router.INTENTS)"""
+    return intent_router.respond(message)
 
 # Task management endpoints
 @master_agent_bp.route('/tasks', methods=['GET'])
 def get_tasks():
     try:
         user_id = request.args.get('user_id', 1, type=int)
-        tasks = Task.query.filter_by(user_id=user_id).all()
-        return jsonify([task.to_dict() for task in tasks])
+        query = Task.query.filter_by(user_id=user_id)
+        status = request.args.get('status')
+        if status:
+            query = query.filter_by(status=status)
+        return paginated_response(query, Task, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -63,6 +66,7 @@ def get_tasks():
 def create_task():
     try:
         data = request.json
+        check_choices(Task, data)
         task = Task(
             title=data['title'],
             description=data.get('description', ''),
@@ -74,6 +78,8 @@ def create_task():
         db.session.add(task)
         db.session.commit()
         return jsonify(task.to_dict()), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -82,6 +88,7 @@ def update_task(task_id):
     try:
         task = Task.query.get_or_404(task_id)
         data = request.json
+        check_choices(Task, data)
         
         task.title = data.get('title', task.title)
         task.description = data.get('description', task.description)
@@ -92,6 +99,8 @@ def update_task(task_id):
         
         db.session.commit()
         return jsonify(task.to_dict())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -110,8 +119,13 @@ def delete_task(task_id):
 def get_goals():
     try:
         user_id = request.args.get('user_id', 1, type=int)
-        goals = Goal.query.filter_by(user_id=user_id).all()
-        return jsonify([goal.to_dict() for goal in goals])
+        query = Goal.query.filter_by(user_id=user_id)
+        status = request.args.get('status')
+        if status:
+            query = query.filter_by(status=status)
+        return paginated_response(query, Goal, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -119,6 +133,7 @@ def get_goals():
 def create_goal():
     try:
         data = request.json
+        check_choices(Goal, data)
         goal = Goal(
             title=data['title'],
             description=data.get('description', ''),
@@ -130,6 +145,8 @@ def create_goal():
         db.session.add(goal)
         db.session.commit()
         return jsonify(goal.to_dict()), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -138,6 +155,7 @@ def update_goal(goal_id):
     try:
         goal = Goal.query.get_or_404(goal_id)
         data = request.json
+        check_choices(Goal, data)
         
         goal.title = data.get('title', goal.title)
         goal.description = data.get('description', goal.description)
@@ -148,6 +166,8 @@ def update_goal(goal_id):
         
         db.session.commit()
         return jsonify(goal.to_dict())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -166,8 +186,16 @@ def delete_goal(goal_id):
 def get_notes():
     try:
         user_id = request.args.get('user_id', 1, type=int)
-        notes = Note.query.filter_by(user_id=user_id).all()
-        return jsonify([note.to_dict() for note in notes])
+        query = Note.query.filter_by(user_id=user_id)
+        note_type = request.args.get('note_type')
+        if note_type:
+            query = query.filter_by(note_type=note_type)
+        tag = tag_name_matches(Tag.name, request.args.get('tag'))
+        if tag is not None:
+            query = query.filter(Note.tag_list.any(tag))  # EXISTS: 'Work' and 'work' on one note match once
+        return paginated_response(query, Note, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -175,6 +203,7 @@ def get_notes():
 def create_note():
     try:
         data = request.json
+        check_choices(Note, data)
         note = Note(
             title=data.get('title', ''),
             content=data.get('content', ''),
@@ -188,7 +217,10 @@ def create_note():
         
         db.session.add(note)
         db.session.commit()
+        index_in_background('notes', [(note.id, note.content)])
         return jsonify(note.to_dict()), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -206,6 +238,7 @@ def update_note(note_id):
             note.set_tags(data['tags'])
         
         db.session.commit()
+        index_in_background('notes', [(note.id, note.content)])
         return jsonify(note.to_dict())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -214,20 +247,132 @@ def update_note(note_id):
 def delete_note(note_id):
     try:
         note = Note.query.get_or_404(note_id)
-        
-        # Delete audio file if it exists
-        if note.audio_file_path and os.path.exists(note.audio_file_path):
-            os.remove(note.audio_file_path)
+        audio_file_path = note.audio_file_path
         
         db.session.delete(note)
         db.session.commit()
+        
+        # Delete the audio file unless another note shares it (stored audio is deduplicated)
+        get_audio_store(current_app.root_path).discard([audio_file_path], Note.unreferenced_audio)
+        remove_from_index('notes', [note_id])
         return '', 204
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@master_agent_bp.route('/tags', methods=['GET'])
+def get_tags():
+    """Tags used by a user's notes with how many notes carry each, most used first."""
+    try:
+        user_id = request.args.get('user_id', 1, type=int)
+        count = db.func.count()
+        rows = db.session.query(Tag.name, count) \
+            .join(note_tag, note_tag.c.tag_id == Tag.id) \
+            .join(Note, Note.id == note_tag.c.note_id) \
+            .filter(Note.user_id == user_id) \
+            .group_by(Tag.name) \
+            .order_by(count.desc(), Tag.name) \
+            .all()
+        return jsonify([{'tag': name, 'count': n} for name, n in rows])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Bulk endpoints: {"user_id", "create": [...], "update": [{"id", ...}], "delete": [ids], "atomic": false}
+def _bulk(model):
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Expected a JSON object'}), 400
+        results, applied = apply_bulk(model, data.get('user_id', 1), data, atomic=bool(data.get('atomic')))
+        return jsonify({'applied': applied, 'results': results}), 200 if applied else 422
+    except BulkError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@master_agent_bp.route('/tasks/bulk', methods=['POST'])
+def bulk_tasks():
+    return _bulk(Task)
+
+@master_agent_bp.route('/goals/bulk', methods=['POST'])
+def bulk_goals():
+    return _bulk(Goal)
+
+@master_agent_bp.route('/notes/bulk', methods=['POST'])
+def bulk_notes():
+    return _bulk(Note)
+
 # Voice note upload endpoint
+TRANSCRIPTION_PENDING = 'pending'
+TRANSCRIPTION_PROCESSING = 'processing'
+TRANSCRIPTION_DONE = 'done'
+TRANSCRIPTION_FAILED = 'failed'
+
+def _set_transcription(app, note_id, status, transcription=None, remove_audio=False, stored_path=None):
+    with app.app_context():
+        note = Note.query.get(note_id)
+        if note is None:
+            return None
+        note.transcription_status = status
+        if transcription is not None:
+            note.transcription = transcription
+        upload_path = note.audio_file_path
+        if remove_audio:
+            note.audio_file_path = None
+        elif stored_path:
+            note.audio_file_path = stored_path
+        db.session.commit()
+        # The raw upload is dropped once the note points at the stored copy (or at nothing)
+        if upload_path and upload_path != note.audio_file_path and os.path.exists(upload_path):
+            os.remove(upload_path)
+        if status == TRANSCRIPTION_DONE:
+            index_in_background('notes', [(note.id, note.content)])
+        return note.to_dict()
+
+def _run_transcription_job(app, job_id, payload, queue):
+    """Job handler: validate + transcribe a voice note on the process pool, then update the note."""
+    note_id = payload['note_id']
+    _set_transcription(app, note_id, TRANSCRIPTION_PROCESSING)
+    try:
+        from src.utils.speech_processing import process_voice_note_in_pool
+        outcome = process_voice_note_in_pool(payload['file_path'], payload.get('store_dir'))
+    except ImportError:
+        _set_transcription(app, note_id, TRANSCRIPTION_FAILED,
+                           "Transcription not available - speech processing dependencies not installed")
+        return {'note_id': note_id, 'status': TRANSCRIPTION_FAILED}
+    except Exception as e:
+        _set_transcription(app, note_id, TRANSCRIPTION_FAILED, f"Transcription failed: {str(e)}")
+        raise
+
+    if not outcome['valid']:
+        _set_transcription(app, note_id, TRANSCRIPTION_FAILED, f"Invalid audio file: {outcome['message']}",
+                           remove_audio=True)
+        return {'note_id': note_id, 'status': TRANSCRIPTION_FAILED, 'error': outcome['message']}
+
+    _set_transcription(app, note_id, TRANSCRIPTION_DONE, outcome['transcription'],
+                       stored_path=outcome.get('stored_path'))
+    return {'note_id': note_id, 'status': TRANSCRIPTION_DONE, 'duration': outcome['duration']}
+
+job_queue = get_job_queue()
+# Transcription has worker threads of its own, so minutes-long research jobs in the
+# shared pool cannot hold up voice notes
+TRANSCRIPTION_JOB_WORKERS = int(os.getenv('TRANSCRIPTION_JOB_WORKERS', '2'))
+
+# The handler needs the app for a DB session, so it is registered together with the
+# blueprint: a process that never registers the blueprint never claims these jobs.
+@master_agent_bp.record_once
+def _register_transcription_job(state):
+    app = state.app
+    job_queue.register('transcribe_voice_note',
+                       lambda job_id, payload, queue: _run_transcription_job(app, job_id, payload, queue),
+                       workers=TRANSCRIPTION_JOB_WORKERS)
+
 @master_agent_bp.route('/notes/voice', methods=['POST'])
 def upload_voice_note():
+    """
+    Save the audio and create the note right away (transcription_status 'pending');
+    validation and transcription run in the background. Poll
+    GET /notes/<id>/transcription for the result.
+    """
     try:
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
@@ -240,47 +385,160 @@ def upload_voice_note():
         upload_dir = os.path.join(current_app.root_path, 'uploads', 'voice_notes')
         os.makedirs(upload_dir, exist_ok=True)
         
-        # Generate unique filename
-        filename = f"{uuid.uuid4()}.wav"
+        # Generate unique filename, keeping the upload's extension so its format can be detected
+        extension = os.path.splitext(audio_file.filename or '')[1].lower()
+        if not extension[1:].isalnum() or len(extension) > 6:
+            extension = '.wav'
+        filename = f"{uuid.uuid4()}{extension}"
         file_path = os.path.join(upload_dir, filename)
         
         # Save audio file
         audio_file.save(file_path)
         
-        # Import speech processing utilities
-        try:
-            from src.utils.speech_processing import transcribe_audio, validate_audio_file
-            
-            # Validate audio file
-            is_valid, validation_message = validate_audio_file(file_path)
-            if not is_valid:
-                os.remove(file_path)  # Clean up invalid file
-                return jsonify({'error': f'Invalid audio file: {validation_message}'}), 400
-            
-            # Transcribe audio to text
-            transcription = transcribe_audio(file_path)
-            
-        except ImportError:
-            transcription = "Transcription not available - speech processing dependencies not installed"
-        except Exception as e:
-            transcription = f"Transcription failed: {str(e)}"
-        
         # Create note record
         note = Note(
             title=title or f"Voice Note {datetime.now().strftime('%Y-%m-%d %H:%M')}",
             note_type='voice',
             audio_file_path=file_path,
-            transcription=transcription,
+            transcription_status=TRANSCRIPTION_PENDING,
             user_id=user_id
         )
         
         db.session.add(note)
         db.session.commit()
         
-        return jsonify(note.to_dict()), 201
+        job_id = job_queue.submit('transcribe_voice_note', {
+            'note_id': note.id,
+            'file_path': file_path,
+            # Transcoded to Opus and deduplicated by the worker; see utils.audio_store
+            'store_dir': get_audio_store(current_app.root_path).root,
+        })
+        return jsonify({**note.to_dict(), 'job_id': job_id}), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Streaming voice notes: raw 16-bit little-endian PCM is POSTed in chunks while the
+# user talks; finished segments are transcribed as they arrive (utils.voice_stream).
+# Sessions live in the process that started them, so route a stream to one worker.
+def _voice_stream_session(session_id):
+    from src.utils.voice_stream import get_session
+    return get_session(session_id)
+
+@master_agent_bp.route('/notes/voice/stream', methods=['POST'])
+def start_voice_stream():
+    """Body: {"user_id", "title", "sample_rate": 16000, "channels": 1}. Returns the session snapshot."""
+    try:
+        from src.utils.voice_stream import start_session, VoiceStreamBusy, VoiceStreamError
+    except ImportError:
+        return jsonify({'error': 'Streaming transcription not available - speech processing dependencies not installed'}), 501
+    try:
+        data = request.get_json(silent=True) or {}
+        session = start_session(
+            user_id=data.get('user_id', 1),
+            title=data.get('title', ''),
+            sample_rate=int(data.get('sample_rate', 16000)),
+            channels=int(data.get('channels', 1)),
+        )
+        return jsonify(session.snapshot()), 201
+    except VoiceStreamBusy as e:
+        return jsonify({'error': str(e)}), 503
+    except (VoiceStreamError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@master_agent_bp.route('/notes/voice/stream/<session_id>/chunk', methods=['POST'])
+def feed_voice_stream(session_id):
+    """Append a chunk of PCM (the raw request body); returns the partial transcript so far."""
+    from src.utils.voice_stream import VoiceStreamClosed, VoiceStreamError
+    session = _voice_stream_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    try:
+        return jsonify(session.feed(request.get_data()))
+    except VoiceStreamClosed as e:
+        return jsonify({'error': str(e)}), 409
+    except VoiceStreamError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@master_agent_bp.route('/notes/voice/stream/<session_id>', methods=['GET'])
+def poll_voice_stream(session_id):
+    """Partial transcript; ?since=<version>&wait=<seconds> long-polls until a segment changes."""
+    session = _voice_stream_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    since = request.args.get('since', type=int)
+    return jsonify(session.snapshot(since, request.args.get('wait', 0, type=float)))
+
+@master_agent_bp.route('/notes/voice/stream/<session_id>/finish', methods=['POST'])
+def finish_voice_stream(session_id):
+    """Transcribe the last segment, store the recording and create the voice note."""
+    from src.utils.voice_stream import VoiceStreamClosed, end_session
+    session = _voice_stream_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    try:
+        transcription, recording, snapshot = session.finish()
+        end_session(session_id)
+
+        stored_path = None
+        if len(recording):
+            # Keyed on the WAV encoding, like an uploaded WAV of the same recording
+            wav = io.BytesIO()
+            recording.export(wav, format='wav')
+            stored_path = get_audio_store(current_app.root_path).put_bytes(wav.getvalue(), '.wav', recording)
+
+        note = Note(
+            title=session.title or f"Voice Note {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            note_type='voice',
+            audio_file_path=stored_path,
+            transcription=transcription,
+            transcription_status=TRANSCRIPTION_DONE,
+            user_id=session.user_id
+        )
+        db.session.add(note)
+        db.session.commit()
+        index_in_background('notes', [(note.id, note.content)])
+        return jsonify({**note.to_dict(), 'segments': snapshot['segments']}), 201
+    except VoiceStreamClosed as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@master_agent_bp.route('/notes/voice/stream/<session_id>', methods=['DELETE'])
+def cancel_voice_stream(session_id):
+    from src.utils.voice_stream import end_session
+    if end_session(session_id) is None:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    return '', 204
+
+@master_agent_bp.route('/notes/<int:note_id>/audio', methods=['GET'])
+def stream_note_audio(note_id):
+    """Stream a voice note's audio; supports Range requests, ETag and If-None-Match."""
+    note = Note.query.get_or_404(note_id)
+    path = note.audio_file_path
+    if not path or not os.path.exists(path):
+        return jsonify({'error': 'Audio not available'}), 404
+    store = get_audio_store(current_app.root_path)
+    # The URL is per note and note ids can be reused, so clients revalidate every time;
+    # for stored audio the content hash is the ETag and a revalidation is a cheap 304
+    etag = store.etag(path) if store.owns(path) else True
+    response = send_file(path, mimetype=store.mimetype(path), conditional=True, etag=etag)
+    response.cache_control.no_cache = True
+    return response
+
+@master_agent_bp.route('/notes/<int:note_id>/transcription', methods=['GET'])
+def get_transcription_status(note_id):
+    note = Note.query.get_or_404(note_id)
+    finished = note.transcription_status in (TRANSCRIPTION_DONE, TRANSCRIPTION_FAILED)
+    return jsonify({
+        'note_id': note.id,
+        'transcription_status': note.transcription_status,
+        'transcription': note.transcription if finished else None,
+    })
+
 # Conversation history endpoint
 @master_agent_bp.route('/conversations', methods=['GET'])
 def get_conversations():
@@ -302,20 +560,9 @@ def get_dashboard():
     try:
         user_id = request.args.get('user_id', 1, type=int)
         
-        # Get task statistics
-        total_tasks = Task.query.filter_by(user_id=user_id).count()
-        completed_tasks = Task.query.filter_by(user_id=user_id, status='completed').count()
-        pending_tasks = Task.query.filter_by(user_id=user_id, status='pending').count()
-        
-        # Get goal statistics
-        total_goals = Goal.query.filter_by(user_id=user_id).count()
-        active_goals = Goal.query.filter_by(user_id=user_id, status='active').count()
-        completed_goals = Goal.query.filter_by(user_id=user_id, status='completed').count()
-        
-        # Get note statistics
-        total_notes = Note.query.filter_by(user_id=user_id).count()
-        text_notes = Note.query.filter_by(user_id=user_id, note_type='text').count()
-        voice_notes = Note.query.filter_by(user_id=user_id, note_type='voice').count()
+        # One grouped query per table (or O(1) counter reads when DASHBOARD_COUNTERS=1)
+        counts = get_counts(user_id)
+        task_counts, goal_counts, note_counts = counts['task'], counts['goal'], counts['note']
         
         # Get recent activity
         recent_tasks = Task.query.filter_by(user_id=user_id)\
@@ -328,20 +575,20 @@ def get_dashboard():
         
         return jsonify({
             'tasks': {
-                'total': total_tasks,
-                'completed': completed_tasks,
-                'pending': pending_tasks,
+                'total': task_counts.get(TOTAL, 0),
+                'completed': task_counts.get('completed', 0),
+                'pending': task_counts.get('pending', 0),
                 'recent': [task.to_dict() for task in recent_tasks]
             },
             'goals': {
-                'total': total_goals,
-                'active': active_goals,
-                'completed': completed_goals
+                'total': goal_counts.get(TOTAL, 0),
+                'active': goal_counts.get('active', 0),
+                'completed': goal_counts.get('completed', 0)
             },
             'notes': {
-                'total': total_notes,
-                'text': text_notes,
-                'voice': voice_notes,
+                'total': note_counts.get(TOTAL, 0),
+                'text': note_counts.get('text', 0),
+                'voice': note_counts.get('voice', 0),
                 'recent': [note.to_dict() for note in recent_notes]
             }
         })
@@ -0,0 +1,94 @@
+from flask import Blueprint, jsonify, request
+from src.models.master_agent import Note, db
+from src.utils.embedding_store import get_semantic_index
+
+related_bp = Blueprint('related', __name__)
+
+MAX_RELATED = 50
+# Neighbours fetched per wanted result before dropping other users' items; grown
+# until enough of the owner's items are found, up to MAX_FETCH
+OVERFETCH = 4
+MAX_FETCH = 2000
+
+
+def _research_db():
+    # The research models live on a separate Base; imported here so notes work without them
+    from src.database.db_session import get_db
+    from src.models.research_result import ResearchResult
+    return get_db(), ResearchResult
+
+
+def _load_item(kind, item_id):
+    """(owner user_id, text to embed) for an item, or None if it doesn't exist."""
+    if kind == 'notes':
+        note = Note.query.get(item_id)
+        return (note.user_id, note.content) if note else None
+    session, ResearchResult = _research_db()
+    try:
+        result = session.query(ResearchResult.user_id, ResearchResult.content_summary).filter_by(id=item_id).first()
+        return tuple(result) if result else None
+    finally:
+        session.close()
+
+
+def _owned_ids(kind, user_id, ids):
+    """The ids among `ids` that belong to user_id (one indexed lookup per kind)."""
+    if not ids:
+        return set()
+    if kind == 'notes':
+        return {row_id for (row_id,) in db.session.query(Note.id).filter(Note.id.in_(ids), Note.user_id == user_id)}
+    session, ResearchResult = _research_db()
+    try:
+        return {row_id for (row_id,) in session.query(ResearchResult.id)
+                .filter(ResearchResult.id.in_(ids), ResearchResult.user_id == user_id)}
+    finally:
+        session.close()
+
+
+def _related_for_owner(index, kind, item_id, user_id, kinds, k):
+    """
+    Top-k neighbours owned by user_id. The vector search runs unrestricted and
+    only its hits are checked against the owner, instead of loading every id
+    the user owns; the search is widened while too few hits are theirs.
+    """
+    fetch = k * OVERFETCH
+    while True:
+        hits = index.related(kind, item_id, fetch, {t: None for t in kinds})
+        if hits is None:
+            return None
+        owned = {t: _owned_ids(t, user_id, [h['id'] for h in hits if h['type'] == t]) for t in kinds}
+        related = [h for h in hits if h['id'] in owned[h['type']]][:k]
+        if len(related) >= k or len(hits) < fetch or fetch >= MAX_FETCH:
+            return related
+        fetch = min(fetch * OVERFETCH, MAX_FETCH)
+
+
+@related_bp.route('/related/<kind>/<int:item_id>', methods=['GET'])
+def get_related(kind, item_id):
+    """
+    Items most similar to a note or research result (cosine similarity of embeddings
+    of Note.content / ResearchResult.content_summary), limited to the owner's items.
+    Query params: k (default 10), types (comma-separated subset of notes, research).
+    """
+    index = get_semantic_index()
+    if kind not in index.KINDS:
+        return jsonify({'error': f'Unknown type: {kind}'}), 404
+    types = request.args.get('types')
+    kinds = [t.strip() for t in types.split(',') if t.strip()] if types else list(index.KINDS)
+    unknown = [t for t in kinds if t not in index.KINDS]
+    if unknown:
+        return jsonify({'error': f"Unknown types: {', '.join(unknown)}"}), 400
+    k = max(1, min(request.args.get('k', 10, type=int), MAX_RELATED))
+
+    try:
+        item = _load_item(kind, item_id)
+        if item is None:
+            return jsonify({'error': 'Not found'}), 404
+        user_id, text = item
+        # Index on demand if the background indexer hasn't reached this item yet
+        index.index(kind, [(item_id, text)])
+
+        related = _related_for_owner(index, kind, item_id, user_id, kinds, k)
+        return jsonify({'type': kind, 'id': item_id, 'related': related or []})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
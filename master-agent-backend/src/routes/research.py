@@ -1,8 +1,18 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
 from flask import Blueprint, request, jsonify
+from sqlalchemy import func, inspect
 from sqlalchemy.orm import Session
 from ..utils.content_extractor import ContentExtractor
 from ..utils.gemini_analyzer import GeminiAnalyzer
-from ..models.research_result import ResearchResult
+from ..utils.batch_pipeline import HostLimiter, run_pipeline
+from ..utils.job_queue import get_job_queue, JOB_ANALYZING, JOB_EXTRACTING
+from ..utils.pagination import paginated_response, PaginationError
+from ..utils.url_utils import canonicalize_url, content_hash
+from ..utils.embedding_store import index_in_background
+from ..models.research_result import ResearchResult, ResearchTag, research_result_tag
+from ..models.tagging import tag_name_matches
 from ..database.db_session import get_db
 from ..models.user import User
 
@@ -10,12 +20,337 @@ research_bp = Blueprint("research", __name__)
 extractor = ContentExtractor()
 analyzer = GeminiAnalyzer()
 
+MAX_BATCH_URLS = int(os.getenv("RESEARCH_MAX_BATCH_URLS", "200"))
+BATCH_FETCH_WORKERS = int(os.getenv("RESEARCH_BATCH_FETCH_WORKERS", "8"))
+BATCH_PER_HOST_CONCURRENCY = int(os.getenv("RESEARCH_BATCH_PER_HOST", "2"))
+# Columns returned by the list view by default (no article text)
+LIST_FIELDS = [c.key for c in inspect(ResearchResult).column_attrs if c.key not in ("raw_text", "full_text")]
+# Resubmissions of the same URL/content within this window reuse the existing analysis
+FRESHNESS_HOURS = int(os.getenv("RESEARCH_FRESHNESS_HOURS", "24"))
+
+
+def _analysis_mode(options: dict) -> str:
+    """
+    Stored with each result; analyses are only reused within the same mode. A
+    chunked analysis under a non-default token budget reads a different amount
+    of text, so the budget is part of its mode ("chunked:<tokens>").
+    """
+    if options.get("analysis_mode") != "chunked":
+        return "single"
+    budget = options.get("token_budget")
+    return f"chunked:{budget}" if budget and budget != analyzer.CHUNK_TOKEN_BUDGET else "chunked"
+
+
+def _positive_int(data: dict, field: str, limit: int) -> Optional[int]:
+    value = data.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= limit:
+        raise ValueError(f"{field} must be an integer from 1 to {limit}")
+    return value
+
+
+def _analysis_options(data: dict) -> dict:
+    """
+    The analysis settings of a submission: analysis_mode, and for chunked mode the
+    optional token_budget and chunk_workers. Raises ValueError on bad values.
+    """
+    return {
+        "analysis_mode": data.get("analysis_mode", "single"),
+        "token_budget": _positive_int(data, "token_budget", analyzer.CHUNK_MAX_TOKEN_BUDGET),
+        "chunk_workers": _positive_int(data, "chunk_workers", analyzer.CHUNK_WORKERS_LIMIT),
+    }
+
+
+def _extract(url: str, options: dict) -> dict:
+    """
+    Fetch + extract a URL, stopping at the analyzer's input budget for the
+    analysis mode unless the user asked to keep the full text, and hash the
+    budgeted text (what the analyzer reads).
+    """
+    if options.get("analysis_mode") == "chunked":
+        budget = analyzer.chunked_input_chars(options.get("token_budget"))
+    else:
+        budget = analyzer.MAX_INPUT_CHARS
+    extracted = extractor.extract(url, max_chars=None if options.get("keep_full_text") else budget)
+    analyzed_text = (extracted.get("raw_text") or "")[:budget]
+    # Empty extractions (JS-only pages, paywalls) get no hash and are never matched
+    digest = content_hash(analyzed_text) if analyzed_text.strip() else None
+    return {**extracted, "content_hash": digest}
+
+
+def _analyze(extracted: dict, options: dict) -> dict:
+    return analyzer.analyze_url_content(extracted, chunked=options.get("analysis_mode") == "chunked",
+                                        token_budget=options.get("token_budget"),
+                                        max_workers=options.get("chunk_workers"))
+
+
+# Columns copied when an existing analysis is reused for another submission
+_ANALYSIS_COLUMNS = (
+    "source_type", "title", "raw_text", "full_text", "content_summary", "key_points",
+    "sentiment", "category", "importance_score", "tags", "analysis_mode",
+)
+
+
+def _find_fresh(user_id: int, options: dict, canonical_url: Optional[str] = None,
+                content_hash: Optional[str] = None) -> Optional[dict]:
+    """
+    Most recent result for the same canonical URL or content hash, analyzed in
+    the same mode, created inside the freshness window, preferring the user's own. Returned as a plain dict so
+    it can cross threads and sessions.
+    """
+    if options.get("refresh"):
+        return None
+
+    db: Session = get_db()
+    try:
+        query = db.query(ResearchResult).filter(
+            ResearchResult.created_at >= datetime.utcnow() - timedelta(hours=FRESHNESS_HOURS),
+            ResearchResult.analysis_mode == _analysis_mode(options),
+        )
+        if canonical_url:
+            query = query.filter(ResearchResult.canonical_url == canonical_url)
+        elif content_hash:
+            query = query.filter(ResearchResult.content_hash == content_hash)
+        else:
+            return None
+        if options.get("keep_full_text"):
+            query = query.filter(ResearchResult.full_text.isnot(None))
+
+        existing = query.order_by(
+            (ResearchResult.user_id == user_id).desc(), ResearchResult.created_at.desc()
+        ).first()
+        if not existing:
+            return None
+        snapshot = {column: getattr(existing, column) for column in _ANALYSIS_COLUMNS}
+        snapshot.update(id=existing.id, user_id=existing.user_id, content_hash=existing.content_hash)
+        return snapshot
+    finally:
+        db.close()
+
+
+def _clone_result(user_id: int, url: str, existing: dict, canonical_url: str,
+                  digest: Optional[str]) -> ResearchResult:
+    """Copy of an existing analysis, filed under this submission's own canonical URL and hash."""
+    return ResearchResult(
+        user_id=user_id,
+        source_url=url,
+        canonical_url=canonical_url,
+        content_hash=digest,
+        **{column: existing[column] for column in _ANALYSIS_COLUMNS},
+    )
+
+
+def _build_result(user_id: int, url: str, staged: dict, options: dict) -> Optional[ResearchResult]:
+    """
+    Row to insert for a processed URL: a new result, a clone of another user's
+    fresh result, or None when the user already has a fresh one.
+    """
+    existing = staged.get("existing")
+    if existing:
+        if existing["user_id"] == user_id:
+            return None
+        # Matched by canonical URL (nothing fetched): the existing hash is this page's hash
+        return _clone_result(user_id, url, existing, staged["canonical_url"],
+                             staged.get("content_hash") or existing["content_hash"])
+
+    extracted, enriched = staged["extracted"], staged["enriched"]
+    raw_text = extracted.get("raw_text") or ""
+    result = ResearchResult(
+        user_id=user_id,
+        source_url=url,
+        source_type="web",
+        title=enriched.get("title"),
+        raw_text=raw_text[:analyzer.MAX_INPUT_CHARS] or None,
+        content_summary=enriched.get("content_summary"),
+        key_points=enriched.get("key_points"),
+        sentiment=enriched.get("sentiment"),
+        category=enriched.get("category"),
+        importance_score=enriched.get("importance_score"),
+        tags=enriched.get("tags"),
+        analysis_mode=_analysis_mode(options),
+        canonical_url=staged["canonical_url"],
+        content_hash=staged["content_hash"],
+    )
+    if options.get("keep_full_text") and raw_text:
+        result.set_full_text(raw_text)
+    return result
+
+
+def _resolve_canonical(url: str) -> str:
+    """
+    The dedup key for a URL: redirects resolved, then canonicalized. Raises
+    ValueError for a URL that is not an absolute http(s) address.
+    """
+    canonicalize_url(url)  # reject bad input before any network I/O
+    return canonicalize_url(extractor.resolve_url(url))
+
+
+def _fetch_stage(url: str, user_id: int, options: dict) -> dict:
+    """
+    Resolve redirects and canonicalize the URL; skip the fetch entirely when a
+    fresh result for the canonical URL exists, otherwise extract the content.
+    """
+    canonical = _resolve_canonical(url)
+    existing = _find_fresh(user_id, options, canonical_url=canonical)
+    if existing:
+        return {"canonical_url": canonical, "existing": existing}
+
+    extracted = _extract(url, options)
+    return {
+        "canonical_url": canonical,
+        "extracted": extracted,
+        "content_hash": extracted["content_hash"],
+    }
+
+
+def _analyze_stage(user_id: int, staged: dict, options: dict) -> dict:
+    """Analyze extracted content, unless the same content was analyzed recently under another URL."""
+    if "existing" not in staged:
+        existing = None
+        if staged["content_hash"]:
+            existing = _find_fresh(user_id, options, content_hash=staged["content_hash"])
+        if existing:
+            staged["existing"] = existing
+        else:
+            staged["enriched"] = _analyze(staged["extracted"], options)
+    return staged
+
+
+def _stored_by_job(job_id: str) -> dict:
+    """{source_url: research id} of the rows a job has already stored."""
+    db: Session = get_db()
+    try:
+        return dict(db.query(ResearchResult.source_url, ResearchResult.id)
+                    .filter(ResearchResult.job_id == job_id).all())
+    finally:
+        db.close()
+
+
+def _run_research_job(job_id: str, payload: dict, queue) -> dict:
+    """
+    Job handler: fetch + extract the URL, analyze it with Gemini and store the result.
+    """
+    url = payload["url"]
+    user_id = payload["user_id"]
+    stored = _stored_by_job(job_id)
+    if url in stored:
+        # A previous run of this job stored the row before its claim was lost
+        return {"research_id": stored[url], "deduplicated": False}
+    staged = _fetch_stage(url, user_id, payload)
+
+    queue.update(job_id, JOB_ANALYZING)
+    staged = _analyze_stage(user_id, staged, payload)
+
+    result = _build_result(user_id, url, staged, payload)
+    if result is None:
+        return {"research_id": staged["existing"]["id"], "deduplicated": True}
+
+    result.job_id = job_id
+    db: Session = get_db()
+    try:
+        result.sync_tags(db)
+        db.add(result)
+        db.commit()
+        index_in_background("research", [(result.id, result.content_summary)])
+        return {"research_id": result.id, "deduplicated": "existing" in staged}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _run_research_batch_job(job_id: str, payload: dict, queue) -> dict:
+    """
+    Job handler for a batch of URLs: fetches run concurrently (bounded per host)
+    over the extractor's pooled session and feed analysis as they complete.
+    All new results are written in one transaction, tagged with the job id, so
+    a re-run after the claim was lost skips URLs whose rows are already stored.
+    """
+    user_id = payload["user_id"]
+    already_stored = _stored_by_job(job_id)
+    urls = [u for u in payload["urls"] if u not in already_stored]
+    host_limiter = HostLimiter(BATCH_PER_HOST_CONCURRENCY)
+
+    def fetch(url):
+        with host_limiter.slot(url):
+            return _fetch_stage(url, user_id, payload)
+
+    def analyze(url, staged):
+        # Also refreshes the job's claim, on top of the queue's heartbeat
+        queue.update(job_id, JOB_ANALYZING)
+        return _analyze_stage(user_id, staged, payload)
+
+    outcomes = run_pipeline(
+        urls, fetch, analyze,
+        fetch_workers=BATCH_FETCH_WORKERS,
+        analyze_workers=analyzer.limiter.max_concurrency,
+    )
+
+    stored = []
+    for outcome in outcomes:
+        if not outcome["ok"]:
+            continue
+        outcome["deduplicated"] = "existing" in outcome["result"]
+        row = _build_result(user_id, outcome["item"], outcome["result"], payload)
+        if row is None:
+            outcome["research_id"] = outcome["result"]["existing"]["id"]
+        else:
+            row.job_id = job_id
+            stored.append((outcome, row))
+
+    db: Session = get_db()
+    try:
+        for _, row in stored:
+            row.sync_tags(db)
+        db.add_all([row for _, row in stored])
+        db.commit()
+        for outcome, row in stored:
+            outcome["research_id"] = row.id
+        index_in_background("research", [(row.id, row.content_summary) for _, row in stored])
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    outcomes += [
+        {"item": url, "ok": True, "research_id": already_stored[url], "deduplicated": False}
+        for url in payload["urls"] if url in already_stored
+    ]
+    succeeded = sum(1 for o in outcomes if o["ok"])
+    return {
+        "succeeded": succeeded,
+        "failed": len(outcomes) - succeeded,
+        "results": [
+            {"url": o["item"], "research_id": o["research_id"], "deduplicated": o["deduplicated"]} if o["ok"]
+            else {"url": o["item"], "error": o["error"], "stage": o["stage"]}
+            for o in outcomes
+        ],
+    }
+
+
+job_queue = get_job_queue()
+job_queue.register("research", _run_research_job, start_state=JOB_EXTRACTING)
+job_queue.register("research_batch", _run_research_batch_job, start_state=JOB_EXTRACTING)
+
 
 @research_bp.route("/research/submit", methods=["POST"])
 def submit_research():
     """
-    Accepts a URL or uploaded file, extracts content, and queues for analysis.
-    Request JSON: { "url": "https://example.com/article" }
+    Accepts a URL and queues it for extraction and analysis.
+    Request JSON: { "url": "https://example.com/article", "user_id": 1,
+                    "keep_full_text": false, "analysis_mode": "single" | "chunked",
+                    "token_budget": 12000, "chunk_workers": 4 }
+    Only the first analyzer window of text is stored unless keep_full_text is set.
+    "chunked" analyzes long documents in overlapping chunks and merges the results;
+    token_budget (tokens of the document read) and chunk_workers (concurrent chunk
+    calls) are optional and default to the analyzer's settings.
+    Returns 202 with a job id; poll /research/jobs/<job_id> for progress.
+    If the canonical URL was analyzed within the freshness window, the existing
+    analysis is returned (200) or cloned for this user (201) instead; pass
+    "refresh": true to force a new analysis.
     """
     data = request.json
     url = data.get("url")
@@ -24,44 +359,169 @@ def submit_research():
     if not url or not user_id:
         return jsonify({"error": "Missing required fields"}), 400
 
-    db: Session = get_db()
     try:
-        extracted = extractor.extract(url)
-        enriched = analyzer.analyze_url_content(extracted)
-
-        result = ResearchResult(
-            user_id=user_id,
-            source_url=url,
-            source_type="web",
-            title=enriched.get("title"),
-            raw_text=enriched.get("raw_text"),
-            content_summary=enriched.get("content_summary"),
-            key_points=enriched.get("key_points"),
-            sentiment=enriched.get("sentiment"),
-            category=enriched.get("category"),
-            importance_score=enriched.get("importance_score"),
-            tags=enriched.get("tags"),
-        )
-        db.add(result)
-        db.commit()
+        canonical = _resolve_canonical(url)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        analysis_options = _analysis_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    options = {
+        "url": url,
+        "user_id": user_id,
+        "keep_full_text": bool(data.get("keep_full_text")),
+        "refresh": bool(data.get("refresh")),
+        **analysis_options,
+    }
 
-        return jsonify(result.to_dict()), 201
+    try:
+        existing = _find_fresh(user_id, options, canonical_url=canonical)
+        if existing and existing["user_id"] == user_id:
+            return jsonify({"status": "done", "research_id": existing["id"], "deduplicated": True}), 200
+        if existing:
+            db: Session = get_db()
+            try:
+                result = _clone_result(user_id, url, existing, canonical, existing["content_hash"])
+                result.sync_tags(db)
+                db.add(result)
+                db.commit()
+                index_in_background("research", [(result.id, result.content_summary)])
+                return jsonify({"status": "done", "research_id": result.id, "deduplicated": True}), 201
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        job_id = job_queue.submit("research", options)
     except Exception as e:
-        db.rollback()
         return jsonify({"error": str(e)}), 500
-    finally:
-        db.close()
+
+    return jsonify({"job_id": job_id, "status": "pending"}), 202
+
+
+@research_bp.route("/research/submit/batch", methods=["POST"])
+def submit_research_batch():
+    """
+    Accepts a list of URLs (e.g. a reading list) and queues them as one batch job.
+    Request JSON: { "urls": ["https://...", ...], "user_id": 1,
+                    "keep_full_text": false, "analysis_mode": "single" | "chunked",
+                    "token_budget": 12000, "chunk_workers": 4 }
+    (see /research/submit for the analysis options). URLs that canonicalize to the same address are dropped. Returns 202 with a job id; when done, the job
+    result lists the research id or the error for every URL.
+    """
+    data = request.json
+    urls = data.get("urls")
+    user_id = data.get("user_id")
+
+    if not isinstance(urls, list) or not urls or not user_id:
+        return jsonify({"error": "Missing required fields"}), 400
+
+    by_canonical, invalid, submitted = {}, [], 0
+    for u in urls:
+        if isinstance(u, str) and u.strip():
+            submitted += 1
+            try:
+                by_canonical.setdefault(canonicalize_url(u), u.strip())
+            except ValueError:
+                invalid.append(u)
+    if invalid:
+        return jsonify({"error": "Invalid URLs", "invalid": invalid}), 400
+    unique_urls = list(by_canonical.values())
+    if len(unique_urls) > MAX_BATCH_URLS:
+        return jsonify({"error": f"At most {MAX_BATCH_URLS} URLs per batch"}), 400
+    try:
+        analysis_options = _analysis_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        job_id = job_queue.submit("research_batch", {
+            "urls": unique_urls,
+            "user_id": user_id,
+            "keep_full_text": bool(data.get("keep_full_text")),
+            "refresh": bool(data.get("refresh")),
+            **analysis_options,
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "pending",
+        "urls": len(unique_urls),
+        "duplicates_removed": submitted - len(unique_urls),
+    }), 202
+
+
+@research_bp.route("/research/jobs/<job_id>", methods=["GET"])
+def get_research_job(job_id):
+    """
+    Poll the state of a research job: pending -> extracting -> analyzing -> done (or failed).
+    """
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(job), 200
+
+
+@research_bp.route("/research/cache/stats", methods=["GET"])
+def get_analysis_cache_stats():
+    """
+    Hit/miss counters and size of the Gemini analysis cache.
+    """
+    return jsonify(analyzer.cache.stats()), 200
+
+
+@research_bp.route("/research/limiter/stats", methods=["GET"])
+def get_gemini_limiter_stats():
+    """
+    Gemini call metrics: time spent waiting on the rate limiter vs. inside calls, retries, failures.
+    """
+    return jsonify(analyzer.limiter.stats()), 200
 
 
 @research_bp.route("/research/list/<int:user_id>", methods=["GET"])
 def list_research(user_id):
     """
-    Returns all research results for a given user.
+    Returns a page of research results for a given user, newest first.
+    Query params: cursor (from the X-Next-Cursor header), limit, fields (comma-separated),
+    tag (only results carrying this tag; matched like GET /notes?tag=, ignoring case and extra whitespace).
+    Article text is left out unless requested through fields.
+    """
+    db: Session = get_db()
+    try:
+        query = db.query(ResearchResult).filter_by(user_id=user_id)
+        tag = tag_name_matches(ResearchTag.name, request.args.get("tag"))
+        if tag is not None:
+            query = query.filter(ResearchResult.tag_list.any(tag))
+        return paginated_response(query, ResearchResult, request.args, default_fields=LIST_FIELDS), 200
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    finally:
+        db.close()
+
+
+@research_bp.route("/research/tags/<int:user_id>", methods=["GET"])
+def list_research_tags(user_id):
+    """
+    Tags used by a user's research results with how many results carry each, most used first.
     """
     db: Session = get_db()
     try:
-        results = db.query(ResearchResult).filter_by(user_id=user_id).all()
-        return jsonify([r.to_dict() for r in results]), 200
+        rows = (
+            db.query(ResearchTag.name, func.count())
+            .join(research_result_tag, research_result_tag.c.tag_id == ResearchTag.id)
+            .join(ResearchResult, ResearchResult.id == research_result_tag.c.research_result_id)
+            .filter(ResearchResult.user_id == user_id)
+            .group_by(ResearchTag.name)
+            .order_by(func.count().desc(), ResearchTag.name)
+            .all()
+        )
+        return jsonify([{"tag": name, "count": count} for name, count in rows]), 200
     finally:
         db.close()
 
@@ -78,4 +538,22 @@ def get_research(research_id):
             return jsonify({"error": "Not found"}), 404
         return jsonify(result.to_dict()), 200
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@research_bp.route("/research/<int:research_id>/full_text", methods=["GET"])
+def get_research_full_text(research_id):
+    """
+    Retrieve the full extracted text of a research result, if it was kept at submission.
+    """
+    db: Session = get_db()
+    try:
+        result = db.query(ResearchResult).filter_by(id=research_id).first()
+        if not result:
+            return jsonify({"error": "Not found"}), 404
+        full_text = result.get_full_text()
+        if full_text is None:
+            return jsonify({"error": "Full text was not kept for this result"}), 404
+        return jsonify({"id": result.id, "full_text": full_text}), 200
+    finally:
+        db.close()
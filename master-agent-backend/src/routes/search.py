@@ -0,0 +1,52 @@
+from flask import Blueprint, jsonify, request
+from src.database.search_index import search, SearchUnavailable, SEARCH_SOURCES
+from src.utils.pagination import parse_limit, PaginationError, NEXT_CURSOR_HEADER
+
+search_bp = Blueprint('search', __name__)
+
+SEARCH_PAGE_SIZE = 20
+
+
+def _parse_offset(cursor):
+    # Results are ranked, not keyed, so the cursor is simply the offset of the next page
+    if not cursor:
+        return 0
+    if not cursor.isdigit():
+        raise PaginationError('Invalid cursor')
+    return int(cursor)
+
+
+@search_bp.route('/search', methods=['GET'])
+def search_content():
+    """
+    Ranked full-text search over a user's notes, conversations and research results.
+    Query params: q, user_id, types (comma-separated subset of notes, conversations,
+    research), limit, cursor (from the X-Next-Cursor header).
+    Each hit carries type, id, title, created_at, a highlighted snippet and its bm25 score.
+    """
+    try:
+        user_id = request.args.get('user_id', 1, type=int)
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+
+        types = request.args.get('types')
+        kinds = [k.strip() for k in types.split(',') if k.strip()] if types else None
+        unknown = [k for k in kinds or [] if k not in SEARCH_SOURCES]
+        if unknown:
+            return jsonify({'error': f"Unknown search types: {', '.join(unknown)}"}), 400
+
+        limit = parse_limit(request.args.get('limit') or str(SEARCH_PAGE_SIZE))
+        offset = _parse_offset(request.args.get('cursor'))
+        results, has_more = search(user_id, query, kinds, limit, offset)
+
+        response = jsonify(results)
+        if has_more:
+            response.headers[NEXT_CURSOR_HEADER] = str(offset + limit)
+        return response
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except SearchUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,12 +1,15 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.utils.pagination import paginated_response, PaginationError
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/api/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    try:
+        return paginated_response(User.query, User, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -0,0 +1,210 @@
+import fcntl
+import hashlib
+import io
+import mimetypes
+import os
+import tempfile
+import threading
+import time
+
+# Opus at 24 kbit/s is transparent for speech and ~1/30th the size of 16-bit 48 kHz WAV
+AUDIO_BITRATE = os.getenv('AUDIO_BITRATE', '24k')
+AUDIO_CODEC = os.getenv('AUDIO_CODEC', 'libopus')
+AUDIO_FORMAT = 'ogg'
+HASH_CHUNK_BYTES = 1024 * 1024
+# A blob handed out by put() is kept this long even if no note points at it yet:
+# the note that will reference it is committed after put() returns
+REUSE_GRACE_SECONDS = int(os.getenv('AUDIO_REUSE_GRACE_SECONDS', '3600'))
+REFERENCE_CHECK_BATCH = 500
+LOCK_NAME = '.lock'
+
+_last_sweep = {}
+_last_sweep_lock = threading.Lock()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AudioStore:
+    """
+    Content-addressed audio storage.
+
+    Uploads are transcoded to Opus/OGG and stored under the SHA-256 of the
+    uploaded bytes (root/ab/cd/<hash>.ogg), so the same recording uploaded twice
+    is stored once. If transcoding fails (e.g. no ffmpeg with libopus), the
+    original bytes are stored under the same hash with their own extension.
+
+    Because a blob can be shared, it is only removed by discard() / sweep(),
+    which ask the caller which files are still referenced. put() refreshes the
+    mtime of a blob it reuses, under the same file lock discard() removes under,
+    so a blob handed out within REUSE_GRACE_SECONDS survives until the note
+    pointing at it is committed.
+    """
+
+    def __init__(self, root, bitrate=AUDIO_BITRATE, codec=AUDIO_CODEC):
+        self.root = root
+        self.bitrate = bitrate
+        self.codec = codec
+
+    def _dir_for(self, key):
+        return os.path.join(self.root, key[:2], key[2:4])
+
+    def _lock(self):
+        """Exclusive lock on the store, held while a blob is reused or removed."""
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, LOCK_NAME), 'a')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def find(self, key):
+        """Stored path for a content hash, or None."""
+        directory = self._dir_for(key)
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(key + '.') and not name.endswith('.tmp'):
+                    return os.path.join(directory, name)
+        return None
+
+    def put(self, source_path, segment=None):
+        """
+        Store an audio file and return its stored path. `segment` is the already
+        decoded AudioSegment of the file, if available, to avoid decoding it again.
+        """
+        def decode():
+            from pydub import AudioSegment
+            return AudioSegment.from_file(source_path)
+
+        def write_original(tmp_path):
+            with open(source_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(HASH_CHUNK_BYTES), b''):
+                    dst.write(chunk)
+
+        extension = os.path.splitext(source_path)[1].lower() or '.bin'
+        return self._put(file_sha256(source_path), segment, decode, write_original, extension)
+
+    def put_bytes(self, data, extension, segment=None):
+        """
+        Store an encoded audio payload held in memory (e.g. a WAV export of a
+        recorded stream) and return its stored path; keyed like put() on a file
+        with the same bytes.
+        """
+        def decode():
+            from pydub import AudioSegment
+            return AudioSegment.from_file(io.BytesIO(data), format=extension.lstrip('.'))
+
+        def write_original(tmp_path):
+            with open(tmp_path, 'wb') as dst:
+                dst.write(data)
+
+        return self._put(hashlib.sha256(data).hexdigest(), segment, decode, write_original, extension.lower())
+
+    def _put(self, key, segment, decode, write_original, extension):
+        with self._lock():
+            existing = self.find(key)
+            if existing:
+                # Mark it as in use so a concurrent discard() keeps it
+                os.utime(existing)
+                return existing
+
+        directory = self._dir_for(key)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            try:
+                if segment is None:
+                    segment = decode()
+                segment.export(tmp_path, format=AUDIO_FORMAT, codec=self.codec, bitrate=self.bitrate,
+                               parameters=['-application', 'voip'])
+                extension = '.' + AUDIO_FORMAT
+            except Exception:
+                write_original(tmp_path)
+            # Atomic publish; a concurrent writer of the same key produces identical content
+            stored_path = os.path.join(directory, key + extension)
+            os.replace(tmp_path, stored_path)
+            return stored_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _in_grace(self, path, now):
+        try:
+            return now - os.path.getmtime(path) < REUSE_GRACE_SECONDS
+        except FileNotFoundError:
+            return False
+
+    def _remove(self, paths, unreferenced):
+        """Remove the files among `paths` that `unreferenced` reports, sparing blobs still in grace."""
+        removed = []
+        paths = sorted(paths)
+        for i in range(0, len(paths), REFERENCE_CHECK_BATCH):
+            candidates = unreferenced(paths[i:i + REFERENCE_CHECK_BATCH])
+            if not candidates:
+                continue
+            with self._lock():
+                now = time.time()
+                for path in candidates:
+                    if self.owns(path) and self._in_grace(path, now):
+                        continue
+                    try:
+                        os.remove(path)
+                        removed.append(path)
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+    def discard(self, paths, unreferenced):
+        """
+        Remove audio files no note points to any more, right after the notes were
+        deleted. `unreferenced(paths)` returns the unreferenced subset and is
+        called just before removing. Stored blobs still in their reuse grace
+        period are left for a later sweep(), which this triggers at most once per
+        REUSE_GRACE_SECONDS.
+
+        Returns:
+            list: the paths removed
+        """
+        removed = self._remove({p for p in paths if p}, unreferenced)
+        now = time.time()
+        with _last_sweep_lock:
+            due = now - _last_sweep.get(self.root, 0) >= REUSE_GRACE_SECONDS
+            if due:
+                _last_sweep[self.root] = now
+        if due:
+            removed += self.sweep(unreferenced)
+        return removed
+
+    def sweep(self, unreferenced):
+        """Remove every stored blob past its grace period that `unreferenced` reports."""
+        now = time.time()
+        blobs = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                if name != LOCK_NAME and not name.endswith('.tmp') and not self._in_grace(path, now):
+                    blobs.append(path)
+        return self._remove(blobs, unreferenced)
+
+    def owns(self, path):
+        return bool(path) and os.path.abspath(path).startswith(os.path.abspath(self.root) + os.sep)
+
+    @staticmethod
+    def mimetype(path):
+        if path.endswith('.' + AUDIO_FORMAT):
+            return 'audio/ogg'
+        return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    @staticmethod
+    def etag(path):
+        """The content hash in the file name is a strong ETag."""
+        return os.path.basename(path).split('.')[0]
+
+
+def get_audio_store(app_root):
+    """The audio store under $AUDIO_STORE_DIR, or <app root>/uploads/audio."""
+    return AudioStore(os.getenv('AUDIO_STORE_DIR') or os.path.join(app_root, 'uploads', 'audio'))
@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List
+from urllib.parse import urlsplit
+
+
+class HostLimiter:
+    """Caps concurrent requests per host so one site is never hit by the whole pool."""
+
+    def __init__(self, per_host: int = 2):
+        self.per_host = per_host
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with semaphore:
+            yield
+
+
+def run_pipeline(items: Iterable[Any], fetch: Callable[[Any], Any], analyze: Callable[[Any, Any], Any],
+                 fetch_workers: int = 8, analyze_workers: int = 4) -> List[Dict[str, Any]]:
+    """
+    Two-stage pipeline: each item is fetched on one pool and, as soon as its
+    fetch completes, analyzed on a second pool, so analysis of early items
+    overlaps with fetching of later ones.
+
+    Returns one dict per item, in input order:
+    {"item", "ok": True, "result"} or {"item", "ok": False, "stage", "error"}.
+    """
+    items = list(items)
+    outcomes: List[Dict[str, Any]] = [{"item": item} for item in items]
+
+    with ThreadPoolExecutor(max_workers=max(1, fetch_workers)) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=max(1, analyze_workers)) as analyze_pool:
+        fetches = {fetch_pool.submit(fetch, item): i for i, item in enumerate(items)}
+        analyses = {}
+        for future in as_completed(fetches):
+            i = fetches[future]
+            try:
+                fetched = future.result()
+            except Exception as e:
+                outcomes[i].update(ok=False, stage="fetch", error=str(e))
+                continue
+            analyses[analyze_pool.submit(analyze, items[i], fetched)] = i
+
+        for future in as_completed(analyses):
+            i = analyses[future]
+            try:
+                outcomes[i].update(ok=True, result=future.result())
+            except Exception as e:
+                outcomes[i].update(ok=False, stage="analyze", error=str(e))
+
+    return outcomes
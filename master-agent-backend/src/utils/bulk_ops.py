@@ -0,0 +1,217 @@
+import json
+import os
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import DateTime, Integer, String
+
+from src.models.master_agent import Task, Goal, Note, Tag, note_tag, db
+from src.utils import dashboard_stats
+from src.utils.audio_store import get_audio_store
+from src.utils.embedding_store import index_in_background, remove_from_index
+
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '1000'))
+
+# model -> (writable fields, fields required on create, create defaults); mirrors the single-row endpoints
+BULK_MODELS = {
+    Task: (('title', 'description', 'status', 'priority', 'due_date'), ('title',), {'description': ''}),
+    Goal: (('title', 'description', 'target_date', 'progress', 'status'), ('title',), {'description': ''}),
+    Note: (('title', 'content', 'note_type', 'transcription', 'tags'), (), {'title': '', 'content': '', 'transcription': ''}),
+}
+
+
+# Allowed values of enumerated fields, shared with the single-row endpoints. Voice notes
+# are only created through /notes/voice, which stores their audio.
+FIELD_CHOICES = {
+    Task: {'status': Task.STATUSES, 'priority': Task.PRIORITIES},
+    Goal: {'status': Goal.STATUSES},
+    Note: {'note_type': ('text',)},
+}
+
+
+class BulkError(ValueError):
+    """The request as a whole is malformed (not a per-item validation failure)."""
+
+
+def _coerce(model, field, value):
+    if field == 'tags':
+        if not isinstance(value, list) or not all(isinstance(t, str) for t in value):
+            raise ValueError('tags must be a list of strings')
+        return json.dumps(Tag.normalize(value))
+    if value is None:
+        return None
+
+    column_type = model.__table__.c[field].type
+    if isinstance(column_type, DateTime):
+        if not isinstance(value, str):
+            raise ValueError(f'{field} must be an ISO 8601 string')
+        return datetime.fromisoformat(value)
+    if isinstance(column_type, Integer):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f'{field} must be an integer')
+        if field == 'progress' and not 0 <= value <= 100:
+            raise ValueError('progress must be between 0 and 100')
+        return value
+    if isinstance(column_type, String):
+        if not isinstance(value, str):
+            raise ValueError(f'{field} must be a string')
+        if column_type.length and len(value) > column_type.length:
+            raise ValueError(f'{field} is longer than {column_type.length} characters')
+    return value
+
+
+def check_choices(model, values):
+    """Raise ValueError if `values` gives an enumerated field a value the model does not allow."""
+    for field, allowed in FIELD_CHOICES.get(model, {}).items():
+        if field in values and values[field] not in allowed:
+            raise ValueError(f"{field} must be one of: {', '.join(allowed)}")
+
+
+def _validate_fields(model, item):
+    fields, _, _ = BULK_MODELS[model]
+    unknown = [k for k in item if k not in fields and k != 'id']
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    values = {k: _coerce(model, k, v) for k, v in item.items() if k in fields}
+    check_choices(model, values)
+    return values
+
+
+def validate_create(model, item):
+    if not isinstance(item, dict):
+        raise ValueError('item must be an object')
+    _, required, defaults = BULK_MODELS[model]
+    missing = [k for k in required if not item.get(k)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    return {**defaults, **_validate_fields(model, item)}
+
+
+def validate_update(model, item):
+    if not isinstance(item, dict):
+        raise ValueError('item must be an object')
+    if isinstance(item.get('id'), bool) or not isinstance(item.get('id'), int):
+        raise ValueError('id must be an integer')
+    if model is Note and 'note_type' in item:
+        # PUT /notes/<id> never changes it either: a text note has no audio, a voice note needs it
+        raise ValueError('note_type cannot be changed')
+    _, required, _ = BULK_MODELS[model]
+    values = _validate_fields(model, item)
+    blank = [k for k in required if k in values and not values[k]]
+    if blank:
+        raise ValueError(f"Required fields cannot be empty: {', '.join(blank)}")
+    return values
+
+
+def _owned_ids(model, user_id, ids):
+    if not ids:
+        return set()
+    rows = db.session.query(model.id).filter(model.user_id == user_id, model.id.in_(ids)).all()
+    return {row_id for (row_id,) in rows}
+
+
+def apply_bulk(model, user_id, payload, atomic=False):
+    """
+    Validate and apply {"create": [...], "update": [{"id", ...}], "delete": [ids]}
+    for one user in a single transaction: one DELETE, executemany updates and
+    inserts. Inserts need their primary keys back (return_defaults), which
+    SQLAlchemy 2.x batches with insertmanyvalues (INSERT ... RETURNING); on 1.4
+    they are sent one row at a time.
+
+    Returns ({"create": [...], "update": [...], "delete": [...]}, applied) where each
+    per-item result is {"index", "ok", "id"} or {"index", "ok": False, "error"}.
+    Invalid items are skipped; with atomic=True any invalid item cancels the batch
+    (applied is False).
+    """
+    creates = payload.get('create') or []
+    updates = payload.get('update') or []
+    deletes = payload.get('delete') or []
+    if not all(isinstance(part, list) for part in (creates, updates, deletes)):
+        raise BulkError('create, update and delete must be lists')
+    if len(creates) + len(updates) + len(deletes) > BULK_MAX_ITEMS:
+        raise BulkError(f'At most {BULK_MAX_ITEMS} items per request')
+
+    results = {'create': [], 'update': [], 'delete': []}
+    now = datetime.utcnow()
+
+    insert_rows, insert_results = [], []
+    for index, item in enumerate(creates):
+        try:
+            row = validate_create(model, item)
+        except ValueError as e:
+            results['create'].append({'index': index, 'ok': False, 'error': str(e)})
+            continue
+        row.update(user_id=user_id, created_at=now, updated_at=now)
+        insert_rows.append(row)
+        result = {'index': index, 'ok': True}
+        results['create'].append(result)
+        insert_results.append(result)
+
+    owned = _owned_ids(model, user_id, [item['id'] for item in updates
+                                        if isinstance(item, dict) and isinstance(item.get('id'), int)])
+    update_rows, seen = [], set()
+    for index, item in enumerate(updates):
+        try:
+            row = validate_update(model, item)
+            if item['id'] not in owned:
+                raise ValueError('not found')
+            if item['id'] in seen:
+                raise ValueError('duplicate id in batch')
+        except ValueError as e:
+            results['update'].append({'index': index, 'ok': False, 'error': str(e)})
+            continue
+        seen.add(item['id'])
+        update_rows.append({**row, 'id': item['id'], 'updated_at': now})
+        results['update'].append({'index': index, 'ok': True, 'id': item['id']})
+
+    owned = _owned_ids(model, user_id, [i for i in deletes if isinstance(i, int) and not isinstance(i, bool)])
+    delete_ids = []
+    for index, row_id in enumerate(deletes):
+        if row_id in owned and row_id not in delete_ids:
+            delete_ids.append(row_id)
+            results['delete'].append({'index': index, 'ok': True, 'id': row_id})
+        else:
+            results['delete'].append({'index': index, 'ok': False, 'error': 'not found'})
+
+    if atomic and any(not r['ok'] for part in results.values() for r in part):
+        return results, False
+
+    audio_files = []
+    try:
+        if insert_rows:
+            db.session.bulk_insert_mappings(model, insert_rows, return_defaults=True)
+            for row, result in zip(insert_rows, insert_results):
+                result['id'] = row['id']
+        if update_rows:
+            # bulk_update_mappings groups rows by key set and issues one executemany per group
+            db.session.bulk_update_mappings(model, update_rows)
+        if model is Note:
+            # Tags were stored as their JSON copy; mirror them into the tag index
+            note_tags = {row['id']: json.loads(row['tags']) for row in insert_rows + update_rows if 'tags' in row}
+            if note_tags:
+                Tag.link_notes(note_tags)
+        if delete_ids:
+            if model is Note:
+                db.session.execute(note_tag.delete().where(note_tag.c.note_id.in_(delete_ids)))
+                audio_files = [path for (path,) in db.session.query(Note.audio_file_path)
+                               .filter(Note.id.in_(delete_ids), Note.audio_file_path.isnot(None))]
+            model.query.filter(model.id.in_(delete_ids)).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if audio_files:
+        get_audio_store(current_app.root_path).discard(audio_files, Note.unreferenced_audio)
+
+    if model is Note:
+        index_in_background('notes', [(row['id'], row['content']) for row in insert_rows + update_rows
+                                      if row.get('content')])
+        if delete_ids:
+            remove_from_index('notes', delete_ids)
+
+    # Bulk statements bypass the mapper events that keep the dashboard counters current
+    if dashboard_stats.COUNTERS_ENABLED and (insert_rows or update_rows or delete_ids):
+        dashboard_stats.rebuild_counters(user_id)
+
+    return results, True
@@ -1,10 +1,51 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
 from PyPDF2 import PdfReader
 import tempfile
 import os
+import mmap
 import mimetypes
-from typing import Dict, Any, List, Optional
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from .html_backends import get_html_backend
+from .http_cache import HttpCache, default_http_cache
+
+# Below this many pages a PDF is extracted inline; the process pool is not worth it.
+PDF_PARALLEL_MIN_PAGES = 8
+PDF_PAGES_PER_TASK = 4
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # spawn, not fork: the pool is created from multi-threaded job/pipeline workers
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def _open_pdf(f) -> Tuple[mmap.mmap, PdfReader]:
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return mm, PdfReader(mm)
+
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) of a PDF. Runs in a pool worker, so it must stay module-level."""
+    with open(file_path, "rb") as f:
+        mm, reader = _open_pdf(f)
+        try:
+            return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+        finally:
+            mm.close()
 
 
 class ContentExtractor:
@@ -13,83 +54,216 @@ class ContentExtractor:
     Supports: web pages (HTML), PDF documents, and plain text.
     """
 
-    def __init__(self):
+    def __init__(self, cache: Optional[HttpCache] = None, max_download_bytes: int = 50 * 1024 * 1024,
+                 pool_maxsize: int = 16, html_backend: Optional[str] = None):
+        # One pooled session shared by all threads (batch fetches reuse keep-alive connections)
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache = cache if cache is not None else default_http_cache()
+        self.max_download_bytes = max_download_bytes
+        # "lxml" (C parser + boilerplate removal), "soup" or "auto"
+        self.html_backend = get_html_backend(html_backend)
 
-    def fetch_url(self, url: str) -> str:
-        """Download raw content from a URL."""
+    def _conditional_get(self, url: str, timeout: int = 20) -> Tuple[Dict[str, Any], bool]:
+        """
+        GET a URL, revalidating any cached copy with If-None-Match / If-Modified-Since.
+        Returns (entry, not_modified); entry holds body, encoding and, when known, extracted text.
+        """
+        cached = self.cache.get(url)
         try:
-            response = self.session.get(url, timeout=20)
+            response = self.session.get(url, timeout=timeout, headers=self.cache.conditional_headers(cached))
+            if response.status_code == 304 and cached:
+                self.cache.touch(url, response.headers)
+                return cached, True
             response.raise_for_status()
-            return response.text
         except Exception as e:
             raise RuntimeError(f"Failed to fetch URL {url}: {e}")
 
-    def extract_from_html(self, html_content: str) -> Dict[str, Any]:
-        """Parse and extract clean text + metadata from HTML."""
-        soup = BeautifulSoup(html_content, "html.parser")
+        encoding = response.encoding or response.apparent_encoding
+        self.cache.store(url, response.headers, response.content, encoding)
+        return {"body": response.content, "encoding": encoding, "extracted": None}, False
 
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.extract()
+    def _iter_limited(self, response):
+        """A response body in chunks, aborting past max_download_bytes."""
+        declared = int(response.headers.get("Content-Length") or 0)
+        if declared > self.max_download_bytes:
+            raise ValueError(f"response is {declared} bytes, limit is {self.max_download_bytes}")
+        size = 0
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > self.max_download_bytes:
+                raise ValueError(f"response exceeds {self.max_download_bytes} bytes")
+            yield chunk
 
-        text = " ".join(soup.get_text().split())
+    def _save_to_file(self, response, suffix: str) -> str:
+        """Stream a response body to a temp file (for the PDF reader)."""
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        try:
+            for chunk in self._iter_limited(response):
+                tmp.write(chunk)
+            tmp.close()
+        except Exception:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+        return tmp.name
 
-        title = soup.title.string if soup.title else None
-        meta_description = None
-        meta = soup.find("meta", attrs={"name": "description"})
-        if meta and "content" in meta.attrs:
-            meta_description = meta["content"]
+    def resolve_url(self, url: str, timeout: int = 10) -> str:
+        """Follow redirects with a HEAD request and return the final URL (the input URL on failure)."""
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=timeout)
+            return response.url or url
+        except Exception:
+            return url
 
-        return {
-            "title": title,
-            "description": meta_description,
-            "raw_text": text,
-        }
+    @staticmethod
+    def _decode(entry: Dict[str, Any]) -> str:
+        return (entry["body"] or b"").decode(entry.get("encoding") or "utf-8", errors="replace")
+
+    def fetch_url(self, url: str) -> str:
+        """Download raw content from a URL (served from the cache on 304 Not Modified)."""
+        entry, _ = self._conditional_get(url)
+        return self._decode(entry)
 
-    def extract_from_pdf(self, file_path: str) -> Dict[str, Any]:
-        """Extract text from a PDF file."""
-        text = ""
+    def extract_from_html(self, html_content: str, max_chars: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Parse and extract clean text + metadata from HTML using the configured backend.
+        With max_chars, text collection stops as soon as the budget is met.
+        """
+        return self.html_backend.extract(html_content, max_chars=max_chars)
+
+    def extract_from_pdf(self, file_path: str, max_pages: Optional[int] = None,
+                         max_chars: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Extract text from a PDF file.
+        The file is memory-mapped; large documents are split into page ranges
+        extracted in parallel by a process pool. Extraction stops early once
+        max_pages pages or max_chars characters have been produced.
+        """
+        pages = None
         try:
             with open(file_path, "rb") as f:
-                reader = PdfReader(f)
-                for page in reader.pages:
-                    text += page.extract_text() or ""
+                mm, reader = _open_pdf(f)
+                try:
+                    page_count = len(reader.pages)
+                    if max_pages is not None:
+                        page_count = min(page_count, max_pages)
+                    if page_count < PDF_PARALLEL_MIN_PAGES:
+                        pages = self._extract_pages_inline(reader, page_count, max_chars)
+                finally:
+                    mm.close()
+            if pages is None:
+                pages = self._extract_pages_parallel(file_path, page_count, max_chars)
         except Exception as e:
             raise RuntimeError(f"Failed to extract text from PDF: {e}")
 
+        text = "\n".join(pages).strip()
+        if max_chars is not None:
+            text = text[:max_chars]
+
         return {
             "title": os.path.basename(file_path),
-            "raw_text": text.strip(),
+            "raw_text": text,
         }
 
-    def extract(self, source: str, content_type: Optional[str] = None) -> Dict[str, Any]:
+    @staticmethod
+    def _extract_pages_inline(reader: PdfReader, page_count: int, max_chars: Optional[int]) -> List[str]:
+        pages, collected = [], 0
+        for i in range(page_count):
+            page_text = reader.pages[i].extract_text() or ""
+            pages.append(page_text)
+            collected += len(page_text)
+            if max_chars is not None and collected >= max_chars:
+                break
+        return pages
+
+    @staticmethod
+    def _extract_pages_parallel(file_path: str, page_count: int, max_chars: Optional[int]) -> List[str]:
+        """
+        Extract pages in waves of page ranges across the pool, stopping after the
+        first wave that reaches max_chars.
+        """
+        pool = _get_pdf_pool()
+        wave_size = PDF_PAGES_PER_TASK * PDF_WORKERS
+        pages, collected = [], 0
+        for wave_start in range(0, page_count, wave_size):
+            wave_stop = min(wave_start + wave_size, page_count)
+            futures = [
+                pool.submit(_extract_pdf_pages, file_path, start, min(start + PDF_PAGES_PER_TASK, wave_stop))
+                for start in range(wave_start, wave_stop, PDF_PAGES_PER_TASK)
+            ]
+            for future in futures:
+                chunk = future.result()
+                pages.extend(chunk)
+                collected += sum(len(p) for p in chunk)
+            if max_chars is not None and collected >= max_chars:
+                break
+        return pages
+
+    def extract(self, source: str, content_type: Optional[str] = None,
+                max_chars: Optional[int] = None) -> Dict[str, Any]:
         """
-        Auto-detect and extract content.
+        Fetch a URL and extract its content.
         - If content_type provided: use it directly.
-        - Otherwise: detect by URL or file extension.
+        - Otherwise: dispatch on the response Content-Type (extensionless article
+          URLs are HTML too), falling back to the URL's extension when the server
+          sends none. Anything that is neither HTML nor PDF is treated as plain text.
+        - max_chars: stop producing text once this many characters are extracted
+          (e.g. the analyzer's input window); None extracts the whole document.
+
+        HTML and text bodies are cached; PDFs only keep their validators and
+        extraction, so they are revalidated only when that extraction covers max_chars.
         """
-        if not content_type:
-            content_type, _ = mimetypes.guess_type(source)
-
-        if content_type:
-            if "html" in content_type:
-                html = self.fetch_url(source)
-                return self.extract_from_html(html)
-            elif "pdf" in content_type:
-                # Download to temp file
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".pdf")
-                try:
-                    response = self.session.get(source, timeout=30)
-                    response.raise_for_status()
-                    tmp.write(response.content)
-                    tmp.close()
-                    return self.extract_from_pdf(tmp.name)
-                finally:
-                    os.unlink(tmp.name)
+        cached = self.cache.get(source)
+        if cached and cached.get("body") is None and self.cache.extraction_for_budget(cached, max_chars) is None:
+            cached = None
+
+        try:
+            with self.session.get(source, timeout=30, stream=True,
+                                  headers=self.cache.conditional_headers(cached)) as response:
+                if response.status_code == 304 and cached:
+                    self.cache.touch(source, response.headers)
+                    extracted = self.cache.extraction_for_budget(cached, max_chars)
+                    if extracted:
+                        return extracted
+                    return self._extract_body(source, cached, content_type or cached.get("content_type"), max_chars)
+                response.raise_for_status()
 
-        # Fallback: assume plain text
+                content_type = content_type or response.headers.get("Content-Type") \
+                    or mimetypes.guess_type(source)[0] or ""
+                if "pdf" in content_type:
+                    tmp_path = self._save_to_file(response, suffix=".pdf")
+                else:
+                    body = b"".join(self._iter_limited(response))
+                    # apparent_encoding would re-read the consumed stream; detect on the bytes read
+                    encoding = response.encoding or (chardet.detect(body)["encoding"] if chardet else None)
+                headers = response.headers
+        except Exception as e:
+            raise RuntimeError(f"Failed to fetch URL {source}: {e}")
+
+        if "pdf" in content_type:
+            self.cache.store(source, headers, None)
+            try:
+                extracted = self.extract_from_pdf(tmp_path, max_chars=max_chars)
+            finally:
+                os.unlink(tmp_path)
+            self.cache.store_extracted(source, extracted, max_chars)
+            return extracted
+
+        self.cache.store(source, headers, body, encoding)
+        return self._extract_body(source, {"body": body, "encoding": encoding}, content_type, max_chars)
+
+    def _extract_body(self, source: str, entry: Dict[str, Any], content_type: Optional[str],
+                      max_chars: Optional[int]) -> Dict[str, Any]:
+        """Extract a fetched (or cached) HTML or plain-text body."""
+        text = self._decode(entry)
+        if "html" in (content_type or ""):
+            extracted = self.extract_from_html(text, max_chars=max_chars)
+            self.cache.store_extracted(source, extracted, max_chars)
+            return extracted
         return {
             "title": None,
-            "raw_text": self.fetch_url(source),
-        }
\ No newline at end of file
+            "raw_text": text[:max_chars] if max_chars is not None else text,
+        }
@@ -0,0 +1,142 @@
+import os
+
+from sqlalchemy import event, func, inspect, text
+
+from src.models.master_agent import Task, Goal, Note, UserCounter, db
+
+TOTAL = '_total'
+# Marker row written by rebuild_counters: the user's counters were seeded from the
+# source tables. Until it exists, delta rows written by the listeners are discarded.
+SEEDED_ENTITY, SEEDED_BUCKET = '_meta', 'seeded'
+
+# model -> (entity name, column the dashboard breaks counts down by)
+COUNTED_MODELS = {
+    Task: ('task', 'status'),
+    Goal: ('goal', 'status'),
+    Note: ('note', 'note_type'),
+}
+
+# Keep UserCounter rows in sync on every create/update/delete so the dashboard
+# reads O(1) rows per user; otherwise counts come from one grouped query per table.
+# A user's counters are seeded from the source tables on their first dashboard read
+# (rebuild_all_counters() does it for everyone up front).
+COUNTERS_ENABLED = os.environ.get('DASHBOARD_COUNTERS', '0') == '1'
+
+_UPSERT = text(
+    'INSERT INTO user_counter (user_id, entity, bucket, value) VALUES (:user_id, :entity, :bucket, :delta) '
+    'ON CONFLICT (user_id, entity, bucket) DO UPDATE SET value = user_counter.value + excluded.value'
+)
+# Seeding sets absolute values; a concurrent seed of the same user overwrites instead of
+# hitting the primary key
+_SEED = text(
+    'INSERT INTO user_counter (user_id, entity, bucket, value) VALUES (:user_id, :entity, :bucket, :value) '
+    'ON CONFLICT (user_id, entity, bucket) DO UPDATE SET value = excluded.value'
+)
+
+
+def grouped_counts_query(model, user_id):
+    column = getattr(model, COUNTED_MODELS[model][1])
+    return db.session.query(column, func.count()).filter(model.user_id == user_id).group_by(column)
+
+
+def grouped_counts(model, user_id):
+    """Counts per bucket plus '_total' for one table, in a single GROUP BY query."""
+    rows = grouped_counts_query(model, user_id).all()
+    counts = {bucket: count for bucket, count in rows if bucket is not None}
+    counts[TOTAL] = sum(count for _, count in rows)
+    return counts
+
+
+def rebuild_counters(user_id):
+    """Recompute a user's counters from the source tables (backfill, or after bulk writes)."""
+    UserCounter.query.filter_by(user_id=user_id).delete()
+    rows = [{'user_id': user_id, 'entity': entity, 'bucket': bucket, 'value': value}
+            for model, (entity, _) in COUNTED_MODELS.items()
+            for bucket, value in grouped_counts(model, user_id).items()]
+    rows.append({'user_id': user_id, 'entity': SEEDED_ENTITY, 'bucket': SEEDED_BUCKET, 'value': 1})
+    db.session.execute(_SEED, rows)
+    db.session.commit()
+
+
+def rebuild_all_counters():
+    for (user_id,) in db.session.query(Task.user_id).union(
+            db.session.query(Goal.user_id), db.session.query(Note.user_id)).all():
+        rebuild_counters(user_id)
+
+
+def _read_counters(user_id):
+    rows = UserCounter.query.filter_by(user_id=user_id).all()
+    # Rows without the seeded marker are deltas counted from zero (writes made
+    # before the user's first dashboard read), so they are rebuilt, not trusted
+    if not any(row.entity == SEEDED_ENTITY for row in rows):
+        rebuild_counters(user_id)
+        rows = UserCounter.query.filter_by(user_id=user_id).all()
+
+    counts = {entity: {} for entity, _ in COUNTED_MODELS.values()}
+    for row in rows:
+        if row.entity in counts:
+            counts[row.entity][row.bucket] = row.value
+    return counts
+
+
+def get_counts(user_id):
+    """{'task': {...}, 'goal': {...}, 'note': {...}} bucket counts, each with a '_total'."""
+    if COUNTERS_ENABLED:
+        return _read_counters(user_id)
+    return {entity: grouped_counts(model, user_id) for model, (entity, _) in COUNTED_MODELS.items()}
+
+
+def _apply(connection, user_id, entity, deltas):
+    for bucket, delta in deltas.items():
+        if bucket is not None and delta:
+            connection.execute(_UPSERT, {'user_id': user_id, 'entity': entity, 'bucket': bucket, 'delta': delta})
+
+
+def _make_listeners(entity, field):
+    def after_insert(mapper, connection, target):
+        _apply(connection, target.user_id, entity, {TOTAL: 1, getattr(target, field): 1})
+
+    def after_delete(mapper, connection, target):
+        _apply(connection, target.user_id, entity, {TOTAL: -1, getattr(target, field): -1})
+
+    def after_update(mapper, connection, target):
+        state = inspect(target)
+        owner = state.attrs.user_id.history
+        history = state.attrs[field].history
+        if owner.has_changes():
+            # Moved to another user: leaves the old user's counts, joins the new user's
+            old_value = history.deleted[0] if history.has_changes() and history.deleted else getattr(target, field)
+            for old_user in owner.deleted:
+                _apply(connection, old_user, entity, {TOTAL: -1, old_value: -1})
+            _apply(connection, target.user_id, entity, {TOTAL: 1, getattr(target, field): 1})
+            return
+        if not history.has_changes():
+            return
+        deltas = {}
+        for old in history.deleted:
+            deltas[old] = deltas.get(old, 0) - 1
+        for new in history.added:
+            deltas[new] = deltas.get(new, 0) + 1
+        _apply(connection, target.user_id, entity, deltas)
+
+    return after_insert, after_update, after_delete
+
+
+_listeners_installed = False
+
+
+def install_counter_listeners():
+    """Attach the mapper events that maintain UserCounter (idempotent)."""
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    for model, (entity, field) in COUNTED_MODELS.items():
+        after_insert, after_update, after_delete = _make_listeners(entity, field)
+        event.listen(model, 'after_insert', after_insert)
+        event.listen(model, 'after_update', after_update)
+        event.listen(model, 'after_delete', after_delete)
+    _listeners_installed = True
+
+
+if COUNTERS_ENABLED:
+    install_counter_listeners()
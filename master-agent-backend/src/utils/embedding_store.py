@@ -0,0 +1,400 @@
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matrix multiply; bounds the temporary score matrix
+SEARCH_BLOCK_ROWS = 65536
+# Fingerprint value that marks an id as deleted
+TOMBSTONE = 0
+# compact() runs once a store has this many rows and this fraction of them is dead
+COMPACT_MIN_ROWS = int(os.getenv("EMBEDDING_COMPACT_MIN_ROWS", "1024"))
+COMPACT_DEAD_RATIO = float(os.getenv("EMBEDDING_COMPACT_DEAD_RATIO", "0.5"))
+
+
+def text_fingerprint(text: str) -> int:
+    """Non-zero 64-bit fingerprint of whitespace-normalized text, used to skip re-embedding."""
+    digest = hashlib.blake2b(" ".join((text or "").split()).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped store of unit-length float32 vectors.
+
+    Three files share a prefix: <prefix>.f32 (n x dim matrix), <prefix>.ids
+    (int64 item id per row) and <prefix>.fp (uint64 text fingerprint per row).
+    Re-adding an id appends a new row that supersedes the old one; deleting
+    appends a tombstone. compact() rewrites the files without dead rows.
+    Appends and compaction take an exclusive flock, so several processes can
+    share a store; readers remap under a shared flock whenever the ids file
+    changed (grew, or was replaced by a compaction).
+    """
+
+    def __init__(self, prefix: str, dim: int):
+        self.prefix = prefix
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._rows = -1
+        self._version = None
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._fingerprints = np.zeros(0, dtype=np.uint64)
+        self._live = np.zeros(0, dtype=bool)
+        self._row_of: Dict[int, int] = {}
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+
+    def _path(self, ext: str) -> str:
+        return f"{self.prefix}.{ext}"
+
+    def _file_lock(self, shared: bool = False):
+        handle = open(self._path("lock"), "a")
+        fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        return handle
+
+    def _ids_version(self):
+        try:
+            stat = os.stat(self._path("ids"))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _refresh(self):
+        """Remap the files if another writer (or this one) appended rows or compacted them."""
+        if self._ids_version() == self._version:
+            return
+        # The shared flock keeps a compaction from swapping files while they are mapped;
+        # taken before the thread lock, in the same order as compact()
+        handle = self._file_lock(shared=True)
+        try:
+            with self._lock:
+                self._load()
+        finally:
+            handle.close()
+
+    def _load(self):
+        version = self._ids_version()
+        if version == self._version:
+            return
+        rows = version[1] // 8 if version else 0
+        if rows:
+            matrix = np.memmap(self._path("f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+            ids = np.fromfile(self._path("ids"), dtype=np.int64, count=rows)
+            fingerprints = np.fromfile(self._path("fp"), dtype=np.uint64, count=rows)
+        else:
+            matrix = np.zeros((0, self.dim), dtype=np.float32)
+            ids = np.zeros(0, dtype=np.int64)
+            fingerprints = np.zeros(0, dtype=np.uint64)
+
+        # The last row written for an id is its current version
+        _, first_in_reversed = np.unique(ids[::-1], return_index=True)
+        latest = rows - 1 - first_in_reversed
+        live = np.zeros(rows, dtype=bool)
+        live[latest] = fingerprints[latest] != TOMBSTONE
+
+        self._matrix, self._ids, self._fingerprints, self._live = matrix, ids, fingerprints, live
+        self._row_of = {int(ids[r]): int(r) for r in latest if live[r]}
+        self._rows = rows
+        self._version = version
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._row_of)
+
+    def _append(self, ids: np.ndarray, vectors: np.ndarray, fingerprints: np.ndarray):
+        handle = self._file_lock()
+        try:
+            # Vectors first: a reader sizes the matrix from the ids file
+            with open(self._path("f32"), "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(self._path("fp"), "ab") as f:
+                f.write(np.ascontiguousarray(fingerprints, dtype=np.uint64).tobytes())
+            with open(self._path("ids"), "ab") as f:
+                f.write(np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+        finally:
+            handle.close()
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray, fingerprints: Optional[Sequence[int]] = None):
+        """Append (or replace) vectors for the given ids. Vectors are L2-normalized here."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        if fingerprints is None:
+            fingerprints = [1] * len(ids)
+        self._append(np.asarray(ids, dtype=np.int64), vectors, np.asarray(fingerprints, dtype=np.uint64))
+
+    def delete(self, ids: Sequence[int]):
+        ids = [i for i in ids if self.fingerprint(i) is not None]
+        if ids:
+            self._append(np.asarray(ids, dtype=np.int64), np.zeros((len(ids), self.dim), dtype=np.float32),
+                         np.full(len(ids), TOMBSTONE, dtype=np.uint64))
+
+    def get(self, item_id: int) -> Optional[np.ndarray]:
+        self._refresh()
+        row = self._row_of.get(int(item_id))
+        return None if row is None else np.array(self._matrix[row])
+
+    def fingerprint(self, item_id: int) -> Optional[int]:
+        self._refresh()
+        row = self._row_of.get(int(item_id))
+        return None if row is None else int(self._fingerprints[row])
+
+    def search(self, queries: np.ndarray, k: int = 10, candidate_ids: Optional[Iterable[int]] = None,
+               exclude_ids: Optional[Iterable[int]] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Top-k cosine neighbours for each query vector (m x dim), best first, as
+        [(item id, score), ...] per query. candidate_ids restricts the search to
+        those items (e.g. one user's); exclude_ids drops items from every result.
+        """
+        self._refresh()
+        with self._lock:
+            # One consistent snapshot, in case another thread remaps meanwhile
+            matrix, ids, live, total_rows = self._matrix, self._ids, self._live, self._rows
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        mask = live.copy()
+        if candidate_ids is not None:
+            mask &= np.isin(ids, np.fromiter(candidate_ids, dtype=np.int64))
+        if exclude_ids is not None:
+            mask &= ~np.isin(ids, np.fromiter(exclude_ids, dtype=np.int64))
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, total_rows, SEARCH_BLOCK_ROWS):
+            rows = np.flatnonzero(mask[start:start + SEARCH_BLOCK_ROWS]) + start
+            if not len(rows):
+                continue
+            scores = queries @ matrix[rows].T  # m x len(rows)
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                block_rows = rows[top]
+            else:
+                block_rows = np.broadcast_to(rows, scores.shape)
+            # Merge with the running top-k
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, block_rows], axis=1)
+            if best_scores.shape[1] > k:
+                top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+                best_rows = np.take_along_axis(best_rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [
+            [(int(ids[r]), float(s)) for r, s in zip(rows, scores)]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+    def dead_rows(self) -> int:
+        """Rows superseded by a later version or a tombstone (reclaimed by compact())."""
+        self._refresh()
+        return self._rows - len(self._row_of)
+
+    def needs_compaction(self) -> bool:
+        self._refresh()
+        return self._rows >= COMPACT_MIN_ROWS and self.dead_rows() >= self._rows * COMPACT_DEAD_RATIO
+
+    def compact(self):
+        """Rewrite the files with only the live rows."""
+        handle = self._file_lock()
+        try:
+            with self._lock:
+                self._load()
+                rows = np.flatnonzero(self._live)
+                for ext, data in (("f32", np.asarray(self._matrix[rows])), ("fp", self._fingerprints[rows]),
+                                  ("ids", self._ids[rows])):
+                    tmp = self._path(ext + ".tmp")
+                    data.tofile(tmp)
+                    os.replace(tmp, self._path(ext))
+                self._load()
+        finally:
+            handle.close()
+
+    def compact_if_needed(self) -> bool:
+        """compact() once COMPACT_DEAD_RATIO of at least COMPACT_MIN_ROWS rows are dead. Returns whether it ran."""
+        if not self.needs_compaction():
+            return False
+        self.compact()
+        return True
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedding: signed feature hashing of word unigrams and
+    bigrams with log term frequencies. No network, stable across processes;
+    used for tests and when Gemini embeddings are unavailable.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = re.findall(r"\w+", (text or "").lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            for feature in self._features(text):
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+                out[i, h % self.dim] += (1.0 if (h >> 63) else -1.0) * (1.0 + np.log(count))
+        return out
+
+
+class GeminiEmbedder:
+    """Gemini text embeddings, batched and sent through the shared Gemini rate limiter."""
+
+    name = "gemini"
+    MODEL_NAME = "models/embedding-001"
+    dim = 768
+    BATCH_SIZE = 100
+    MAX_INPUT_CHARS = 8000
+
+    def __init__(self, limiter=None):
+        import google.generativeai as genai
+        from .rate_limiter import get_gemini_limiter
+
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY environment variable not set")
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self.limiter = limiter if limiter is not None else get_gemini_limiter()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            batch = [(t or " ")[:self.MAX_INPUT_CHARS] for t in texts[start:start + self.BATCH_SIZE]]
+            result = self.limiter.call(
+                self._genai.embed_content, model=self.MODEL_NAME, content=batch, task_type="retrieval_document"
+            )
+            vectors.extend(result["embedding"])
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def get_embedder(name: Optional[str] = None):
+    """
+    Resolve an embedding backend: "gemini", "hashing", or "auto" (Gemini when
+    GEMINI_API_KEY is set, else hashing). Defaults to $EMBEDDING_BACKEND.
+    """
+    name = (name or os.getenv("EMBEDDING_BACKEND", "auto")).lower()
+    if name == "auto":
+        name = "gemini" if os.getenv("GEMINI_API_KEY") else "hashing"
+    if name == "gemini":
+        return GeminiEmbedder()
+    if name == "hashing":
+        return HashingEmbedder(int(os.getenv("EMBEDDING_HASHING_DIM", "256")))
+    raise ValueError(f"Unknown embedding backend '{name}'")
+
+
+class SemanticIndex:
+    """
+    One EmbeddingStore per item kind ("notes", "research"), embedded with a
+    single backend. Store files are named after the backend and dimension so
+    switching backends never mixes vector spaces.
+    """
+
+    KINDS = ("notes", "research")
+
+    def __init__(self, directory: str, embedder=None):
+        self.directory = directory
+        self.embedder = embedder if embedder is not None else get_embedder()
+        self._stores = {
+            kind: EmbeddingStore(os.path.join(directory, f"{kind}.{self.embedder.name}{self.embedder.dim}"),
+                                 self.embedder.dim)
+            for kind in self.KINDS
+        }
+        # Embedding calls are kept off the request path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-index")
+
+    def store(self, kind: str) -> EmbeddingStore:
+        return self._stores[kind]
+
+    def index(self, kind: str, items: Iterable[Tuple[int, str]]) -> int:
+        """Embed and store (id, text) pairs whose text changed since they were indexed. Returns the count embedded."""
+        store = self._stores[kind]
+        pending = []
+        for item_id, text in items:
+            if not text or not text.strip():
+                continue
+            fingerprint = text_fingerprint(text)
+            if store.fingerprint(item_id) != fingerprint:
+                pending.append((item_id, text, fingerprint))
+        if pending:
+            ids, texts, fingerprints = zip(*pending)
+            store.add(ids, self.embedder.embed(list(texts)), fingerprints)
+            store.compact_if_needed()
+        return len(pending)
+
+    def index_async(self, kind: str, items: Iterable[Tuple[int, str]]):
+        return self._executor.submit(self.index, kind, list(items))
+
+    def remove(self, kind: str, ids: Sequence[int]):
+        store = self._stores[kind]
+        store.delete(ids)
+        # Rewriting the files is kept off the request path too
+        self._executor.submit(store.compact_if_needed)
+
+    def related(self, kind: str, item_id: int, k: int = 10,
+                candidates: Optional[Dict[str, Optional[Iterable[int]]]] = None) -> List[Dict]:
+        """
+        Nearest neighbours of an indexed item across kinds, best first.
+        candidates maps each kind to search to the ids allowed (None = all).
+        Returns [{"type", "id", "score"}], or None if the item is not indexed.
+        """
+        vector = self._stores[kind].get(item_id)
+        if vector is None:
+            return None
+        candidates = candidates if candidates is not None else {k_: None for k_ in self.KINDS}
+        hits = []
+        for target, allowed in candidates.items():
+            exclude = [item_id] if target == kind else None
+            for hit_id, score in self._stores[target].search(vector, k, allowed, exclude)[0]:
+                hits.append({"type": target, "id": hit_id, "score": round(score, 4)})
+        hits.sort(key=lambda h: -h["score"])
+        return hits[:k]
+
+
+_semantic_index = None
+_semantic_index_lock = threading.Lock()
+
+
+def get_semantic_index() -> SemanticIndex:
+    """Process-wide SemanticIndex under $EMBEDDING_STORE_DIR."""
+    global _semantic_index
+    with _semantic_index_lock:
+        if _semantic_index is None:
+            _semantic_index = SemanticIndex(os.getenv("EMBEDDING_STORE_DIR", "/tmp/master_agent_embeddings"))
+        return _semantic_index
+
+
+def index_in_background(kind: str, items: Iterable[Tuple[int, str]]):
+    """Queue (id, text) pairs for embedding; never raises into the caller's request."""
+    try:
+        get_semantic_index().index_async(kind, items)
+    except Exception as e:
+        logger.warning("Could not queue %s for embedding: %s", kind, e)
+
+
+def remove_from_index(kind: str, ids: Sequence[int]):
+    try:
+        get_semantic_index().remove(kind, ids)
+    except Exception as e:
+        logger.warning("Could not remove %s %s from the embedding index: %s", kind, list(ids), e)
@@ -1,6 +1,11 @@
 import os
+import json
 import google.generativeai as genai
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from .analysis_cache import AnalysisCache, default_analysis_cache
+from .rate_limiter import RateLimiter, get_gemini_limiter
 
 
 class GeminiAnalyzer:
@@ -9,25 +14,74 @@ class GeminiAnalyzer:
     Provides summarization, sentiment, key points, and categorization.
     """
 
-    def __init__(self):
+    MODEL_NAME = "gemini-pro"
+    # Bump whenever the prompts below change so cached analyses are not reused.
+    PROMPT_VERSION = "1"
+    # Characters of input text sent to the model.
+    MAX_INPUT_CHARS = 4000
+
+    # Chunked (map-reduce) analysis of long documents
+    CHUNK_OVERLAP_CHARS = 200
+    CHUNK_MAX_WORKERS = 4
+    # Default per-document input budget, in tokens (~4 characters per token)
+    CHUNK_TOKEN_BUDGET = 12000
+    CHARS_PER_TOKEN = 4
+    # Upper bounds for a budget / worker count requested per submission
+    CHUNK_MAX_TOKEN_BUDGET = 100000
+    CHUNK_WORKERS_LIMIT = 8
+
+    def __init__(self, cache: Optional[AnalysisCache] = None, limiter: Optional[RateLimiter] = None):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise RuntimeError("GEMINI_API_KEY environment variable not set")
         genai.configure(api_key=api_key)
 
         # Load a default model
-        self.model = genai.GenerativeModel("gemini-pro")
+        self.model = genai.GenerativeModel(self.MODEL_NAME)
+        self.cache = cache if cache is not None else default_analysis_cache()
+        # Shared across analyzers so the whole process respects one quota
+        self.limiter = limiter if limiter is not None else get_gemini_limiter()
+
+    def _generate_json(self, prompt: str, cache_text: str, prompt_kind: str) -> Dict[str, Any]:
+        """
+        Run a prompt and parse the JSON answer, going through the analysis cache.
+        cache_text is the variable part of the prompt; prompt_kind tells prompts apart
+        and carries any other prompt input (e.g. the chunk position).
+        """
+        cache_key = self.cache.make_key(cache_text, self.MODEL_NAME, f"{self.PROMPT_VERSION}:{prompt_kind}")
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self.limiter.call(self.model.generate_content, prompt)
+            # Try parsing as JSON (Gemini usually returns JSON-like output)
+            text_out = response.text.strip()
+            if text_out.startswith("```"):
+                # Strip code fences if present
+                text_out = text_out.split("```")[1]
+                if text_out.startswith("json"):
+                    text_out = text_out[len("json"):].strip()
+            analysis = json.loads(text_out)
+        except Exception as e:
+            raise RuntimeError(f"Gemini analysis failed: {e}")
+
+        self.cache.set(cache_key, analysis)
+        return analysis
 
     def analyze_text(self, text: str) -> Dict[str, Any]:
         """
         Send text to Gemini for analysis.
         Returns structured dict with summary, key points, sentiment, etc.
+        Results are cached by a hash of the normalized, truncated text.
         """
+        text = " ".join(text.split())[:self.MAX_INPUT_CHARS]
+
         prompt = f"""
         You are an AI research assistant. Analyze the following text and provide results in JSON format.
 
         Text:
-        {text[:4000]}  # Truncate to avoid token overflow
+        {text}  # Truncate to avoid token overflow
 
         Return JSON with these fields:
         - content_summary: a concise 3-5 sentence summary
@@ -38,23 +92,98 @@ class GeminiAnalyzer:
         - tags: a list of relevant keywords
         """
 
-        try:
-            response = self.model.generate_content(prompt)
-            # Try parsing as JSON (Gemini usually returns JSON-like output)
-            text_out = response.text.strip()
-            if text_out.startswith("```"):
-                # Strip code fences if present
-                text_out = text_out.split("```")[1]
-                if text_out.startswith("json"):
-                    text_out = text_out[len("json"):].strip()
-            import json
-            return json.loads(text_out)
-        except Exception as e:
-            raise RuntimeError(f"Gemini analysis failed: {e}")
+        return self._generate_json(prompt, text, "analyze")
+
+    def chunked_input_chars(self, token_budget: Optional[int] = None) -> int:
+        """Characters of input a chunked analysis reads under the given token budget."""
+        return (token_budget or self.CHUNK_TOKEN_BUDGET) * self.CHARS_PER_TOKEN
+
+    def split_chunks(self, text: str, chunk_chars: Optional[int] = None,
+                     overlap: Optional[int] = None) -> List[str]:
+        """
+        Split text into overlapping chunks of at most chunk_chars characters,
+        preferring to cut at whitespace.
+        """
+        chunk_chars = chunk_chars or self.MAX_INPUT_CHARS
+        overlap = self.CHUNK_OVERLAP_CHARS if overlap is None else overlap
+
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = min(start + chunk_chars, len(text))
+            if end < len(text):
+                cut = text.rfind(" ", start + chunk_chars // 2, end)
+                if cut != -1:
+                    end = cut
+            chunks.append(text[start:end].strip())
+            if end >= len(text):
+                break
+            start = max(end - overlap, start + 1)
+        return [c for c in chunks if c]
+
+    def _analyze_chunk(self, chunk: str, index: int, total: int) -> Dict[str, Any]:
+        prompt = f"""
+        You are an AI research assistant. The following text is part {index + 1} of {total} of a longer document.
+        Analyze this part only and provide results in JSON format.
+
+        Text:
+        {chunk}
+
+        Return JSON with these fields:
+        - content_summary: a concise 2-3 sentence summary of this part
+        - key_points: a list of up to 5 bullet points
+        - sentiment: overall sentiment (positive, neutral, negative)
+        - category: primary category/topic
+        - importance_score: integer 1-100 (higher = more important)
+        - tags: a list of relevant keywords
+        """
+        # The prompt names the chunk's position, so it is part of the cache key
+        return self._generate_json(prompt, chunk, f"chunk:{index + 1}/{total}")
+
+    def _reduce_chunks(self, partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+        partials_json = json.dumps(partials, ensure_ascii=False)
+        prompt = f"""
+        You are an AI research assistant. Below are JSON analyses of consecutive parts of one document.
+        Merge them into a single analysis of the whole document and provide results in JSON format.
+
+        Part analyses:
+        {partials_json}
+
+        Return JSON with these fields:
+        - content_summary: a concise 3-5 sentence summary of the whole document
+        - key_points: a list of 5-7 bullet points, deduplicated across parts
+        - sentiment: overall sentiment (positive, neutral, negative)
+        - category: primary category/topic
+        - importance_score: integer 1-100 (higher = more important)
+        - tags: a list of relevant keywords, deduplicated
+        """
+        return self._generate_json(prompt, partials_json, "reduce")
+
+    def analyze_long_text(self, text: str, token_budget: Optional[int] = None,
+                          max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Map-reduce analysis for documents longer than the model input window.
+        Overlapping chunks (up to token_budget tokens in total) are analyzed
+        concurrently by at most max_workers threads, then merged by one reduce call.
+        Short texts fall back to a single analyze_text call.
+        """
+        text = " ".join(text.split())[:self.chunked_input_chars(token_budget)]
+        if len(text) <= self.MAX_INPUT_CHARS:
+            return self.analyze_text(text)
+
+        chunks = self.split_chunks(text)
+        workers = min(max_workers or self.CHUNK_MAX_WORKERS, len(chunks))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(self._analyze_chunk, chunks, range(len(chunks)), [len(chunks)] * len(chunks)))
+
+        return self._reduce_chunks(partials)
 
-    def analyze_url_content(self, extracted: Dict[str, Any]) -> Dict[str, Any]:
+    def analyze_url_content(self, extracted: Dict[str, Any], chunked: bool = False,
+                            token_budget: Optional[int] = None, max_workers: Optional[int] = None) -> Dict[str, Any]:
         """
         Given extracted dict {title, raw_text, description}, return analysis enriched with metadata.
+        With chunked=True, long texts are analyzed in full via analyze_long_text,
+        with its token_budget and max_workers (class defaults when None).
         """
         raw_text = extracted.get("raw_text") or ""
         if not raw_text.strip():
@@ -67,5 +196,8 @@ class GeminiAnalyzer:
                 "tags": [],
             }
 
-        analysis = self.analyze_text(raw_text)
-        return {**extracted, **analysis}
\ No newline at end of file
+        if chunked:
+            analysis = self.analyze_long_text(raw_text, token_budget, max_workers)
+        else:
+            analysis = self.analyze_text(raw_text)
+        return {**extracted, **analysis}
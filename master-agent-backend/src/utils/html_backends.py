@@ -0,0 +1,177 @@
+import os
+import re
+from typing import Any, Dict, Iterable, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml is optional; the BeautifulSoup backend works without it
+    lxml = None
+
+# Elements that never hold article text
+BOILERPLATE_TAGS = (
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas", "form",
+    "nav", "header", "footer", "aside", "button", "select", "input",
+)
+# class/id hints for navigation, cookie banners, share bars, ads...
+UNLIKELY_CANDIDATES = re.compile(
+    r"banner|breadcrumb|cookie|consent|gdpr|combx|comment|community|disqus|footer|header|menu|"
+    r"modal|nav|newsletter|popup|promo|related|remark|rss|share|shoutbox|sidebar|skyscraper|"
+    r"social|sponsor|subscribe|advert|ad-break|agegate|pagination|pager|tweet|widget",
+    re.IGNORECASE,
+)
+MAYBE_CANDIDATES = re.compile(r"and|article|body|column|content|main|shadow|story|entry|post", re.IGNORECASE)
+# Paragraph-like elements scored to locate the main content block
+SCORED_TAGS = ("p", "pre", "td", "blockquote", "li")
+MIN_PARAGRAPH_CHARS = 25
+# lxml refuses str input that carries an encoding declaration (XHTML pages)
+XML_DECLARATION = re.compile(r"^\s*<\?xml[^>]*\?>", re.IGNORECASE)
+
+
+def collect_text(strings: Iterable[str], max_chars: Optional[int] = None) -> str:
+    """
+    Join text nodes and normalize whitespace. With max_chars, stop consuming
+    strings once that many normalized characters are available.
+    """
+    if max_chars is None:
+        return " ".join("".join(strings).split())
+
+    pieces, raw_len, threshold = [], 0, max_chars
+    for s in strings:
+        pieces.append(s)
+        raw_len += len(s)
+        if raw_len >= threshold:
+            text = " ".join("".join(pieces).split())
+            if len(text) >= max_chars:
+                return text[:max_chars]
+            # Mostly whitespace so far; check again after twice as much input
+            threshold = raw_len * 2
+    return " ".join("".join(pieces).split())[:max_chars]
+
+
+class SoupBackend:
+    """BeautifulSoup extraction of the whole document (the original behaviour)."""
+
+    name = "soup"
+
+    def __init__(self, parser: str = "html.parser"):
+        self.parser = parser
+
+    def extract(self, html_content: str, max_chars: Optional[int] = None) -> Dict[str, Any]:
+        soup = BeautifulSoup(html_content, self.parser)
+
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.extract()
+
+        text = collect_text(soup.strings, max_chars)
+
+        title = soup.title.string if soup.title else None
+        meta_description = None
+        meta = soup.find("meta", attrs={"name": "description"})
+        if meta and "content" in meta.attrs:
+            meta_description = meta["content"]
+
+        return {
+            "title": title,
+            "description": meta_description,
+            "raw_text": text,
+        }
+
+
+class LxmlBackend:
+    """
+    lxml (C parser) extraction with readability-style boilerplate removal:
+    drops navigation/footer/banner elements, then keeps only the block whose
+    paragraphs score highest (falling back to <article>/<main>/<body>).
+    """
+
+    name = "lxml"
+
+    def __init__(self, main_content: bool = True):
+        if lxml is None:
+            raise RuntimeError("lxml is not installed")
+        self.main_content = main_content
+
+    def extract(self, html_content: str, max_chars: Optional[int] = None) -> Dict[str, Any]:
+        if not html_content or not html_content.strip():
+            return {"title": None, "description": None, "raw_text": ""}
+        try:
+            root = lxml.html.fromstring(XML_DECLARATION.sub("", html_content, count=1))
+        except (etree.ParserError, ValueError):
+            # Element-free or otherwise unparseable markup: BeautifulSoup copes with these
+            return SoupBackend().extract(html_content, max_chars)
+
+        title_el = root.find(".//title")
+        title = title_el.text_content().strip() if title_el is not None else None
+        meta = root.xpath('//meta[@name="description"]/@content')
+        meta_description = meta[0] if meta else None
+
+        self._strip_boilerplate(root)
+        node = self._main_node(root) if self.main_content else root
+        # Separate text nodes so block elements don't run together ("Heading" + "First paragraph")
+        text = collect_text((t + " " for t in node.itertext()), max_chars)
+
+        return {
+            "title": title or None,
+            "description": meta_description,
+            "raw_text": text,
+        }
+
+    @staticmethod
+    def _strip_boilerplate(root):
+        etree.strip_elements(root, etree.Comment, *BOILERPLATE_TAGS, with_tail=False)
+        for el in list(root.iter()):
+            if not isinstance(el.tag, str) or el.tag in ("html", "body", "article", "main"):
+                continue
+            hints = f"{el.get('class', '')} {el.get('id', '')} {el.get('role', '')}"
+            if hints.strip() and UNLIKELY_CANDIDATES.search(hints) and not MAYBE_CANDIDATES.search(hints):
+                if el.getparent() is not None:
+                    el.drop_tree()
+
+    @staticmethod
+    def _link_density(node) -> float:
+        text_len = len(node.text_content()) or 1
+        link_len = sum(len(a.text_content()) for a in node.iter("a"))
+        return link_len / text_len
+
+    def _main_node(self, root):
+        scores = {}
+        for el in root.iter(*SCORED_TAGS):
+            text = el.text_content()
+            if len(text) < MIN_PARAGRAPH_CHARS:
+                continue
+            score = 1 + text.count(",") + min(len(text) // 100, 3)
+            parent = el.getparent()
+            if parent is None:
+                continue
+            scores[parent] = scores.get(parent, 0) + score
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+        if scores:
+            return max(scores, key=lambda n: scores[n] * (1 - self._link_density(n)))
+
+        for xpath in ("//article", "//main", '//*[@role="main"]', "//body"):
+            found = root.xpath(xpath)
+            if found:
+                return found[0]
+        return root
+
+
+def get_html_backend(name: Optional[str] = None):
+    """
+    Resolve an HTML extraction backend by name: "lxml", "soup", or "auto"
+    (lxml when installed, else BeautifulSoup). Defaults to $HTML_EXTRACTOR_BACKEND.
+    """
+    name = (name or os.getenv("HTML_EXTRACTOR_BACKEND", "auto")).lower()
+    if name == "auto":
+        name = "lxml" if lxml is not None else "soup"
+    if name == "lxml":
+        return LxmlBackend()
+    if name == "soup":
+        return SoupBackend()
+    raise ValueError(f"Unknown HTML extractor backend '{name}'")
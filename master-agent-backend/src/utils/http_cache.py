@@ -0,0 +1,173 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+
+class HttpCache:
+    """
+    Persistent cache of HTTP responses keyed by URL, stored in a SQLite file.
+
+    Only responses carrying a validator (ETag or Last-Modified) are stored, so
+    every entry can be revalidated with a conditional request. Alongside the
+    body we keep the text already extracted from it, so a 304 skips parsing too.
+
+    Like AnalysisCache, entries expire `ttl_seconds` after they were last fetched
+    or revalidated, and the least recently used ones are evicted once more than
+    `max_entries` are stored or bodies plus extractions exceed `max_bytes`.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: int = 7 * 24 * 3600, max_entries: int = 2000,
+                 max_bytes: int = 256 * 1024 * 1024):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_type TEXT,
+                    encoding TEXT,
+                    body BLOB,
+                    extracted TEXT,
+                    extracted_max_chars INTEGER,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(http_cache)")}
+            if "extracted_max_chars" not in columns:
+                conn.execute("ALTER TABLE http_cache ADD COLUMN extracted_max_chars INTEGER")
+            if "last_access" not in columns:
+                conn.execute("ALTER TABLE http_cache ADD COLUMN last_access REAL")
+                conn.execute("UPDATE http_cache SET last_access = fetched_at")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_http_cache_last_access ON http_cache (last_access)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT * FROM http_cache WHERE url = ? AND fetched_at >= ?", (url, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE http_cache SET last_access = ? WHERE url = ?", (now, url))
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["extracted"] = json.loads(entry["extracted"]) if entry["extracted"] else None
+        return entry
+
+    @staticmethod
+    def extraction_for_budget(entry: Optional[Dict[str, Any]], max_chars: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        The cached extraction if it covers the requested budget (trimmed to it), else None.
+        An extraction made with a smaller budget cannot serve a larger one.
+        """
+        if not entry or not entry.get("extracted"):
+            return None
+        cached_budget = entry.get("extracted_max_chars")
+        if cached_budget is not None and (max_chars is None or max_chars > cached_budget):
+            return None
+        extracted = dict(entry["extracted"])
+        if max_chars is not None and extracted.get("raw_text"):
+            extracted["raw_text"] = extracted["raw_text"][:max_chars]
+        return extracted
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Request headers that revalidate a cached entry."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, headers, body: Optional[bytes], encoding: Optional[str] = None) -> bool:
+        """
+        Store a 200 response. Returns False (and drops any stale entry) when the
+        response has no validators and therefore cannot be revalidated later.
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        conn = self._connect()
+        try:
+            if not etag and not last_modified:
+                conn.execute("DELETE FROM http_cache WHERE url = ?", (url,))
+                return False
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO http_cache (url, etag, last_modified, content_type, encoding, body, "
+                "extracted, extracted_max_chars, fetched_at, last_access) VALUES (?, ?, ?, ?, ?, ?, NULL, NULL, ?, ?)",
+                (url, etag, last_modified, headers.get("Content-Type"), encoding, body, now, now),
+            )
+            self._evict(conn, now)
+            return True
+        finally:
+            conn.close()
+
+    def store_extracted(self, url: str, extracted: Dict[str, Any], max_chars: Optional[int] = None):
+        """Remember the extraction of the stored body and the character budget it was produced with."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE http_cache SET extracted = ?, extracted_max_chars = ? WHERE url = ?",
+                (json.dumps(extracted), max_chars, url),
+            )
+            self._evict(conn, time.time())
+        finally:
+            conn.close()
+
+    def touch(self, url: str, headers):
+        """Record a successful revalidation, picking up refreshed validators if the server sent any."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE http_cache SET etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified), "
+                "fetched_at = ? WHERE url = ?",
+                (headers.get("ETag"), headers.get("Last-Modified"), time.time(), url),
+            )
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired entries, then the least recently used ones above max_entries / max_bytes."""
+        conn.execute("DELETE FROM http_cache WHERE fetched_at < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM http_cache WHERE url IN ("
+            "SELECT url FROM http_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        conn.execute(
+            "DELETE FROM http_cache WHERE url IN (SELECT url FROM ("
+            "SELECT url, SUM(COALESCE(LENGTH(body), 0) + COALESCE(LENGTH(extracted), 0)) "
+            "OVER (ORDER BY last_access DESC, url) AS running FROM http_cache"
+            ") WHERE running > ?)",
+            (self.max_bytes,),
+        )
+
+
+def default_http_cache() -> HttpCache:
+    return HttpCache(
+        os.getenv("HTTP_CACHE_DB", "/tmp/master_agent_http_cache.db"),
+        ttl_seconds=int(os.getenv("HTTP_CACHE_TTL", str(7 * 24 * 3600))),
+        max_entries=int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "2000")),
+        max_bytes=int(os.getenv("HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    )
@@ -0,0 +1,94 @@
+import re
+
+# Declarative intent table, in priority order: the first intent whose keyword
+# groups are all present wins. Each group is a tuple of alternative whole words,
+# so inflections ("added", "creating", "notebook") are listed explicitly.
+INTENTS = (
+    {
+        'name': 'create_task',
+        'groups': (('task', 'tasks'),
+                   ('create', 'creates', 'created', 'creating', 'add', 'adds', 'added', 'adding')),
+        'response': "I can help you create a task. Please use the task management interface or tell me more details about the task.",
+    },
+    {
+        'name': 'goal',
+        'groups': (('goal', 'goals'),),
+        'response': "I can help you with goal tracking. What goal would you like to work on?",
+    },
+    {
+        'name': 'note',
+        'groups': (('note', 'notes', 'noted', 'notebook', 'notebooks', 'notepad'),),
+        'response': "I can help you take notes. Would you like to create a text note or voice note?",
+    },
+    {
+        'name': 'greeting',
+        'groups': (('hello', 'hi'),),
+        'response': "Hello! I'm your Master Agent. I can help you manage tasks, track goals, take notes, and organize your life. How can I assist you today?",
+    },
+)
+FALLBACK_RESPONSE = "I understand you're asking about: {message}. How can I help you with this?"
+
+
+def _trie_regex(words):
+    """
+    Alternation of `words` factored by common prefix ("goal|goals|go" ->
+    "go(?:al(?:s)?)?"), so the regex engine tries one branch per next
+    character instead of every keyword at every position.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:%s)' % '|'.join(branches)
+        if '' in node:
+            return '(?:%s)?' % body
+        return body
+
+    return build(trie)
+
+
+class IntentRouter:
+    """
+    Keyword intent matcher compiled from a declarative table.
+
+    Every keyword of every intent goes into one prefix-factored regex anchored
+    on word boundaries, so a message is scanned once (no per-intent substring
+    passes, and "hi" no longer matches inside "this"). Each keyword maps to the
+    (intent, group) pairs it satisfies; an intent matches when all of its groups
+    were seen, and the earliest such intent in the table wins.
+    """
+
+    def __init__(self, intents=INTENTS, fallback=FALLBACK_RESPONSE):
+        self.intents = tuple(intents)
+        self.fallback = fallback
+        self._keywords = {}
+        self._full_masks = []
+        for i, intent in enumerate(self.intents):
+            for g, words in enumerate(intent['groups']):
+                for word in words:
+                    self._keywords.setdefault(word.lower(), []).append((i, g))
+            self._full_masks.append((1 << len(intent['groups'])) - 1)
+        self._pattern = re.compile(r'\b(?:%s)\b' % _trie_regex(self._keywords), re.IGNORECASE)
+
+    def match(self, message):
+        """The matching intent dict, or None."""
+        masks = {}
+        for found in self._pattern.finditer(message):
+            for i, g in self._keywords[found.group().lower()]:
+                masks[i] = masks.get(i, 0) | 1 << g
+        matched = [i for i, mask in masks.items() if mask == self._full_masks[i]]
+        return self.intents[min(matched)] if matched else None
+
+    def respond(self, message):
+        intent = self.match(message)
+        return intent['response'] if intent else self.fallback.format(message=message)
+
+
+default_router = IntentRouter()
@@ -0,0 +1,326 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states. Handlers may move a job through their own
+# intermediate states (e.g. 'extracting' -> 'analyzing') via JobQueue.update.
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_EXTRACTING = "extracting"
+JOB_ANALYZING = "analyzing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+TERMINAL_STATES = (JOB_DONE, JOB_FAILED)
+
+# A job claimed this many times without finishing (e.g. it keeps crashing the
+# process) is failed instead of being handed out again.
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Retries for the final done/failed write of a job, with linear backoff (seconds)
+FINISH_RETRIES = 5
+FINISH_RETRY_DELAY = 0.5
+
+# Handler signature: handler(job_id, payload, queue) -> result dict (stored as JSON)
+JobHandler = Callable[[str, Dict[str, Any], "JobQueue"], Optional[Dict[str, Any]]]
+
+
+class JobQueue:
+    """
+    Persistent local job queue backed by SQLite.
+
+    Jobs are written to a SQLite file so they survive process restarts, and are
+    claimed atomically by a pool of worker threads. Several processes (e.g.
+    gunicorn workers) can share the same queue file; a job whose claim has gone
+    stale is handed back to the pool. While a handler runs, a heartbeat thread
+    keeps its claim fresh, so only jobs of a dead process go stale. Workers
+    start as soon as a handler is registered, which also resumes jobs left
+    pending or interrupted by a restart. A job that went stale `max_attempts`
+    times is marked failed rather than claimed again. A kind registered with
+    its own `workers` is claimed only by those threads, never by the shared pool,
+    so short interactive jobs are not stuck behind long ones of another kind.
+    """
+
+    def __init__(self, db_path: str, workers: int = 2, poll_interval: float = 1.0,
+                 stale_after: float = 900.0, heartbeat_interval: Optional[float] = None,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.heartbeat_interval = heartbeat_interval or stale_after / 3
+        self.max_attempts = max_attempts
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._start_states: Dict[str, str] = {}
+        self._dedicated: Dict[str, int] = {}  # kind -> worker threads of its own
+        self._threads = []
+        self._running = set()  # ids of jobs whose handlers are running in this process
+        self._started = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    claimed_at REAL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at)")
+        finally:
+            conn.close()
+
+    def register(self, kind: str, handler: JobHandler, start_state: str = JOB_RUNNING, workers: int = 0):
+        """
+        Register the handler for a job kind and the state a job enters when
+        claimed; starts the workers. With `workers`, the kind gets that many
+        threads of its own instead of sharing the pool.
+        """
+        with self._lock:
+            if workers > 0 and kind not in self._dedicated:
+                self._dedicated[kind] = workers
+                for i in range(workers):
+                    t = threading.Thread(target=self._worker, args=(lambda: [kind],),
+                                         name=f"job-worker-{kind}-{i}", daemon=True)
+                    t.start()
+                    self._threads.append(t)
+            self._handlers[kind] = handler
+            self._start_states[kind] = start_state
+        self.start()
+        self._wakeup.set()
+
+    def _shared_kinds(self):
+        return [kind for kind in self._handlers if kind not in self._dedicated]
+
+    def start(self):
+        """Start the worker pool (idempotent)."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, args=(self._shared_kinds,),
+                                     name=f"job-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+            t = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info("Job queue started with %d workers (%s)", self.workers, self.db_path)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        """Persist a new pending job and return its id."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), JOB_PENDING, now, now),
+            )
+        finally:
+            conn.close()
+
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._row_to_dict(row) if row else None
+
+    def update(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None):
+        """Move a job to a new state, optionally recording its result or error."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = COALESCE(?, result), error = ?, updated_at = ?, "
+                "claimed_at = CASE WHEN ? IN ('done', 'failed') THEN NULL ELSE ? END WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error,
+                 datetime.utcnow().isoformat(), status, time.time(), job_id),
+            )
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None) -> bool:
+        """
+        Record a job's final state, retrying while the database is busy. Never
+        raises: if every attempt fails the claim is left to go stale, and the job
+        is retried (or failed once it reaches max_attempts).
+        """
+        for attempt in range(1, FINISH_RETRIES + 1):
+            try:
+                self.update(job_id, status, result=result, error=error)
+                return True
+            except sqlite3.Error as e:
+                logger.warning("Recording job %s as %s failed (attempt %d/%d): %s",
+                               job_id, status, attempt, FINISH_RETRIES, e)
+                if self._stopping.wait(FINISH_RETRY_DELAY * attempt):
+                    break
+        logger.error("Could not record job %s as %s; it will be reclaimed once stale", job_id, status)
+        return False
+
+    def _claim(self, kinds) -> Optional[sqlite3.Row]:
+        """Atomically take the oldest runnable job of `kinds`, including jobs whose claim went stale."""
+        if not kinds:
+            return None
+
+        placeholders = ",".join("?" for _ in kinds)
+        stale_before = time.time() - self.stale_after
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Stale jobs that already used up their attempts are given up on
+            conn.execute(
+                f"UPDATE jobs SET status = 'failed', claimed_at = NULL, updated_at = ?, "
+                f"error = 'Gave up after ' || attempts || ' attempts' "
+                f"WHERE kind IN ({placeholders}) AND status NOT IN ('pending', 'done', 'failed') "
+                f"AND claimed_at < ? AND attempts >= ?",
+                (datetime.utcnow().isoformat(), *kinds, stale_before, self.max_attempts),
+            )
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE kind IN ({placeholders}) AND ("
+                f"status = 'pending' OR (status NOT IN ('done', 'failed') AND claimed_at < ?)"
+                f") ORDER BY created_at LIMIT 1",
+                (*kinds, stale_before),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, claimed_at = ?, updated_at = ? WHERE id = ?",
+                (self._start_states[row["kind"]], time.time(), datetime.utcnow().isoformat(), row["id"]),
+            )
+            conn.execute("COMMIT")
+            return row
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _heartbeat(self):
+        """Refresh claimed_at of the jobs running in this process."""
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            conn = self._connect()
+            try:
+                conn.execute(
+                    f"UPDATE jobs SET claimed_at = ? WHERE id IN ({','.join('?' for _ in running)}) "
+                    f"AND status NOT IN ('done', 'failed')",
+                    (time.time(), *running),
+                )
+            except sqlite3.OperationalError as e:
+                logger.warning("Job heartbeat failed: %s", e)
+            finally:
+                conn.close()
+
+    def _worker(self, kinds: Callable[[], list]):
+        while not self._stopping.is_set():
+            try:
+                row = self._claim(kinds())
+            except sqlite3.OperationalError as e:
+                logger.warning("Job claim failed: %s", e)
+                row = None
+
+            if row is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            job_id = row["id"]
+            with self._lock:
+                self._running.add(job_id)
+            try:
+                try:
+                    result = self._handlers[row["kind"]](job_id, json.loads(row["payload"]), self)
+                except Exception as e:
+                    logger.exception("Job %s (%s) failed", job_id, row["kind"])
+                    self._finish(job_id, JOB_FAILED, error=str(e))
+                else:
+                    self._finish(job_id, JOB_DONE, result=result or {})
+            except Exception:
+                # Keep the worker alive whatever happens while finishing a job
+                logger.exception("Finishing job %s (%s) failed", job_id, row["kind"])
+            finally:
+                with self._lock:
+                    self._running.discard(job_id)
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+
+_default_queue: Optional[JobQueue] = None
+_default_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Return the process-wide job queue.
+    App Engine only allows writes under /tmp, hence the default location.
+    """
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(
+                os.getenv("JOB_QUEUE_DB", "/tmp/master_agent_jobs.db"),
+                workers=int(os.getenv("JOB_QUEUE_WORKERS", "4")),
+                max_attempts=int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))),
+            )
+        return _default_queue
@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from flask import jsonify
+from sqlalchemy import and_, inspect, or_
+from sqlalchemy.orm import load_only
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PaginationError(ValueError):
+    """Bad cursor / limit / fields parameter; routes turn it into a 400."""
+
+
+def encode_cursor(row) -> str:
+    created_at = getattr(row, "created_at", None)
+    key = [created_at.isoformat() if created_at else None, row.id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except Exception:
+        raise PaginationError("Invalid cursor")
+
+
+def parse_limit(value: Optional[str]) -> int:
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(model, value: Optional[str], default: Optional[Sequence[str]] = None) -> Optional[List[str]]:
+    """Validate a comma-separated fields= projection against the model's columns."""
+    if not value:
+        return list(default) if default else None
+    columns = {attr.key for attr in inspect(model).column_attrs}
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in columns]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def keyset_query(query, model, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None):
+    """
+    Order `query` newest first on (created_at, id) - or id alone for models
+    without created_at - and position it after `cursor`. With `fields`, only
+    those columns (plus the key) are loaded; the rest stay deferred.
+    """
+    has_created = hasattr(model, "created_at")
+    if has_created:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.id.desc())
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if has_created and created_at is not None:
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id),
+            ))
+        else:
+            query = query.filter(model.id < row_id)
+
+    if fields:
+        keys = {"id", "created_at"} if has_created else {"id"}
+        query = query.options(load_only(*[getattr(model, f) for f in sorted(keys.union(fields))]))
+    return query
+
+
+def keyset_page(query, model, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                fields: Optional[Sequence[str]] = None):
+    """One page of keyset_query(...). Returns (rows, next_cursor or None)."""
+    rows = keyset_query(query, model, cursor, fields).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _json_value(obj, name: str) -> Any:
+    # Columns stored in an encoded form expose a get_<name>() decoder (e.g. Note.get_tags)
+    getter = getattr(obj, f"get_{name}", None)
+    value = getter() if callable(getter) else getattr(obj, name)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def serialize(obj, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """to_dict(), or only the requested fields (always including id)."""
+    if not fields:
+        return obj.to_dict()
+    names = ["id"] + [f for f in fields if f != "id"]
+    return {name: _json_value(obj, name) for name in names}
+
+
+def paginated_response(query, model, args, default_fields: Optional[Sequence[str]] = None):
+    """
+    Apply ?cursor=&limit=&fields= from request args to `query` and build the JSON
+    response: one page of items (DEFAULT_PAGE_SIZE unless limit says otherwise,
+    at most MAX_PAGE_SIZE), with the next page's cursor in the X-Next-Cursor
+    header (exposed to cross-origin clients in main.py). The header is always
+    sent and is empty on the last page.
+    Raises PaginationError on bad parameters.
+    """
+    fields = parse_fields(model, args.get("fields"), default_fields)
+    rows, next_cursor = keyset_page(query, model, args.get("cursor"), parse_limit(args.get("limit")), fields)
+    response = jsonify([serialize(row, fields) for row in rows])
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor or ""
+    return response
@@ -0,0 +1,140 @@
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# HTTP status codes worth retrying (quota exhaustion and transient server errors).
+# google.api_core exceptions expose the HTTP status as `.code`.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    code = getattr(error, "code", None)
+    if callable(code):
+        # grpc-style errors expose code() instead of an int attribute
+        return False
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code in RETRYABLE_STATUS_CODES
+
+
+class RateLimiter:
+    """
+    Process-wide governor for outbound API calls.
+
+    Combines a token bucket (sustained `rate` calls per second, bursts of up to
+    `burst`) with a semaphore capping in-flight calls, and retries retryable
+    failures with jittered exponential backoff. Time spent waiting on the
+    limiter and time spent inside calls are tracked separately.
+    """
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._bucket_lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "wait_seconds": 0.0,
+            "call_seconds": 0.0,
+            "backoff_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _take_token(self):
+        """Block until a token is available."""
+        while True:
+            with self._bucket_lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def _record(self, **deltas):
+        with self._stats_lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+            if "wait_seconds" in deltas:
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], deltas["wait_seconds"])
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: uniform in [0, min(max_delay, base * 2^attempt)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn under the rate and concurrency limits, retrying retryable errors."""
+        attempt = 0
+        while True:
+            wait_start = time.monotonic()
+            self._take_token()
+            self._semaphore.acquire()
+            call_start = time.monotonic()
+            self._record(calls=1, in_flight=1, wait_seconds=call_start - wait_start)
+            try:
+                result = fn(*args, **kwargs)
+                self._record(succeeded=1)
+                return result
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._record(failed=1)
+                    raise
+            finally:
+                self._record(in_flight=-1, call_seconds=time.monotonic() - call_start)
+                self._semaphore.release()
+
+            delay = self.backoff_delay(attempt)
+            self._record(retries=1, backoff_seconds=delay)
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        calls = stats["calls"] or 1
+        stats.update({
+            "avg_wait_seconds": round(stats["wait_seconds"] / calls, 4),
+            "avg_call_seconds": round(stats["call_seconds"] / calls, 4),
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+        })
+        for key in ("wait_seconds", "call_seconds", "backoff_seconds", "max_wait_seconds"):
+            stats[key] = round(stats[key], 4)
+        return stats
+
+
+_gemini_limiter: Optional[RateLimiter] = None
+_gemini_limiter_lock = threading.Lock()
+
+
+def get_gemini_limiter() -> RateLimiter:
+    """The limiter shared by every GeminiAnalyzer in this process."""
+    global _gemini_limiter
+    with _gemini_limiter_lock:
+        if _gemini_limiter is None:
+            _gemini_limiter = RateLimiter(
+                rate=float(os.getenv("GEMINI_RATE_PER_SECOND", "1.0")),
+                burst=int(os.getenv("GEMINI_BURST", "5")),
+                max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+                max_retries=int(os.getenv("GEMINI_MAX_RETRIES", "4")),
+            )
+        return _gemini_limiter
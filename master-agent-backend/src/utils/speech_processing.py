@@ -1,55 +1,282 @@
 import speech_recognition as sr
+import multiprocessing
 import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pydub import AudioSegment
+from pydub.silence import detect_nonsilent
 import tempfile
 
-def transcribe_audio(audio_file_path):
+# Silence-aware chunking for long recordings
+CHUNK_MIN_SILENCE_MS = 500      # a pause at least this long is a split candidate
+CHUNK_SILENCE_OFFSET_DB = 16    # "silence" = quieter than the clip's average loudness minus this
+CHUNK_KEEP_SILENCE_MS = 200     # padding kept around each speech span
+CHUNK_MAX_MS = 30000            # recognizer request limit; longer speech is cut at fixed windows
+CHUNK_SEEK_STEP_MS = 10         # resolution of the silence scan
+RECOGNITION_SAMPLE_RATE = 16000
+TRANSCRIBE_MAX_WORKERS = int(os.getenv('TRANSCRIBE_MAX_WORKERS', '4'))
+TRANSCRIBE_RETRIES = 1
+MIN_AUDIO_MS = 100
+# Worker processes for background voice note processing (decoding is CPU-bound)
+TRANSCRIBE_PROCESSES = int(os.getenv('TRANSCRIBE_PROCESSES', '2'))
+
+_transcribe_pool = None
+_transcribe_pool_lock = threading.Lock()
+
+
+class DecodedAudio:
+    """
+    An audio file decoded once into an in-memory PCM buffer (pydub AudioSegment).
+
+    Validation, duration, resampling for the recognizer and transcription all
+    work from this buffer, so an upload is decoded a single time and no
+    intermediate WAV files are written.
+    """
+
+    def __init__(self, segment, source_path=None):
+        self.segment = segment
+        self.source_path = source_path
+        self._recognition = None
+
+    @classmethod
+    def from_file(cls, source, format=None):
+        """Decode a path or file-like object (any format ffmpeg reads; WAV is parsed natively)."""
+        segment = AudioSegment.from_file(source, format=format)
+        return cls(segment, source if isinstance(source, str) else None)
+
+    @property
+    def duration(self):
+        """Duration in seconds."""
+        return len(self.segment) / 1000.0
+
+    def validate(self):
+        """
+        Returns:
+            tuple: (is_valid, message), with the same messages as validate_audio_file
+        """
+        if len(self.segment) == 0:
+            return False, "Audio file has no content"
+        if len(self.segment) < MIN_AUDIO_MS:
+            return False, "Audio file is too short"
+        return True, "Audio file is valid"
+
+    def for_recognition(self):
+        """16 kHz mono 16-bit copy of the buffer, as speech recognizers expect (computed once)."""
+        if self._recognition is None:
+            self._recognition = self.segment.set_channels(1) \
+                .set_frame_rate(RECOGNITION_SAMPLE_RATE).set_sample_width(2)
+        return self._recognition
+
+
+def decode_audio(audio):
+    """Return `audio` if it is already a DecodedAudio, otherwise decode the path / file-like object."""
+    return audio if isinstance(audio, DecodedAudio) else DecodedAudio.from_file(audio)
+
+
+class GoogleRecognizerBackend:
+    """Google Web Speech API through speech_recognition (the original behaviour)."""
+
+    name = 'google'
+
+    def transcribe(self, segment):
+        """Transcribe one mono AudioSegment; returns '' when nothing intelligible was said."""
+        recognizer = sr.Recognizer()
+        audio_data = sr.AudioData(segment.raw_data, segment.frame_rate, segment.sample_width)
+        try:
+            return recognizer.recognize_google(audio_data)
+        except sr.UnknownValueError:
+            return ''
+
+
+class StubRecognizerBackend:
+    """Offline backend for tests: returns a fixed text, or responder(segment) if given."""
+
+    name = 'stub'
+
+    def __init__(self, text='', responder=None):
+        self.text = text
+        self.responder = responder
+
+    def transcribe(self, segment):
+        return self.responder(segment) if self.responder else self.text
+
+
+def get_recognizer_backend(name=None):
+    """
+    Resolve a speech recognizer backend by name ("google" or "stub").
+    Defaults to $SPEECH_RECOGNIZER_BACKEND, then "google".
+    """
+    name = (name or os.getenv('SPEECH_RECOGNIZER_BACKEND', 'google')).lower()
+    if name == 'google':
+        return GoogleRecognizerBackend()
+    if name == 'stub':
+        return StubRecognizerBackend(os.getenv('SPEECH_STUB_TEXT', ''))
+    raise ValueError(f"Unknown speech recognizer backend '{name}'")
+
+
+def chunk_boundaries(audio, max_chunk_ms=CHUNK_MAX_MS):
+    """
+    Split points for an AudioSegment: speech spans separated by pauses, merged
+    greedily up to max_chunk_ms; spans longer than that are cut into fixed windows.
+
+    Args:
+        audio (AudioSegment): The decoded audio
+        max_chunk_ms (int): Longest chunk sent to the recognizer
+
+    Returns:
+        list: (start_ms, end_ms) tuples in order; silent audio gives []
+    """
+    if len(audio) <= max_chunk_ms:
+        return [(0, len(audio))]
+
+    silence_thresh = audio.dBFS - CHUNK_SILENCE_OFFSET_DB
+    spans = detect_nonsilent(audio, min_silence_len=CHUNK_MIN_SILENCE_MS, silence_thresh=silence_thresh,
+                             seek_step=CHUNK_SEEK_STEP_MS)
+
+    pieces = []
+    for start, end in spans:
+        start = max(0, start - CHUNK_KEEP_SILENCE_MS)
+        end = min(len(audio), end + CHUNK_KEEP_SILENCE_MS)
+        while end - start > max_chunk_ms:
+            pieces.append((start, start + max_chunk_ms))
+            start += max_chunk_ms
+        pieces.append((start, end))
+
+    chunks = []
+    for start, end in pieces:
+        if chunks and end - chunks[-1][0] <= max_chunk_ms:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
+def _transcribe_chunk(backend, segment):
+    for attempt in range(TRANSCRIBE_RETRIES + 1):
+        try:
+            return backend.transcribe(segment), None
+        except Exception as e:
+            error = str(e)
+    return '', error
+
+
+def transcribe_segments(audio, backend=None, max_workers=None):
+    """
+    Transcribe audio chunk by chunk, concurrently.
+
+    The audio is decoded once (unless already a DecodedAudio), downmixed to
+    16 kHz mono, split at pauses and the chunks are sent to the recognizer on
+    a bounded thread pool.
+
+    Args:
+        audio (str | DecodedAudio): Path to the audio file (any format ffmpeg reads) or decoded audio
+        backend: Recognizer backend (defaults to get_recognizer_backend())
+        max_workers (int): Concurrent recognizer requests
+
+    Returns:
+        list: One dict per chunk in playback order:
+              {"start": seconds, "end": seconds, "text": str, "error": str or None}
+    """
+    backend = backend or get_recognizer_backend()
+    audio = decode_audio(audio).for_recognition()
+
+    boundaries = chunk_boundaries(audio)
+    workers = max(1, min(max_workers or TRANSCRIBE_MAX_WORKERS, len(boundaries) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, so the transcript reassembles in order
+        results = pool.map(lambda b: _transcribe_chunk(backend, audio[b[0]:b[1]]), boundaries)
+        return [
+            {'start': start / 1000.0, 'end': end / 1000.0, 'text': text, 'error': error}
+            for (start, end), (text, error) in zip(boundaries, results)
+        ]
+
+
+def transcribe_audio(audio_file_path, backend=None):
     """
     Transcribe audio file to text using Google Speech Recognition
+    (or the configured recognizer backend). Long recordings are split at
+    pauses and the chunks transcribed in parallel; see transcribe_segments.
     
     Args:
-        audio_file_path (str): Path to the audio file
+        audio_file_path (str | DecodedAudio): Path to the audio file, or audio already decoded
+        backend: Recognizer backend (defaults to get_recognizer_backend())
         
     Returns:
         str: Transcribed text or error message
     """
     try:
-        # Initialize recognizer
-        recognizer = sr.Recognizer()
-        
-        # Convert audio to WAV format if needed
-        audio_path = convert_to_wav(audio_file_path)
-        
-        # Load audio file
-        with sr.AudioFile(audio_path) as source:
-            # Adjust for ambient noise
-            recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            # Record the audio
-            audio_data = recognizer.record(source)
-        
-        # Perform speech recognition
-        try:
-            # Using Google Speech Recognition (free tier)
-            text = recognizer.recognize_google(audio_data)
-            return text
-        except sr.UnknownValueError:
-            return "Could not understand audio"
-        except sr.RequestError as e:
-            return f"Could not request results from speech recognition service; {e}"
-            
+        segments = transcribe_segments(audio_file_path, backend)
     except Exception as e:
         return f"Error processing audio: {str(e)}"
-    finally:
-        # Clean up temporary file if created
-        if 'audio_path' in locals() and audio_path != audio_file_path:
-            try:
-                os.remove(audio_path)
-            except:
-                pass
+
+    text = ' '.join(s['text'].strip() for s in segments if s['text'].strip())
+    if text:
+        return text
+    errors = [s['error'] for s in segments if s['error']]
+    if errors:
+        return f"Could not request results from speech recognition service; {errors[0]}"
+    return "Could not understand audio"
+
+def process_voice_note(audio_file_path, store_dir=None):
+    """
+    Validate, transcribe and (optionally) store a saved voice note in one decode.
+    Runs in a worker process, so it takes a path and returns plain data.
+
+    Args:
+        audio_file_path (str): Path to the saved audio file
+        store_dir (str): AudioStore root; when given, valid audio is transcoded
+                         to Opus and stored there, deduplicated by content hash
+
+    Returns:
+        dict: {"valid": bool, "message": str, "transcription": str or None,
+               "duration": float, "stored_path": str or None}
+    """
+    if not os.path.exists(audio_file_path) or os.path.getsize(audio_file_path) == 0:
+        is_valid, message = validate_audio_file(audio_file_path)
+        return {'valid': is_valid, 'message': message, 'transcription': None, 'duration': 0.0}
+    try:
+        audio = DecodedAudio.from_file(audio_file_path)
+    except Exception as e:
+        return {'valid': False, 'message': f"Error validating audio file: {str(e)}", 'transcription': None,
+                'duration': 0.0}
+
+    is_valid, message = audio.validate()
+    if not is_valid:
+        return {'valid': False, 'message': message, 'transcription': None, 'duration': audio.duration}
+
+    transcription = transcribe_audio(audio)
+    stored_path = None
+    if store_dir:
+        # Stored last: the note must reference the blob within the store's reuse grace period
+        from .audio_store import AudioStore
+        stored_path = AudioStore(store_dir).put(audio_file_path, audio.segment)
+    return {
+        'valid': True,
+        'message': message,
+        'transcription': transcription,
+        'duration': audio.duration,
+        'stored_path': stored_path,
+    }
+
+
+def _get_transcribe_pool():
+    global _transcribe_pool
+    with _transcribe_pool_lock:
+        if _transcribe_pool is None:
+            # spawn, not fork: the pool is created from a multi-threaded web/job worker
+            _transcribe_pool = ProcessPoolExecutor(max_workers=TRANSCRIBE_PROCESSES,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+        return _transcribe_pool
+
+
+def process_voice_note_in_pool(audio_file_path, store_dir=None):
+    """Run process_voice_note on the bounded process pool and wait for its result."""
+    return _get_transcribe_pool().submit(process_voice_note, audio_file_path, store_dir).result()
 
 def convert_to_wav(audio_file_path):
     """
     Convert audio file to WAV format if it's not already
+    (not needed for transcription, which works from DecodedAudio)
     
     Args:
         audio_file_path (str): Path to the audio file
@@ -84,12 +311,15 @@ def validate_audio_file(audio_file_path):
     Validate if the audio file is readable and has content
     
     Args:
-        audio_file_path (str): Path to the audio file
+        audio_file_path (str | DecodedAudio): Path to the audio file, or audio already decoded
         
     Returns:
         tuple: (is_valid, error_message)
     """
     try:
+        if isinstance(audio_file_path, DecodedAudio):
+            return audio_file_path.validate()
+
         if not os.path.exists(audio_file_path):
             return False, "Audio file does not exist"
         
@@ -97,15 +327,7 @@ def validate_audio_file(audio_file_path):
             return False, "Audio file is empty"
         
         # Try to load the audio file
-        audio = AudioSegment.from_file(audio_file_path)
-        
-        if len(audio) == 0:
-            return False, "Audio file has no content"
-        
-        if len(audio) < 100:  # Less than 0.1 seconds
-            return False, "Audio file is too short"
-        
-        return True, "Audio file is valid"
+        return DecodedAudio.from_file(audio_file_path).validate()
         
     except Exception as e:
         return False, f"Error validating audio file: {str(e)}"
@@ -115,31 +337,32 @@ def get_audio_duration(audio_file_path):
     Get the duration of an audio file in seconds
     
     Args:
-        audio_file_path (str): Path to the audio file
+        audio_file_path (str | DecodedAudio): Path to the audio file, or audio already decoded
         
     Returns:
         float: Duration in seconds, or 0 if error
     """
     try:
-        audio = AudioSegment.from_file(audio_file_path)
-        return len(audio) / 1000.0  # Convert milliseconds to seconds
+        return decode_audio(audio_file_path).duration
     except Exception as e:
         print(f"Error getting audio duration: {e}")
         return 0.0
 
-def compress_audio(audio_file_path, target_size_mb=5):
+def compress_audio(audio_file_path, target_size_mb=5, decoded=None):
     """
     Compress audio file to reduce size while maintaining quality
+    (transcodes to Opus/OGG; see utils.audio_store for stored voice notes)
     
     Args:
         audio_file_path (str): Path to the audio file
         target_size_mb (int): Target size in MB
+        decoded (DecodedAudio): The file's audio if already decoded, to skip decoding it again
         
     Returns:
         str: Path to compressed audio file
     """
     try:
-        audio = AudioSegment.from_file(audio_file_path)
+        audio = decoded.segment if decoded is not None else AudioSegment.from_file(audio_file_path)
         
         # Get current file size
         current_size_mb = os.path.getsize(audio_file_path) / (1024 * 1024)
@@ -147,15 +370,13 @@ def compress_audio(audio_file_path, target_size_mb=5):
         if current_size_mb <= target_size_mb:
             return audio_file_path
         
-        # Calculate compression ratio
-        compression_ratio = target_size_mb / current_size_mb
-        
-        # Reduce bitrate and sample rate
-        compressed_audio = audio.set_frame_rate(int(audio.frame_rate * compression_ratio))
+        # Opus bitrate that fits the target size, within the range where speech stays clear
+        duration_s = max(len(audio) / 1000.0, 0.001)
+        bitrate_kbps = int(min(64, max(12, target_size_mb * 8 * 1024 / duration_s)))
         
         # Create compressed file
-        compressed_path = audio_file_path.replace('.wav', '_compressed.wav')
-        compressed_audio.export(compressed_path, format="wav", bitrate="64k")
+        compressed_path = os.path.splitext(audio_file_path)[0] + '_compressed.ogg'
+        audio.export(compressed_path, format="ogg", codec="libopus", bitrate=f"{bitrate_kbps}k")
         
         return compressed_path
         
@@ -0,0 +1,56 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only track the visitor and never change the content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "mc_cid", "mc_eid",
+    "igshid", "yclid", "_hsenc", "_hsmi", "mkt_tok", "ref_src", "spm",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so that trivially different spellings of the same page compare equal:
+    - lowercase scheme and host, drop default ports, "www." and fragments
+    - remove tracking query parameters and sort the remaining ones
+    - drop the trailing slash (except for the root path)
+    Redirects are not followed here; see ContentExtractor.resolve_url.
+    Raises ValueError for malformed URLs: a scheme other than http(s), no host,
+    or a non-numeric or out-of-range port.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError as e:
+        raise ValueError(f"Invalid URL '{url}': {e}") from e
+    scheme = (parts.scheme or "http").lower()
+    if scheme not in DEFAULT_PORTS:
+        raise ValueError(f"Invalid URL '{url}': only http and https URLs are supported")
+
+    host = (parts.hostname or "").lower()
+    if not host:
+        raise ValueError(f"Invalid URL '{url}': no host")
+    if host.startswith("www."):
+        host = host[len("www."):]
+    netloc = host
+    if port and str(port) != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+
+    return urlunsplit((scheme, netloc, path, urlencode(query), ""))
+
+
+def content_hash(text: str) -> str:
+    """Hash of whitespace-normalized text, used to spot the same content under different URLs."""
+    return hashlib.sha256(" ".join((text or "").split()).encode("utf-8")).hexdigest()
@@ -0,0 +1,296 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from pydub import AudioSegment
+
+from .speech_processing import (
+    CHUNK_KEEP_SILENCE_MS, CHUNK_MAX_MS, CHUNK_MIN_SILENCE_MS, MIN_AUDIO_MS, RECOGNITION_SAMPLE_RATE,
+    TRANSCRIBE_MAX_WORKERS, _transcribe_chunk, get_recognizer_backend,
+)
+
+# Energy-based voice activity detection over fixed frames of 16-bit PCM
+VAD_FRAME_MS = 30
+VAD_START_FRAMES = 3            # voiced frames in a row that open a speech segment
+VAD_MIN_RMS = 300               # speech threshold floor (16-bit sample units)
+VAD_NOISE_RATIO = 3.0           # voiced = louder than this multiple of the running noise floor
+VAD_NOISE_ALPHA = 0.05          # smoothing of the noise floor estimate
+SAMPLE_WIDTH = 2
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+STREAM_IDLE_SECONDS = int(os.getenv('VOICE_STREAM_IDLE_SECONDS', '300'))
+STREAM_MAX_SECONDS = int(os.getenv('VOICE_STREAM_MAX_SECONDS', '1800'))
+STREAM_FINISH_TIMEOUT = 60
+STREAM_MAX_WAIT = 30
+# Each session can buffer up to STREAM_MAX_SECONDS of PCM in memory
+STREAM_MAX_SESSIONS = int(os.getenv('VOICE_STREAM_MAX_SESSIONS', '20'))
+
+RECORDING = 'recording'
+FINISHING = 'finishing'
+FINISHED = 'finished'
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_stream_pool = None
+_stream_pool_lock = threading.Lock()
+
+
+class VoiceStreamError(ValueError):
+    """Bad stream parameters or audio (maps to 400)."""
+
+
+class VoiceStreamClosed(VoiceStreamError):
+    """Audio sent to a stream that is finishing or finished (maps to 409)."""
+
+
+class VoiceStreamBusy(Exception):
+    """Too many streams open at once (maps to 503)."""
+
+
+def _get_stream_pool():
+    global _stream_pool
+    with _stream_pool_lock:
+        if _stream_pool is None:
+            _stream_pool = ThreadPoolExecutor(max_workers=TRANSCRIBE_MAX_WORKERS,
+                                              thread_name_prefix='voice-stream')
+        return _stream_pool
+
+
+class VoiceStreamSession:
+    """
+    A voice note being recorded: raw 16-bit little-endian PCM arrives in chunks
+    while the user talks.
+
+    Each chunk is downmixed to mono, appended to the session buffer and run
+    through the VAD. When a speech segment ends (a pause of
+    CHUNK_MIN_SILENCE_MS, or CHUNK_MAX_MS of continuous speech) it is resampled
+    to 16 kHz and sent to the recognizer on a shared thread pool, so by the time
+    the user stops talking only the last segment is still being transcribed.
+    """
+
+    def __init__(self, user_id, title='', sample_rate=RECOGNITION_SAMPLE_RATE, channels=1, backend=None):
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise VoiceStreamError(f'sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}')
+        if channels not in (1, 2):
+            raise VoiceStreamError('channels must be 1 or 2')
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.title = title
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.backend = backend or get_recognizer_backend()
+        self.status = RECORDING
+        self.pcm = bytearray()          # everything received, mono 16-bit
+        self.segments = []
+        self.version = 0                # bumped on every new or transcribed segment
+        self.last_seen = time.monotonic()
+
+        self._frame_samples = sample_rate * VAD_FRAME_MS // 1000
+        self._leftover = b''            # tail of the last chunk that is not a whole frame
+        self._frames = 0
+        self._noise = None
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._speech_start = None       # frame index where the open segment starts
+        self._segment_end_ms = 0
+        self._futures = []
+        self._changed = threading.Condition()
+
+    @property
+    def duration(self):
+        """Seconds of audio received."""
+        return len(self.pcm) / (SAMPLE_WIDTH * self.sample_rate)
+
+    def feed(self, data):
+        """
+        Add a chunk of PCM (interleaved if stereo) and start transcribing any
+        segment it completes.
+
+        Returns:
+            dict: snapshot() after the chunk
+        """
+        with self._changed:
+            if self.status != RECORDING:
+                raise VoiceStreamClosed(f'Stream is {self.status}')
+            self.last_seen = time.monotonic()
+            data = self._leftover + data
+            frame_bytes = self._frame_samples * SAMPLE_WIDTH * self.channels
+            usable = len(data) - len(data) % frame_bytes
+            self._leftover = data[usable:]
+            if not usable:
+                return self._snapshot()
+            if len(self.pcm) + usable // self.channels > STREAM_MAX_SECONDS * self.sample_rate * SAMPLE_WIDTH:
+                raise VoiceStreamError(f'Stream longer than {STREAM_MAX_SECONDS} seconds')
+
+            samples = np.frombuffer(data[:usable], dtype='<i2')
+            if self.channels > 1:
+                samples = samples.reshape(-1, self.channels).mean(axis=1).astype('<i2')
+            self.pcm.extend(samples.tobytes())
+
+            frames = samples.reshape(-1, self._frame_samples).astype(np.float32)
+            for rms in np.sqrt(np.mean(frames * frames, axis=1)):
+                self._vad_step(float(rms))
+            return self._snapshot()
+
+    def _vad_step(self, rms):
+        frame = self._frames
+        self._frames += 1
+        threshold = VAD_MIN_RMS if self._noise is None else max(VAD_MIN_RMS, self._noise * VAD_NOISE_RATIO)
+        voiced = rms > threshold
+        if not voiced:
+            self._noise = rms if self._noise is None else self._noise + VAD_NOISE_ALPHA * (rms - self._noise)
+
+        if self._speech_start is None:
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= VAD_START_FRAMES:
+                self._speech_start = frame - VAD_START_FRAMES + 1
+                self._silent_run = 0
+            return
+
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        if self._silent_run * VAD_FRAME_MS >= CHUNK_MIN_SILENCE_MS:
+            self._close_segment(self._speech_start, frame + 1 - self._silent_run, pad=True)
+            self._speech_start = None
+            self._voiced_run = 0
+        elif (frame + 1 - self._speech_start) * VAD_FRAME_MS >= CHUNK_MAX_MS:
+            # Continuous speech: cut at the recognizer limit and carry on in a new segment
+            self._close_segment(self._speech_start, frame + 1, pad=False)
+            self._speech_start = frame + 1
+
+    def _close_segment(self, start_frame, end_frame, pad):
+        total_ms = len(self.pcm) * 1000 // (SAMPLE_WIDTH * self.sample_rate)
+        start_ms = start_frame * VAD_FRAME_MS
+        end_ms = end_frame * VAD_FRAME_MS
+        if pad:
+            start_ms -= CHUNK_KEEP_SILENCE_MS
+            end_ms += CHUNK_KEEP_SILENCE_MS
+        start_ms = max(start_ms, self._segment_end_ms)
+        end_ms = min(end_ms, total_ms)
+        if end_ms - start_ms < MIN_AUDIO_MS:
+            return
+        self._segment_end_ms = end_ms
+
+        bytes_per_ms = SAMPLE_WIDTH * self.sample_rate / 1000.0
+        a = int(start_ms * bytes_per_ms) & ~1
+        b = int(end_ms * bytes_per_ms) & ~1
+        audio = AudioSegment(data=bytes(self.pcm[a:b]), sample_width=SAMPLE_WIDTH,
+                             frame_rate=self.sample_rate, channels=1).set_frame_rate(RECOGNITION_SAMPLE_RATE)
+        segment = {'index': len(self.segments), 'start': start_ms / 1000.0, 'end': end_ms / 1000.0,
+                   'text': None, 'error': None, 'done': False}
+        self.segments.append(segment)
+        self.version += 1
+        self._futures.append(_get_stream_pool().submit(self._transcribe, segment, audio))
+
+    def _transcribe(self, segment, audio):
+        text, error = _transcribe_chunk(self.backend, audio)
+        with self._changed:
+            segment.update(text=text, error=error, done=True)
+            self.version += 1
+            self._changed.notify_all()
+
+    def _snapshot(self):
+        return {
+            'session_id': self.id,
+            'status': self.status,
+            'version': self.version,
+            'duration': self.duration,
+            'segments': [dict(s) for s in self.segments],
+            'transcript': ' '.join(s['text'].strip() for s in self.segments if s['done'] and s['text'].strip()),
+            'pending': sum(1 for s in self.segments if not s['done']),
+        }
+
+    def snapshot(self, since=None, wait_seconds=0):
+        """
+        Current partial transcript. With `since`, waits up to wait_seconds for
+        the version to move past it (long polling).
+
+        Returns:
+            dict: {"session_id", "status", "version", "duration", "segments", "transcript", "pending"}
+        """
+        with self._changed:
+            self.last_seen = time.monotonic()
+            if since is not None and wait_seconds > 0:
+                self._changed.wait_for(lambda: self.version > since or self.status != RECORDING,
+                                       timeout=min(wait_seconds, STREAM_MAX_WAIT))
+            return self._snapshot()
+
+    def finish(self, timeout=STREAM_FINISH_TIMEOUT):
+        """
+        Close the stream: end the open segment, wait for the outstanding
+        transcriptions and return the whole recording.
+
+        Returns:
+            tuple: (transcription, AudioSegment of the full recording, snapshot dict);
+                   transcription follows transcribe_audio (text, or an explanatory message)
+        """
+        with self._changed:
+            if self.status != RECORDING:
+                raise VoiceStreamClosed(f'Stream is {self.status}')
+            # Claimed under the lock: a concurrent finish() or feed() is rejected from here on
+            self.status = FINISHING
+            if self._speech_start is not None:
+                self._close_segment(self._speech_start, self._frames, pad=True)
+                self._speech_start = None
+            if not self.segments:
+                # The VAD never triggered (very quiet input): transcribe everything received
+                total_frames = self._frames
+                step = CHUNK_MAX_MS // VAD_FRAME_MS
+                for start in range(0, total_frames, step):
+                    self._close_segment(start, min(start + step, total_frames), pad=False)
+            futures = list(self._futures)
+
+        wait(futures, timeout=timeout)
+
+        with self._changed:
+            self.status = FINISHED
+            self._changed.notify_all()
+            snapshot = self._snapshot()
+            recording = AudioSegment(data=bytes(self.pcm), sample_width=SAMPLE_WIDTH,
+                                     frame_rate=self.sample_rate, channels=1)
+
+        if snapshot['transcript']:
+            transcription = snapshot['transcript']
+        else:
+            errors = [s['error'] for s in snapshot['segments'] if s['error']]
+            if errors:
+                transcription = f"Could not request results from speech recognition service; {errors[0]}"
+            elif len(recording) < MIN_AUDIO_MS:
+                transcription = "Audio file is too short"
+            else:
+                transcription = "Could not understand audio"
+        return transcription, recording, snapshot
+
+
+def _expire_sessions(now):
+    for session_id in [sid for sid, s in _sessions.items() if now - s.last_seen > STREAM_IDLE_SECONDS]:
+        del _sessions[session_id]
+
+
+def start_session(user_id, title='', sample_rate=RECOGNITION_SAMPLE_RATE, channels=1, backend=None):
+    """
+    Open and register a stream; sessions idle for STREAM_IDLE_SECONDS are dropped.
+    Raises VoiceStreamBusy when STREAM_MAX_SESSIONS streams are already open.
+    """
+    session = VoiceStreamSession(user_id, title, sample_rate, channels, backend)
+    with _sessions_lock:
+        _expire_sessions(time.monotonic())
+        if len(_sessions) >= STREAM_MAX_SESSIONS:
+            raise VoiceStreamBusy(f'Too many open voice streams (limit {STREAM_MAX_SESSIONS})')
+        _sessions[session.id] = session
+    return session
+
+
+def get_session(session_id):
+    """The live session with this id, or None."""
+    with _sessions_lock:
+        _expire_sessions(time.monotonic())
+        return _sessions.get(session_id)
+
+
+def end_session(session_id):
+    with _sessions_lock:
+        return _sessions.pop(session_id, None)
@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+import pytest
+from flask import Flask
+
+# The route modules open the job queue and the embedding store at import time;
+# keep them out of the shared /tmp locations
+_scratch = tempfile.mkdtemp(prefix='master-agent-tests-')
+os.environ.setdefault('JOB_QUEUE_DB', os.path.join(_scratch, 'jobs.db'))
+os.environ.setdefault('EMBEDDING_STORE_DIR', os.path.join(_scratch, 'embeddings'))
+os.environ.setdefault('EMBEDDING_BACKEND', 'hashing')
+
+from src.models.master_agent import User, db  # noqa: E402
+
+
+@pytest.fixture
+def api_app():
+    """An app with the master_agent blueprint under /api on a fresh in-memory database, with users 1 and 2."""
+    from src.routes.master_agent import master_agent_bp
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.register_blueprint(master_agent_bp, url_prefix='/api')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(id=1, username='a', email='a@example.com'),
+                            User(id=2, username='b', email='b@example.com')])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(api_app):
+    return api_app.test_client()
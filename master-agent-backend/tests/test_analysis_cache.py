@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils import analysis_cache
+from src.utils.analysis_cache import AnalysisCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for the cache module."""
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(analysis_cache, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return AnalysisCache(str(tmp_path / 'analysis.db'), ttl_seconds=100, max_entries=3)
+
+
+def test_key_covers_text_model_and_prompt_version():
+    key = AnalysisCache.make_key('text', 'gemini', 'v1')
+    assert key == AnalysisCache.make_key('text', 'gemini', 'v1')
+    assert len({key, AnalysisCache.make_key('text!', 'gemini', 'v1'),
+                AnalysisCache.make_key('text', 'gemini-pro', 'v1'),
+                AnalysisCache.make_key('text', 'gemini', 'v2')}) == 4
+    # Parts are delimited, so shifting characters between them changes the key
+    assert AnalysisCache.make_key('b', 'a', '') != AnalysisCache.make_key('', 'a', 'b')
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.set('k', {'summary': 's'})
+    clock.value += 100
+    assert cache.get('k') == {'summary': 's'}
+    clock.value += 1
+    assert cache.get('k') is None
+    # Reads do not extend the lifetime; only a new set() does
+    cache.set('k', {'summary': 'fresh'})
+    clock.value += 50
+    assert cache.get('k') == {'summary': 'fresh'}
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    for key in ('a', 'b', 'c'):
+        cache.set(key, {'key': key})
+        clock.value += 1
+    cache.get('a')  # 'b' is now the least recently used
+    clock.value += 1
+    cache.set('d', {'key': 'd'})
+
+    assert [key for key in 'abcd' if cache.get(key)] == ['a', 'c', 'd']
+    assert cache.stats()['entries'] == 3
+
+
+def test_expired_entries_are_dropped_on_write(cache, clock):
+    cache.set('old', {})
+    clock.value += 101
+    cache.set('new', {})
+    assert cache.stats()['entries'] == 1
+
+
+def test_stats_count_hits_misses_and_evictions(cache, clock):
+    for key in 'abcd':
+        cache.set(key, {})
+        clock.value += 1
+    cache.get('d')
+    cache.get('a')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['hit_rate']) == (1, 1, 1, 0.5)
@@ -0,0 +1,74 @@
+import pytest
+
+from src.models.master_agent import Goal, Note, Task
+
+
+@pytest.mark.parametrize('path, fields', [
+    ('/api/tasks', {'title': 't', 'status': 'done'}),
+    ('/api/tasks', {'title': 't', 'priority': 'urgent'}),
+    ('/api/goals', {'title': 'g', 'status': 'archived'}),
+    ('/api/notes', {'content': 'n', 'note_type': 'memo'}),
+])
+def test_single_row_create_rejects_unknown_choices(client, path, fields):
+    response = client.post(path, json=fields)
+    assert response.status_code == 400
+    assert 'must be one of' in response.get_json()['error']
+    assert Task.query.count() + Goal.query.count() + Note.query.count() == 0
+
+
+@pytest.mark.parametrize('path, model, fields', [
+    ('/api/tasks', Task, {'status': 'done'}),
+    ('/api/tasks', Task, {'priority': 'urgent'}),
+    ('/api/goals', Goal, {'status': 'archived'}),
+])
+def test_single_row_update_rejects_unknown_choices(client, path, model, fields):
+    row_id = client.post(path, json={'title': 'x'}).get_json()['id']
+    before = model.query.get(row_id).to_dict()
+    response = client.put(f'{path}/{row_id}', json={'title': 'renamed', **fields})
+    assert response.status_code == 400
+    assert client.get(path).get_json()[0] == before
+
+
+@pytest.mark.parametrize('path, model, item', [
+    ('/api/tasks/bulk', Task, {'title': 'bad', 'status': 'done'}),
+    ('/api/tasks/bulk', Task, {'title': 'bad', 'priority': 'urgent'}),
+    ('/api/goals/bulk', Goal, {'title': 'bad', 'status': 'archived'}),
+    ('/api/notes/bulk', Note, {'content': 'bad', 'note_type': 'memo'}),
+])
+def test_atomic_bulk_write_rolls_back_on_an_invalid_choice(client, path, model, item):
+    valid = {'title': 'ok'} if model is not Note else {'content': 'ok'}
+    response = client.post(path, json={'user_id': 1, 'atomic': True, 'create': [valid, item]})
+    assert response.status_code == 422
+    body = response.get_json()
+    assert body['applied'] is False
+    assert [r['ok'] for r in body['results']['create']] == [True, False]
+    assert 'must be one of' in body['results']['create'][1]['error']
+    assert model.query.count() == 0
+
+
+def test_atomic_bulk_update_rolls_back_on_an_invalid_choice(client):
+    ids = [client.post('/api/tasks', json={'title': f't{i}'}).get_json()['id'] for i in range(2)]
+    response = client.post('/api/tasks/bulk', json={
+        'user_id': 1, 'atomic': True,
+        'update': [{'id': ids[0], 'status': 'completed'}, {'id': ids[1], 'status': 'done'}],
+        'delete': [ids[1]],
+    })
+    assert response.status_code == 422
+    assert response.get_json()['applied'] is False
+    assert sorted((t.id, t.status) for t in Task.query.all()) == [(ids[0], 'pending'), (ids[1], 'pending')]
+
+
+def test_non_atomic_bulk_write_skips_only_the_invalid_item(client):
+    response = client.post('/api/tasks/bulk', json={
+        'user_id': 1, 'create': [{'title': 'ok'}, {'title': 'bad', 'priority': 'urgent'}],
+    })
+    assert response.status_code == 200
+    assert response.get_json()['applied'] is True
+    assert [t.title for t in Task.query.all()] == ['ok']
+
+
+def test_bulk_note_type_cannot_be_changed(client):
+    note_id = client.post('/api/notes', json={'content': 'n'}).get_json()['id']
+    response = client.post('/api/notes/bulk', json={'user_id': 1, 'update': [{'id': note_id, 'note_type': 'voice'}]})
+    assert response.get_json()['results']['update'][0]['error'] == 'note_type cannot be changed'
+    assert Note.query.get(note_id).note_type == 'text'
@@ -0,0 +1,83 @@
+import pytest
+
+from src.models.master_agent import Goal, Task
+from src.utils import dashboard_stats
+
+
+@pytest.fixture
+def counters(api_app, monkeypatch):
+    monkeypatch.setattr(dashboard_stats, 'COUNTERS_ENABLED', True)
+    dashboard_stats.install_counter_listeners()
+
+
+def assert_counters_match(user_id):
+    """The stored counters equal a fresh GROUP BY over the source tables."""
+    stored = dashboard_stats._read_counters(user_id)
+    for model, (entity, _) in dashboard_stats.COUNTED_MODELS.items():
+        expected = dashboard_stats.grouped_counts(model, user_id)
+        actual = {bucket: value for bucket, value in stored[entity].items() if value}
+        assert actual == {bucket: value for bucket, value in expected.items() if value}, entity
+
+
+def create(client, path, **fields):
+    response = client.post(path, json=fields)
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_counters_follow_single_row_writes(client, counters):
+    create(client, '/api/tasks', title='seeded before the first read')
+    # The first dashboard read seeds the counters from the source tables
+    assert client.get('/api/dashboard').get_json()['tasks']['total'] == 1
+
+    # From here on the mapper listeners keep them current
+    tasks = [create(client, '/api/tasks', title=f't{i}', status=status)
+             for i, status in enumerate(['pending', 'in_progress', 'completed', 'pending'])]
+    goals = [create(client, '/api/goals', title=f'g{i}', status=status)
+             for i, status in enumerate(['active', 'paused', 'active'])]
+    create(client, '/api/tasks', title='other user', user_id=2)
+
+    client.put(f'/api/tasks/{tasks[0]}', json={'status': 'completed'})
+    client.put(f'/api/tasks/{tasks[1]}', json={'title': 'renamed'})  # no bucket change
+    client.put(f'/api/goals/{goals[1]}', json={'status': 'completed'})
+    assert client.delete(f'/api/tasks/{tasks[2]}').status_code == 204
+    assert client.delete(f'/api/goals/{goals[0]}').status_code == 204
+
+    assert_counters_match(1)
+    assert_counters_match(2)
+    dashboard = client.get('/api/dashboard').get_json()
+    assert (dashboard['tasks']['total'], dashboard['tasks']['completed'], dashboard['tasks']['pending']) == (4, 1, 2)
+    assert (dashboard['goals']['total'], dashboard['goals']['active'], dashboard['goals']['completed']) == (2, 1, 1)
+
+
+def test_counters_are_rebuilt_after_bulk_writes(client, counters):
+    tasks = [create(client, '/api/tasks', title=f't{i}') for i in range(4)]
+    goals = [create(client, '/api/goals', title=f'g{i}') for i in range(3)]
+    client.get('/api/dashboard')
+
+    # Bulk statements (executemany, query.delete()) bypass the mapper events
+    response = client.post('/api/tasks/bulk', json={
+        'user_id': 1,
+        'create': [{'title': 'new', 'status': 'in_progress'}, {'title': 'done', 'status': 'completed'}],
+        'update': [{'id': tasks[0], 'status': 'completed'}],
+        'delete': tasks[1:3],
+    })
+    assert response.status_code == 200
+    response = client.post('/api/goals/bulk', json={
+        'user_id': 1, 'update': [{'id': goals[0], 'status': 'paused'}], 'delete': [goals[1]],
+    })
+    assert response.status_code == 200
+
+    assert Task.query.filter_by(user_id=1).count() == 4
+    assert Goal.query.filter_by(user_id=1).count() == 2
+    assert_counters_match(1)
+
+
+def test_rebuild_replaces_counters_that_drifted(client, counters):
+    create(client, '/api/tasks', title='t', status='completed')
+    client.get('/api/dashboard')
+    dashboard_stats._apply(dashboard_stats.db.session, 1, 'task', {dashboard_stats.TOTAL: 5})
+    dashboard_stats.db.session.commit()
+
+    dashboard_stats.rebuild_counters(1)
+    assert_counters_match(1)
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils import http_cache
+from src.utils.http_cache import HttpCache
+
+ETAG = {'ETag': '"v1"'}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for the cache module."""
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(http_cache, 'time', SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return HttpCache(str(tmp_path / 'http.db'), ttl_seconds=100, max_entries=3, max_bytes=1000)
+
+
+def cached_urls(cache):
+    """Stored URLs, read without touching last_access."""
+    conn = cache._connect()
+    try:
+        return [row['url'] for row in conn.execute('SELECT url FROM http_cache ORDER BY url')]
+    finally:
+        conn.close()
+
+
+def test_only_revalidatable_responses_are_stored(cache):
+    assert cache.store('a', ETAG, b'body') is True
+    assert HttpCache.conditional_headers(cache.get('a')) == {'If-None-Match': '"v1"'}
+    # The same URL later served without validators drops the old entry
+    assert cache.store('a', {}, b'body') is False
+    assert cache.get('a') is None
+
+
+def test_entries_expire_unless_revalidated(cache, clock):
+    cache.store('a', ETAG, b'a')
+    cache.store('b', ETAG, b'b')
+    clock.value += 90
+    cache.touch('a', {'ETag': '"v2"'})  # a 304 restarts the TTL and picks up the new validator
+    clock.value += 20
+
+    assert cache.get('a')['etag'] == '"v2"'
+    assert cache.get('b') is None
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    for url in 'abc':
+        cache.store(url, ETAG, b'x')
+        clock.value += 1
+    cache.get('a')
+    clock.value += 1
+    cache.store('d', ETAG, b'x')
+    assert cached_urls(cache) == ['a', 'c', 'd']
+
+
+def test_size_budget_evicts_least_recently_used_first(cache, clock):
+    cache.store('a', ETAG, b'x' * 400)
+    clock.value += 1
+    cache.store('b', ETAG, b'x' * 400)
+    clock.value += 1
+    cache.get('a')
+    clock.value += 1
+    cache.store('c', ETAG, b'x' * 300)
+    assert cached_urls(cache) == ['a', 'c']
+
+    # The stored extraction counts against the budget too
+    clock.value += 1
+    cache.store_extracted('c', {'raw_text': 'y' * 400})
+    assert cached_urls(cache) == ['c']
+
+
+def test_extraction_serves_only_smaller_budgets(cache):
+    cache.store('a', ETAG, b'body')
+    cache.store_extracted('a', {'raw_text': 'abcdef'}, max_chars=6)
+    entry = cache.get('a')
+
+    assert HttpCache.extraction_for_budget(entry, 3) == {'raw_text': 'abc'}
+    assert HttpCache.extraction_for_budget(entry, 10) is None
+    assert HttpCache.extraction_for_budget(entry, None) is None
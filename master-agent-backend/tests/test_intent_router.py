@@ -0,0 +1,62 @@
+import re
+
+import pytest
+
+from src.utils.intent_router import FALLBACK_RESPONSE, INTENTS, IntentRouter, _trie_regex, default_router
+
+
+@pytest.mark.parametrize('message, intent', [
+    ('Please create a task for tomorrow', 'create_task'),
+    ('ADDING TASKS is tedious', 'create_task'),
+    ('I created two tasks', 'create_task'),
+    ('How are my goals going?', 'goal'),
+    ('open my notebook', 'note'),
+    ('Hi!', 'greeting'),
+    ('hello there', 'greeting'),
+    # Earlier intents in the table win when several match
+    ('add a task for my goal', 'create_task'),
+    ('hi, a note about my goal', 'goal'),
+    ('hello, take a note', 'note'),
+])
+def test_messages_route_to_the_first_matching_intent(message, intent):
+    assert default_router.match(message)['name'] == intent
+
+
+@pytest.mark.parametrize('message', [
+    'this is fine',           # "hi" inside a word
+    'the goalkeeper saved',   # "goal" as a prefix
+    'my task list',           # create_task needs a create verb too
+    'readd the item',
+    '',
+])
+def test_keywords_match_whole_words_only(message):
+    assert default_router.match(message) is None
+
+
+def test_unmatched_messages_get_the_fallback():
+    assert default_router.respond('what time is it') == FALLBACK_RESPONSE.format(message='what time is it')
+    assert default_router.respond('hi') == INTENTS[3]['response']
+
+
+def test_custom_intent_tables():
+    router = IntentRouter([
+        {'name': 'weather', 'groups': (('rain', 'sun'),), 'response': 'forecast'},
+        {'name': 'rain_gear', 'groups': (('rain',), ('coat', 'umbrella')), 'response': 'gear'},
+    ], fallback='?')
+    assert router.respond('rain coat') == 'forecast'
+    assert router.match('umbrella') is None
+    assert router.respond('snow') == '?'
+
+
+def test_trie_regex_factors_common_prefixes():
+    assert _trie_regex(['goal', 'goals', 'go']) == 'go(?:al(?:s)?)?'
+
+    words = ['note', 'notes', 'noted', 'notebook', 'notepad', 'no', 'a.b']
+    pattern = re.compile(r'\b(?:%s)\b' % _trie_regex(words))
+    assert all(pattern.fullmatch(word) for word in words)
+    assert not any(pattern.fullmatch(word) for word in ['not', 'notebooks', 'axb', 'n'])
+
+
+def test_chat_replies_with_the_routed_response(client):
+    response = client.post('/api/chat', json={'message': 'let me add a task'})
+    assert response.get_json()['response'] == INTENTS[0]['response']
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from src.utils.job_queue import JOB_DONE, JOB_FAILED, JOB_RUNNING, TERMINAL_STATES, JobQueue
+
+
+def noop(job_id, payload, queue):
+    return {'echo': payload}
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in TERMINAL_STATES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} still {job["status"]}')
+
+
+def expire_claim(queue, job_id):
+    """Make the job look like its worker died: the claim is older than stale_after."""
+    conn = queue._connect()
+    try:
+        conn.execute('UPDATE jobs SET claimed_at = ? WHERE id = ?', (time.time() - queue.stale_after - 1, job_id))
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(**kwargs):
+        queue = JobQueue(str(tmp_path / 'jobs.db'), **{'workers': 0, 'stale_after': 60, **kwargs})
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def test_fresh_claims_are_not_handed_out_twice(make_queue):
+    queue = make_queue()
+    queue.register('echo', noop)
+    job_id = queue.submit('echo', {})
+
+    assert queue._claim(['echo'])['id'] == job_id
+    assert queue.get(job_id)['status'] == JOB_RUNNING
+    assert queue._claim(['echo']) is None
+
+
+def test_stale_claim_is_reclaimed(make_queue):
+    queue = make_queue()
+    queue.register('echo', noop)
+    job_id = queue.submit('echo', {})
+    queue._claim(['echo'])
+
+    expire_claim(queue, job_id)
+    assert queue._claim(['echo'])['id'] == job_id
+    assert queue.get(job_id)['attempts'] == 2
+
+
+def test_job_is_failed_after_max_attempts(make_queue):
+    queue = make_queue(max_attempts=2)
+    queue.register('echo', noop)
+    job_id = queue.submit('echo', {})
+    for _ in range(2):
+        assert queue._claim(['echo'])['id'] == job_id
+        expire_claim(queue, job_id)
+
+    assert queue._claim(['echo']) is None
+    job = queue.get(job_id)
+    assert (job['status'], job['attempts'], job['error']) == (JOB_FAILED, 2, 'Gave up after 2 attempts')
+
+
+def test_interrupted_job_resumes_after_a_restart(make_queue):
+    crashed = make_queue(stale_after=0.2)
+    crashed.register('echo', noop)
+    job_id = crashed.submit('echo', {'n': 1})
+    crashed._claim(['echo'])  # claimed, then the process "dies" before finishing
+    crashed.stop()
+
+    restarted = make_queue(workers=1, stale_after=0.2, poll_interval=0.05)
+    restarted.register('echo', noop)
+    job = wait_for(restarted, job_id)
+    assert (job['status'], job['result'], job['attempts']) == (JOB_DONE, {'echo': {'n': 1}}, 2)
+
+
+def test_handler_errors_fail_the_job(make_queue):
+    def boom(job_id, payload, queue):
+        raise RuntimeError('no luck')
+
+    queue = make_queue(workers=1, poll_interval=0.05)
+    queue.register('boom', boom)
+    job = wait_for(queue, queue.submit('boom', {}))
+    assert (job['status'], job['error'], job['attempts']) == (JOB_FAILED, 'no luck', 1)
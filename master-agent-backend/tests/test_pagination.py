@@ -0,0 +1,79 @@
+import base64
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from src.models.master_agent import Task, db
+from src.utils.pagination import NEXT_CURSOR_HEADER, PaginationError, decode_cursor, encode_cursor
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def task_ids(api_app):
+    """Seven tasks for user 1; tasks 4-6 share one created_at. Returns their ids newest first."""
+    minutes = [0, 1, 2, 3, 3, 3, 4]
+    stamps = [START + timedelta(minutes=m) for m in minutes]
+    tasks = [Task(id=i + 1, title=f't{i + 1}', user_id=1, created_at=stamp) for i, stamp in enumerate(stamps)]
+    tasks.append(Task(id=99, title='other user', user_id=2, created_at=START))
+    db.session.add_all(tasks)
+    db.session.commit()
+    return [7, 6, 5, 4, 3, 2, 1]
+
+
+def pages(client, **params):
+    """Follow X-Next-Cursor through /api/tasks; returns the ids of each page."""
+    result, cursor = [], None
+    while True:
+        response = client.get('/api/tasks', query_string={**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        result.append([task['id'] for task in response.get_json()])
+        cursor = response.headers[NEXT_CURSOR_HEADER]
+        if not cursor:
+            return result
+
+
+def test_cursor_round_trip():
+    row = SimpleNamespace(id=42, created_at=START)
+    assert decode_cursor(encode_cursor(row)) == (START, 42)
+    assert decode_cursor(encode_cursor(SimpleNamespace(id=7, created_at=None))) == (None, 7)
+    assert '=' not in encode_cursor(row)
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+                                    base64.urlsafe_b64encode(b'["yesterday", 1]').decode()])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(PaginationError):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_row_once_including_ties(client, task_ids):
+    assert pages(client, limit=2) == [[7, 6], [5, 4], [3, 2], [1]]
+    assert pages(client, limit=3) == [[7, 6, 5], [4, 3, 2], [1]]
+    assert pages(client) == [task_ids]
+
+
+def test_rows_added_between_pages_do_not_shift_the_next_page(client, task_ids):
+    first = client.get('/api/tasks', query_string={'limit': 3})
+    db.session.add(Task(id=8, title='new', user_id=1, created_at=START + timedelta(days=1)))
+    db.session.commit()
+    second = client.get('/api/tasks', query_string={'limit': 3, 'cursor': first.headers[NEXT_CURSOR_HEADER]})
+    assert [task['id'] for task in second.get_json()] == [4, 3, 2]
+
+
+def test_fields_limit_the_returned_columns(client, task_ids):
+    response = client.get('/api/tasks', query_string={'limit': 1, 'fields': 'title,status'})
+    assert response.get_json() == [{'id': 7, 'title': 't7', 'status': 'pending'}]
+
+
+@pytest.mark.parametrize('params', [
+    {'cursor': 'not-a-cursor'},
+    {'limit': '0'},
+    {'limit': 'ten'},
+    {'fields': 'title,password'},
+])
+def test_bad_parameters_are_a_400(client, task_ids, params):
+    response = client.get('/api/tasks', query_string=params)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
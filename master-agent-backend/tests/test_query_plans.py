@@ -0,0 +1,84 @@
+import re
+import sys
+import types
+
+import pytest
+from flask import Flask
+from sqlalchemy import Column, Integer, create_engine
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+
+from src.database.query_plans import explain, hot_queries, plan_problems, research_hot_queries
+from src.models.master_agent import db
+
+
+@pytest.fixture(scope='module')
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def _local_research_base():
+    """
+    A stand-in src.database.base for checkouts without the research database
+    package: a fresh declarative Base with the users table ResearchResult points to.
+    """
+    Base = declarative_base()
+
+    class User(Base):
+        __tablename__ = 'users'
+        id = Column(Integer, primary_key=True)
+        research_results = relationship('ResearchResult', back_populates='user')
+
+    module = types.ModuleType('src.database.base')
+    module.Base = Base
+    module.User = User  # the declarative registry only holds weak references
+    return module
+
+
+@pytest.fixture(scope='module')
+def research_session():
+    # The research models live on their own declarative Base (src.database.base)
+    try:
+        from src.database.base import Base
+        local = None
+    except ImportError:
+        local = _local_research_base()
+        Base = local.Base
+        sys.modules['src.database.base'] = local
+        sys.modules.pop('src.models.research_result', None)
+    try:
+        import src.models.research_result  # noqa: F401  (registers the research tables on Base)
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+    finally:
+        if local is not None:
+            # Do not leave models bound to the local Base behind for other tests
+            sys.modules.pop('src.database.base', None)
+            sys.modules.pop('src.models.research_result', None)
+
+
+def assert_index_search(name, query, session=None):
+    """The query's table is reached by an index SEARCH, with no full scan or temp B-tree sort."""
+    plan = explain(query, session)
+    table = query.column_descriptions[0]['entity'].__table__.name
+    assert any(re.match(rf'SEARCH {table} USING (COVERING )?INDEX ', detail) for detail in plan), (name, plan)
+    assert not plan_problems(plan), (name, plan)
+
+
+def test_hot_queries_use_indexes(app):
+    for name, query in hot_queries().items():
+        assert_index_search(name, query)
+
+
+def test_research_list_uses_index(research_session):
+    queries = research_hot_queries(research_session)
+    assert set(queries) == {'list_research', 'list_research_next_page'}
+    for name, query in queries.items():
+        assert_index_search(name, query, research_session)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from flask import Flask
+
+from src.database.backfill_embeddings import backfill_note_embeddings
+from src.models.master_agent import Note, User, db
+from src.routes import related
+from src.utils.embedding_store import HashingEmbedder, SemanticIndex
+
+NOTES = [
+    # (id, user_id, content)
+    (1, 1, 'Sourdough bread needs a lively starter, flour, water and a long cold proof'),
+    (2, 1, 'Bake sourdough bread: feed the starter, mix flour and water, cold proof overnight'),
+    (3, 1, 'Quarterly tax filing is due at the end of the month'),
+    (4, 2, 'Sourdough bread needs a lively starter, flour, water and a long cold proof'),
+]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.register_blueprint(related.related_bp, url_prefix='/api')
+    db.init_app(app)
+    index = SemanticIndex(str(tmp_path), HashingEmbedder(dim=64))
+    monkeypatch.setattr(related, 'get_semantic_index', lambda: index)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(id=1, username='a', email='a@example.com'),
+                            User(id=2, username='b', email='b@example.com')])
+        db.session.add_all([Note(id=i, user_id=u, content=c) for i, u, c in NOTES])
+        db.session.commit()
+        yield app.test_client(), index
+
+
+def test_backfill_indexes_existing_notes_once(client):
+    _, index = client
+    assert backfill_note_embeddings(index) == (4, 4)
+    assert backfill_note_embeddings(index) == (4, 0)  # unchanged text is not re-embedded
+    assert len(index.store('notes')) == 4
+
+
+def test_related_orders_by_similarity_within_the_owner(client):
+    test_client, index = client
+    backfill_note_embeddings(index)
+
+    response = test_client.get('/api/related/notes/1?types=notes')
+    assert response.status_code == 200
+    hits = response.get_json()['related']
+    # Note 4 is identical but belongs to another user; note 1 itself is excluded
+    assert [h['id'] for h in hits] == [2, 3]
+    assert hits[0]['score'] > hits[1]['score']
+
+
+def test_store_reloads_from_the_mapped_files(client, tmp_path):
+    _, index = client
+    backfill_note_embeddings(index)
+
+    reopened = SemanticIndex(str(tmp_path), HashingEmbedder(dim=64))
+    store = reopened.store('notes')
+    assert len(store) == 4
+    assert np.allclose(store.get(2), index.store('notes').get(2))
+    assert [hit_id for hit_id, _ in store.search(store.get(1), k=2, exclude_ids=[1])[0]] == [4, 2]
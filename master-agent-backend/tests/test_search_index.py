@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import text
+
+from src.database import search_index
+from src.database.search_index import install_search_index, match_expression, search
+from src.models.master_agent import Conversation, Note, db
+
+
+@pytest.fixture
+def notes(api_app, monkeypatch):
+    # Every test gets a fresh in-memory database under the same engine URL
+    monkeypatch.setattr(search_index, '_installed', {})
+    rows = [Note(id=1, user_id=1, title='Sourdough', content='feed the starter'),
+            Note(id=2, user_id=1, title='Taxes', content='quarterly filing'),
+            Note(id=3, user_id=2, title='Sourdough', content='someone else')]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+def hits(query, user_id=1, kinds=('notes',)):
+    results, _ = search(user_id, query, list(kinds))
+    return [(r['type'], r['id']) for r in results]
+
+
+def test_rows_present_before_installation_are_indexed(notes):
+    assert hits('sourdough') == [('notes', 1)]
+    assert hits('sourdough', user_id=2) == [('notes', 3)]
+
+
+def test_orm_update_and_delete_keep_the_index_in_sync(notes):
+    assert hits('starter') == [('notes', 1)]
+    notes[0].content = 'bake the loaf'
+    db.session.commit()
+    assert hits('starter') == []
+    assert hits('loaf') == [('notes', 1)]
+
+    db.session.delete(notes[0])
+    db.session.commit()
+    assert hits('loaf') == []
+    assert hits('sourdough') == []
+
+
+def test_bulk_and_raw_sql_writes_keep_the_index_in_sync(client, notes):
+    hits('anything')  # install the FTS table and triggers
+    client.post('/api/notes/bulk', json={
+        'user_id': 1, 'create': [{'content': 'rye crumb'}], 'update': [{'id': 2, 'content': 'annual audit'}],
+    })
+    assert hits('rye') != []
+    assert hits('quarterly') == []
+    assert hits('audit') == [('notes', 2)]
+
+    # query.delete() and raw SQL bypass the ORM entirely
+    Note.query.filter(Note.id == 2).delete(synchronize_session=False)
+    db.session.execute(text("UPDATE note SET title = 'Levain' WHERE id = 1"))
+    db.session.commit()
+    assert hits('audit') == []
+    assert hits('levain') == [('notes', 1)]
+    assert hits('sourdough') == []
+
+
+def test_titles_outrank_bodies_and_prefixes_match(notes):
+    db.session.add_all([Note(id=4, user_id=1, title='Bread', content='x'),
+                        Note(id=5, user_id=1, title='x', content='bread')])
+    db.session.add(Conversation(id=1, user_id=1, message='any bread tips?', response='sure'))
+    db.session.commit()
+    assert hits('brea', kinds=['notes', 'conversations']) == [('notes', 4), ('notes', 5), ('conversations', 1)]
+
+
+def test_search_operators_in_the_input_are_plain_words():
+    assert match_expression('NOT taxes OR "x"') == '"NOT" "taxes" "OR" "x"*'
+    assert match_expression(' -*- ') is None
+
+
+def test_sources_without_a_table_are_skipped(notes):
+    available, skipped = install_search_index(db.engine, ['notes', 'research'])
+    assert available == ['notes']
+    assert skipped == {'research': 'no research_results table'}
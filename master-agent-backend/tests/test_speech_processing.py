@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip('speech_recognition')
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from src.utils.speech_processing import (
+    DecodedAudio, StubRecognizerBackend, transcribe_audio, transcribe_segments,
+)
+
+# Text the stub "hears" per chunk, keyed by the chunk's rounded length in seconds
+WORDS = {10: 'first', 25: 'second', 8: 'third'}
+
+
+def tone(seconds):
+    return Sine(440, sample_rate=16000).to_audio_segment(duration=seconds * 1000, volume=-6)
+
+
+@pytest.fixture(scope='module')
+def clip():
+    """46.2 s: 10 s tone, 1.6 s pause, 25 s tone, 1.6 s pause, 8 s tone (longer than one 30 s chunk)."""
+    pause = AudioSegment.silent(duration=1600, frame_rate=16000)
+    return DecodedAudio(tone(10) + pause + tone(25) + pause + tone(8))
+
+
+def stub():
+    return StubRecognizerBackend(responder=lambda segment: WORDS.get(round(len(segment) / 1000), '?'))
+
+
+def test_long_audio_is_split_at_the_pauses(clip):
+    segments = transcribe_segments(clip, stub(), max_workers=3)
+    # Each speech span keeps 200 ms of its surrounding pause (to the 10 ms silence scan step);
+    # no two spans fit in one 30 s chunk
+    bounds = [t for s in segments for t in (s['start'], s['end'])]
+    assert bounds == pytest.approx([0.0, 10.2, 11.4, 36.8, 38.0, 46.2], abs=0.02)
+    assert [s['text'] for s in segments] == ['first', 'second', 'third']
+    assert all(s['error'] is None for s in segments)
+
+
+def test_transcript_joins_chunks_in_playback_order(clip):
+    assert transcribe_audio(clip, stub()) == 'first second third'
+
+
+def test_short_audio_is_one_chunk():
+    segments = transcribe_segments(DecodedAudio(tone(3)), StubRecognizerBackend('hello'))
+    assert [(s['start'], s['end'], s['text']) for s in segments] == [(0.0, 3.0, 'hello')]
+
+
+def test_recognizer_errors_are_reported():
+    def fail(segment):
+        raise RuntimeError('service unavailable')
+
+    result = transcribe_audio(DecodedAudio(tone(3)), StubRecognizerBackend(responder=fail))
+    assert result == 'Could not request results from speech recognition service; service unavailable'
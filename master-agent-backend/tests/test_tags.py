@@ -0,0 +1,32 @@
+import json
+
+from src.models.master_agent import Note, db
+
+
+def note_ids(response):
+    assert response.status_code == 200
+    return [note['id'] for note in response.get_json()]
+
+
+def test_tag_filter_ignores_case_and_extra_whitespace(client):
+    work = client.post('/api/notes', json={'content': 'standup', 'tags': ['Work', 'Home  Office']}).get_json()
+    client.post('/api/notes', json={'content': 'groceries', 'tags': ['errands']})
+
+    assert work['tags'] == ['Home Office', 'Work']
+    for tag in ('Work', 'work', ' WORK ', 'home office', '  Home   Office '):
+        assert note_ids(client.get('/api/notes', query_string={'tag': tag})) == [work['id']], tag
+    assert note_ids(client.get('/api/notes', query_string={'tag': 'play'})) == []
+    # A blank tag is no filter at all
+    assert len(note_ids(client.get('/api/notes', query_string={'tag': '   '}))) == 2
+
+
+def test_note_matching_a_tag_twice_is_listed_once(client):
+    note = client.post('/api/notes', json={'content': 'x', 'tags': ['Work', 'work']}).get_json()
+    assert note_ids(client.get('/api/notes', query_string={'tag': 'WORK'})) == [note['id']]
+
+
+def test_notes_not_yet_backfilled_show_their_json_tags(api_app):
+    note = Note(user_id=1, content='old', tags=json.dumps(['legacy']))
+    db.session.add(note)
+    db.session.commit()
+    assert note.to_dict()['tags'] == ['legacy']